@@ -0,0 +1,360 @@
+# gone/arena.py
+'''
+Arena-backed AST
+================
+Every node of the AST in ast.py is a Python object.  Even with
+__slots__, a node costs a few dozen bytes for the object plus the
+objects it refers to, and for inputs of 100k lines and more the tree
+dominates the memory of the compiler.
+
+ASTArena holds the same tree in a handful of flat arrays.  Nodes are
+numbered, and for node n:
+
+    kinds[n]      the class of the node, as an index into the table of
+                  node classes kept by this module
+    linenos[n]    its line number (0 if it has none)
+    offsets[n]    where its fields start in refs
+
+Each field of a node is one entry of refs, an integer whose low two bits
+tell what it is:
+
+    NODE   the number of the child node
+    LIST   the position in items of a list of nodes, stored as its
+           length followed by the numbers of the nodes
+    VALUE  the position in values of a payload (a name, an operator,
+           the value of a literal); equal values are stored once
+    NONE   None
+
+The attributes that the checker and code generator attach to nodes
+(type, register, scope and so on, see _attributes in ast.py) are kept
+in one array per attribute, created when the attribute is first set,
+holding positions in values (-1 where the attribute is not set).
+
+The compiler itself works on views: arena.view(n) returns a small
+object for node n whose fields and attributes read and write the
+arrays.  A view has the _fields of its node class and a _ast_class
+naming that class, and NodeVisitor dispatches on it as if it were the
+node itself, so CheckProgramVisitor, GenerateCode and flatten() work
+unchanged on arena.ast.  Views are made on demand and thrown away; two
+views of the same node compare equal.
+
+Use from_ast() to copy an existing tree, or parse() to parse a program
+one top-level statement at a time straight into an arena, so that the
+object tree of the whole program never exists:
+
+     arena = parse(source)
+     check_program(arena.ast)
+
+To compare memory use and the speed of the checker and code generator
+with the object-graph AST, run:
+
+     bash % python3 -m gone.bench arena
+'''
+
+from array import array
+
+from .ast import AST, flatten, unchecked
+from .descent import GoneDescentParser
+from .incremental import StatementSplitter
+from .scanner import GoneScanner
+
+# Tags in the low bits of the entries of ASTArena.refs
+NODE, LIST, VALUE, NONE = range(4)
+
+# Node classes by kind number, their views, and the kind of each class
+_classes = []
+_views = []
+_kinds = {}
+
+def _kind(cls):
+    '''
+    Return the kind number of node class cls, giving it one (and a view
+    class) the first time it is seen
+    '''
+    try:
+        return _kinds[cls]
+    except KeyError:
+        pass
+    if not hasattr(cls, '_fields'):
+        raise TypeError(f'{cls.__name__} is not a concrete node class')
+    _views.append(_make_view(cls))
+    _classes.append(cls)
+    _kinds[cls] = kind = len(_classes) - 1
+    return kind
+
+def _field(position):
+    def get(self):
+        arena = self.arena
+        ref = arena.refs[arena.offsets[self.index] + position]
+        if ref & 3 == NODE:
+            # The common case, without the call to decode()
+            index = ref >> 2
+            return _views[arena.kinds[index]](arena, index)
+        return arena.decode(ref)
+    return property(get)
+
+def _attribute(name):
+    def get(self):
+        try:
+            position = self.arena.attributes[name][self.index]
+        except (KeyError, IndexError):
+            position = -1
+        if position < 0:
+            raise AttributeError(name)
+        return self.arena.values[position]
+
+    def set(self, value):
+        arena = self.arena
+        column = arena.attributes.get(name)
+        if column is None:
+            column = arena.attributes[name] = array('i', [-1]) * len(arena.kinds)
+        elif len(column) < len(arena.kinds):
+            column.extend(array('i', [-1]) * (len(arena.kinds) - len(column)))
+        column[self.index] = arena.intern(value, column[self.index])
+
+    def delete(self):
+        column = self.arena.attributes.get(name)
+        if column is None or self.index >= len(column) or column[self.index] < 0:
+            raise AttributeError(name)
+        column[self.index] = -1
+
+    return property(get, set, delete)
+
+def _lineno(self):
+    lineno = self.arena.linenos[self.index]
+    if not lineno:
+        raise AttributeError('lineno')
+    return lineno
+
+def _set_lineno(self, lineno):
+    self.arena.linenos[self.index] = lineno
+
+def _make_view(cls):
+    '''
+    Make the view class for node class cls
+    '''
+    namespace = {
+        '__slots__': (),
+        '_ast_class': cls,
+        '_fields': cls._fields,
+        'lineno': property(_lineno, _set_lineno),
+    }
+    for position, name in enumerate(cls._fields):
+        namespace[name] = _field(position)
+    for klass in cls.__mro__:
+        for name in vars(klass).get('_attributes', ()):
+            if name not in namespace:
+                namespace[name] = _attribute(name)
+    return type(cls.__name__ + 'View', (NodeView,), namespace)
+
+class NodeView(object):
+    '''
+    A node of an ASTArena, standing in for an AST node.  The subclass
+    for each node class has a property for each field and attribute.
+    '''
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    def __eq__(self, other):
+        if not isinstance(other, NodeView):
+            return NotImplemented
+        return self.arena is other.arena and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        vals = [ getattr(self, name) for name in self._fields ]
+        argstr = ', '.join(f'{name}={val._ast_class.__name__ if isinstance(val, NodeView) else repr(val)}'
+                           for name, val in zip(self._fields, vals))
+        return f'{self._ast_class.__name__}({argstr})'
+
+class ASTArena(object):
+    '''
+    An AST stored in parallel arrays.  top holds the numbers of the
+    top-level statements; the ast property gives them as views, in
+    the form returned by parse() in parser.py.
+    '''
+    def __init__(self):
+        self.kinds = array('B')
+        self.linenos = array('i')
+        self.offsets = array('i')
+        self.refs = array('i')
+        self.items = array('i')
+        self.values = []
+        self.attributes = { }
+        self.top = array('i')
+        self._interned = { }
+        # Positions of the unhashable values, each used by one field or
+        # attribute only
+        self._unshared = set()
+
+    @classmethod
+    def from_ast(cls, top):
+        '''
+        Return an arena holding a copy of the AST top (a list of
+        statements).  Only the fields and line numbers are copied.
+        '''
+        arena = cls()
+        arena.extend(top)
+        return arena
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def ast(self):
+        return [self.view(index) for index in self.top]
+
+    def view(self, index):
+        return _views[self.kinds[index]](self, index)
+
+    def intern(self, value, replacing=-1):
+        '''
+        Return the position of value in values, adding it if needed.
+        replacing is the position of the value that value replaces,
+        whose entry is reused if it is unshared.
+        '''
+        # Values are told apart by type as well, as 1 == 1.0 == True
+        key = value if value.__class__ is str else (value.__class__, value)
+        try:
+            return self._interned[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable values are not shared, so setting one again (the
+            # symbols of a function, each time it is checked) overwrites
+            # the old one instead of growing values
+            if replacing in self._unshared:
+                self.values[replacing] = value
+                return replacing
+            self.values.append(value)
+            self._unshared.add(len(self.values) - 1)
+            return len(self.values) - 1
+        self.values.append(value)
+        position = self._interned[key] = len(self.values) - 1
+        return position
+
+    def decode(self, ref):
+        '''
+        Return the value of a field from its entry in refs
+        '''
+        tag = ref & 3
+        if tag == NODE:
+            return self.view(ref >> 2)
+        elif tag == VALUE:
+            return self.values[ref >> 2]
+        elif tag == LIST:
+            return [self.view(item) for item in self.list_items(ref >> 2)]
+        return None
+
+    def field_refs(self, index):
+        '''
+        Return the entries of refs for the fields of node index
+        '''
+        start = self.offsets[index]
+        return self.refs[start:start + len(_classes[self.kinds[index]]._fields)]
+
+    def list_items(self, start):
+        '''
+        Return the node numbers of the list stored at items[start]
+        '''
+        return self.items[start + 1:start + 1 + self.items[start]]
+
+    def extend(self, statements):
+        '''
+        Copy the top-level statements into the arena
+        '''
+        self.top.extend(self.add(node) for node in statements)
+
+    def add(self, top):
+        '''
+        Copy the subtree under the AST node top into the arena and return
+        its number
+        '''
+        root = self._allocate(top)
+        stack = [(top, root)]
+        while stack:
+            node, index = stack.pop()
+            offset = self.offsets[index]
+            for position, name in enumerate(node._fields):
+                value = getattr(node, name)
+                if isinstance(value, AST):
+                    child = self._allocate(value)
+                    stack.append((value, child))
+                    ref = child << 2 | NODE
+                elif isinstance(value, list):
+                    start = len(self.items)
+                    self.items.append(len(value))
+                    for item in value:
+                        child = self._allocate(item)
+                        stack.append((item, child))
+                        self.items.append(child)
+                    ref = start << 2 | LIST
+                elif value is None:
+                    ref = NONE
+                else:
+                    ref = self.intern(value) << 2 | VALUE
+                self.refs[offset + position] = ref
+        return root
+
+    def _allocate(self, node):
+        '''
+        Give node a number and room for its fields, which add() fills in
+        '''
+        index = len(self.kinds)
+        kind = _kind(node.__class__)
+        self.kinds.append(kind)
+        self.linenos.append(getattr(node, 'lineno', 0) or 0)
+        self.offsets.append(len(self.refs))
+        self.refs.extend(array('i', [NONE]) * len(node._fields))
+        return index
+
+def parse(source):
+    '''
+    Parse source (a string, or a file as accepted by tokenize_stream())
+    into an ASTArena.  The program is split into top-level statements as
+    in incremental.py and each one is parsed and copied into the arena
+    by itself.  A statement with a syntax error is left out, so unlike
+    parse() in parser.py, the other statements are kept.
+    '''
+    scanner = GoneScanner()
+    if isinstance(source, str):
+        tokens = scanner.tokenize(source)
+    else:
+        tokens = scanner.tokenize_stream(source)
+
+    arena = ASTArena()
+    splitter = StatementSplitter()
+    group = []
+    with unchecked():
+        for tok in tokens:
+            if splitter.starts_statement(tok) and group:
+                arena.extend(GoneDescentParser().parse(iter(group)) or [])
+                group = []
+            group.append(tok)
+        if group:
+            arena.extend(GoneDescentParser().parse(iter(group)) or [])
+    return arena
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.arena filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        arena = parse(source)
+
+    for depth, node in flatten(arena.ast):
+        print('%s: %s%s' % (getattr(node, 'lineno', None), ' '*(4*depth), node))
+
+if __name__ == '__main__':
+    main()
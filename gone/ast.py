@@ -9,8 +9,59 @@ each kind of grammar rule.  A few sample AST nodes can be found at the
 top of this file.  You will need to add more on your own.
 '''
 
-# DO NOT MODIFY
-class AST(object):
+import contextlib
+import contextvars
+from types import GeneratorType
+
+# Whether node constructors check the types of their arguments.  See
+# unchecked() below.
+_validate = contextvars.ContextVar('validate', default=True)
+
+@contextlib.contextmanager
+def unchecked():
+    '''
+    Context manager in which nodes are built without checking the types
+    of their fields.  The parsers are trusted to build well-formed trees
+    and use it to save the cost of the checks.  The setting is local to
+    the current thread (or asyncio task).
+    '''
+    token = _validate.set(False)
+    try:
+        yield
+    finally:
+        _validate.reset(token)
+
+def _check_fields(fields, args):
+    for (name, ty), arg in zip(fields, args):
+        if isinstance(ty, list):
+            if not isinstance(arg, list):
+                raise TypeError(f'{name} must be list')
+            if not all(isinstance(item, ty[0]) for item in arg):
+                raise TypeError(f'All items of {name} must be {ty[0]}')
+        elif not isinstance(arg, ty):
+            raise TypeError(f'{name} must be {ty}')
+
+class _ASTMeta(type):
+    '''
+    Gives each node class __slots__ for the fields that it declares and
+    for the names listed in its _attributes, so that nodes are not
+    backed by a __dict__.  _attributes are the attributes that the
+    parser and the later stages of the compiler attach to nodes, such
+    as the line number, the type found by the checker or the register
+    that holds the value of an expression.  (__slots__ has to be in
+    place when the class is created, which is too early for
+    __init_subclass__.)
+    '''
+    def __new__(meta, clsname, bases, attributes):
+        inherited = {slot for base in bases for klass in base.__mro__
+                     for slot in getattr(klass, '__slots__', ())}
+        names = [*attributes.get('__annotations__', {}), *attributes.get('_attributes', ())]
+        attributes['__slots__'] = tuple(name for name in dict.fromkeys(names)
+                                        if name not in inherited)
+        return super().__new__(meta, clsname, bases, attributes)
+
+class AST(object, metaclass=_ASTMeta):
+    _attributes = ('lineno',)
     _nodes = { } 
 
     @classmethod
@@ -21,25 +72,22 @@ class AST(object):
             return
 
         fields = list(cls.__annotations__.items())
-                
+        names = [name for name, _ in fields]
+        validate = _validate.get
+
         def __init__(self, *args, **kwargs):
             if len(args) != len(fields):
                 raise TypeError(f'Expected {len(fields)} arguments')
-            for (name, ty), arg in zip(fields, args):
-                if isinstance(ty, list):
-                    if not isinstance(arg, list):
-                        raise TypeError(f'{name} must be list')
-                    if not all(isinstance(item, ty[0]) for item in arg):
-                        raise TypeError(f'All items of {name} must be {ty[0]}')
-                elif not isinstance(arg, ty):
-                    raise TypeError(f'{name} must be {ty}')
+            if validate():
+                _check_fields(fields, args)
+            for name, arg in zip(names, args):
                 setattr(self, name, arg)
 
             for name, val in kwargs.items():
                 setattr(self, name, val)
 
         cls.__init__ = __init__
-        cls._fields = [name for name,_ in fields]
+        cls._fields = names
 
     def __repr__(self):
         vals = [ getattr(self, name) for name in self._fields ]
@@ -77,19 +125,19 @@ class AST(object):
 # Abstract AST nodes
 
 class Statement(AST):
-    pass
+    _attributes = ('type',)
 
 class Expression(AST):
-    pass
+    _attributes = ('type', 'register')
 
 class DataType(AST):
-    pass
+    _attributes = ('type',)
 
 class SimpleType(DataType):
     name : str
 
 class Location(AST):
-    pass
+    _attributes = ('type', 'usage', 'slot')
 
 class ReadLocation(Expression):
     location : Location
@@ -104,11 +152,13 @@ class Assignment(Statement):
 class ConstDeclaration(Statement):
     name  : SimpleLocation
     value : Expression
+    _attributes = ('scope', 'writeable', 'callable', 'slot')
 
 class VarDeclaration(Statement):
     name     : SimpleLocation
     datatype : DataType
     value    : (Expression, type(None))
+    _attributes = ('scope', 'writeable', 'callable', 'slot')
 
 class BinOp(Expression):
     '''
@@ -140,12 +190,14 @@ class ForStatement(Statement):
 class FuncArgument(AST):
     name     : str
     datatype : DataType
+    _attributes = ('type', 'scope', 'writeable', 'callable', 'slot')
 
 class FuncDeclaration(Statement):
     name      : str
     arguments : [ FuncArgument ]
     datatype  : DataType
     body      : [ Statement ]
+    _attributes = ('scope', 'writeable', 'callable', 'symbols')
 
 class ContinueStatement(Statement):
     name : str
@@ -195,6 +247,9 @@ class BoolLiteral(Literal):
 # The following classes for visiting and rewriting the AST are taken
 # from Python's ast module.   
 
+# Marks the end of a generator in NodeVisitor._run()
+_done = object()
+
 # DO NOT MODIFY
 class NodeVisitor(object):
     '''
@@ -217,19 +272,85 @@ class NodeVisitor(object):
 
         tree = parse(txt)
         VisitOps().visit(tree)
+
+    Methods that call self.visit() on the children of a node recurse
+    once per level of the tree, and a deeply nested program (a long
+    chain of operators, say) exceeds Python's recursion limit.  A
+    visit_NodeName() method can instead be written as a generator that
+    yields each child (a node or a list of nodes) that it wants visited:
+
+        class VisitOps(NodeVisitor):
+            def visit_BinOp(self, node):
+                print('Entering', node.op)      # pre-order
+                yield node.left
+                yield node.right
+                print('Leaving', node.op)       # post-order
+
+    visit() keeps the generators of all the nodes being visited on an
+    explicit stack and resumes each one once its child has been visited,
+    so the depth of the tree is only limited by memory.  The code before
+    the first yield runs in pre-order and the code after the last yield
+    in post-order.  Nodes without a visit_NodeName() method are visited
+    by generic_children(), a generator yielding the fields of the node,
+    unless the class overrides generic_visit().  generic_visit() itself
+    visits the fields right away, so that an override can call it as
+    before, or an override written as a generator can continue with
+
+        yield from NodeVisitor.generic_children(self, node)
+
+    The two kinds of method can be mixed, but a plain method that calls
+    self.visit() adds a level of recursion as before.
+
+    The method to call for each class of node is looked up once per
+    visitor class and kept in the table _dispatch, which maps the class
+    of a node to a function taking (visitor, node).  Lists map to a
+    function visiting their items and other values to one that does
+    nothing.  A class with a _ast_class attribute (the node views of
+    arena.py) maps to the method for that node class.
     '''
+    _dispatch = { }
+
     def visit(self, node):
         '''
         Execute a method of the form visit_NodeName(node) where
         NodeName is the name of the class of a particular node.
         '''
-        if isinstance(node, list):
-            for item in node:
-                self.visit(item)
-        elif isinstance(node, AST):
-            method = 'visit_' + node.__class__.__name__
-            visitor = getattr(self, method, self.generic_visit)
-            visitor(node)
+        try:
+            method = self._dispatch[node.__class__]
+        except KeyError:
+            method = self._lookup(node.__class__)
+        result = method(self, node)
+        if result.__class__ is GeneratorType:
+            self._run(result)
+
+    def _run(self, generator):
+        '''
+        Run the generator of a visit_ method to completion, visiting the
+        children that it yields (and those that their methods yield)
+        with an explicit stack instead of recursion.
+        '''
+        dispatch = self._dispatch
+        lookup = self._lookup
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        done = _done
+        top = generator
+        while True:
+            node = next(top, done)
+            if node is done:
+                if not stack:
+                    return
+                top = pop()
+                continue
+            try:
+                method = dispatch[node.__class__]
+            except KeyError:
+                method = lookup(node.__class__)
+            result = method(self, node)
+            if result.__class__ is GeneratorType:
+                push(top)
+                top = result
     
     def generic_visit(self,node):
         '''
@@ -241,6 +362,45 @@ class NodeVisitor(object):
             value = getattr(node, field, None)
             self.visit(value)
 
+    def generic_children(self, node):
+        '''
+        Generator version of generic_visit(), yielding the fields of
+        node to be visited
+        '''
+        for field in getattr(node, '_fields'):
+            yield getattr(node, field, None)
+
+    def _visit_list(self, node):
+        yield from node
+
+    def _visit_other(self, node):
+        pass
+
+    @classmethod
+    def _lookup(cls, nodecls):
+        '''
+        Find the method that visits nodes of class nodecls and enter it
+        in the dispatch table.
+        '''
+        # Views of the nodes of an ASTArena (see arena.py) are visited
+        # like the nodes themselves
+        kind = getattr(nodecls, '_ast_class', nodecls)
+        if issubclass(kind, list):
+            method = cls._visit_list
+        elif issubclass(kind, AST):
+            method = getattr(cls, 'visit_' + kind.__name__, None)
+            if method is None:
+                # Without an override, the children are visited with the
+                # explicit stack of _run()
+                if cls.generic_visit is NodeVisitor.generic_visit:
+                    method = cls.generic_children
+                else:
+                    method = cls.generic_visit
+        else:
+            method = cls._visit_other
+        cls._dispatch[nodecls] = method
+        return method
+
     @classmethod
     def __init_subclass__(cls):
         '''
@@ -250,6 +410,9 @@ class NodeVisitor(object):
             if key.startswith('visit_'):
                 assert key[6:] in globals(), f"{key} doesn't match any AST node"
 
+        # Every visitor class has its own table
+        cls._dispatch = { }
+
 # DO NOT MODIFY
 def flatten(top):
     '''
@@ -265,7 +428,7 @@ def flatten(top):
         def generic_visit(self, node):
             self.nodes.append((self.depth, node))
             self.depth += 1
-            NodeVisitor.generic_visit(self, node)
+            yield from NodeVisitor.generic_children(self, node)
             self.depth -= 1
 
     d = Flattener()
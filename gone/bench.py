@@ -0,0 +1,690 @@
+# gone/bench.py
+'''
+Benchmarks
+==========
+Timing harness for the different stages of the compiler.  Each
+benchmark is a function bench_<name>() below and is run from the
+command line by name:
+
+    bash % python3 -m gone.bench lex
+
+Inputs are the programs in Tests/*.g plus large synthetic programs made
+by synthesize().  Error messages produced while running a benchmark
+(several of the Tests/ programs contain deliberate errors) are
+discarded.
+'''
+
+import contextlib
+import glob
+import io
+import os.path
+import time
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+# A type-correct function used as the unit of synthetic programs.  Every
+# copy gets its own name so that the result also checks cleanly.
+_template = '''\
+func f{n}(a int, b float) int {{
+    var x int = a * {n} + 3;   // arithmetic
+    var y float = b / 2.5 - 1.0;
+    /* loop with a
+       compound condition */
+    while x > 0 {{
+        if x / 2 * 2 == x && y < 100.0 {{
+            y = y + 1.5;
+        }} else {{
+            x = x - 1;
+        }}
+        x = x - 1;
+    }}
+    print 'x';
+    return x;
+}}
+'''
+
+def synthesize(lines):
+    '''
+    Return the text of a valid Gone program with about lines lines
+    '''
+    count = max(1, lines // _template.count('\n'))
+    return ''.join(_template.format(n=n) for n in range(count))
+
+def test_programs():
+    '''
+    Return a list of (filename, source) pairs for Tests/*.g
+    '''
+    programs = []
+    for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+        with open(filename) as f:
+            programs.append((os.path.basename(filename), f.read()))
+    return programs
+
+def timeit(func, repeat=3):
+    '''
+    Return the best wall clock time of repeat calls to func()
+    '''
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_lex():
+    '''
+    Tokens per second of the SLY lexer and the hand-written scanner
+    '''
+    from .tokenizer import GoneLexer
+    from .scanner import GoneScanner
+
+    inputs = [('Tests/*.g', ''.join(source for _, source in test_programs()))]
+    inputs += [(f'synthetic {n} lines', synthesize(n)) for n in (10000, 100000)]
+    for name, source in inputs:
+        with contextlib.redirect_stderr(io.StringIO()):
+            ntokens = sum(1 for _ in GoneScanner().tokenize(source))
+        print(f'{name}: {ntokens} tokens')
+        for lexer in (GoneLexer, GoneScanner):
+            elapsed = timeit(lambda: sum(1 for _ in lexer().tokenize(source)))
+            print(f'    {lexer.__name__:12} {ntokens/elapsed:12,.0f} tokens/sec')
+
+def bench_tokens():
+    '''
+    Memory per token and parse time of Token objects and a TokenBuffer
+    '''
+    import tracemalloc
+    from .scanner import GoneScanner
+    from .parser import parse
+
+    source = synthesize(20000)
+    scanner = GoneScanner()
+    tracemalloc.start()
+    tokens = list(scanner.tokenize(source))
+    token_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    buffer = scanner.scan(source)
+    buffer_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'synthetic 20000 lines: {len(tokens)} tokens')
+    print(f'    Token objects {token_memory/len(tokens):8.1f} bytes/token')
+    print(f'    TokenBuffer   {buffer_memory/len(buffer):8.1f} bytes/token')
+    print(f'    parse(source, lexer="scanner") {timeit(lambda: parse(source, lexer="scanner"), 1):8.3f} s')
+    print(f'    parse(scanner.scan(source))    {timeit(lambda: parse(scanner.scan(source)), 1):8.3f} s')
+
+def bench_stream():
+    '''
+    Peak memory of lexing a large file read whole and read in chunks
+    '''
+    import tempfile
+    import tracemalloc
+    from .scanner import GoneScanner
+
+    with tempfile.NamedTemporaryFile('w', suffix='.g') as f:
+        f.write(synthesize(200000))
+        f.flush()
+        print(f'synthetic 200000 lines: {os.path.getsize(f.name):,} bytes')
+
+        def whole():
+            with open(f.name) as source:
+                for _ in GoneScanner().tokenize(source.read()):
+                    pass
+
+        def chunked(chunk_size):
+            with open(f.name) as source:
+                for _ in GoneScanner().tokenize_stream(source, chunk_size):
+                    pass
+
+        for name, func in [('read()', whole),
+                           ('stream, 64K chunks', lambda: chunked(65536)),
+                           ('stream, 4K chunks', lambda: chunked(4096))]:
+            elapsed = timeit(func, 1)
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'    {name:20} peak {peak:12,} bytes  {elapsed:6.2f} s')
+
+def bench_incremental():
+    '''
+    Edit-to-AST latency of IncrementalParser and of a full parse()
+    '''
+    from .incremental import IncrementalParser
+    from .parser import parse
+
+    source = synthesize(50000)
+    middle = source.index('func f', len(source) // 2)
+    literal = source.index('2.5', middle)
+    edits = [('change a literal', literal, literal + 3, '3.5'),
+             ('insert a newline', middle, middle, '\n'),
+             ('insert a function', middle, middle, _template.format(n='new'))]
+    print(f'synthetic 50000 lines: {len(source):,} bytes')
+    print(f'    full parse(source, lexer="scanner") {timeit(lambda: parse(source, lexer="scanner"), 1):8.4f} s')
+    with contextlib.redirect_stderr(io.StringIO()):
+        parser = IncrementalParser(source)
+    for name, start, end, text in edits:
+        undo = (start, start + len(text), source[start:end])
+        def edit():
+            parser.edit(start, end, text)
+            parser.edit(*undo)
+        print(f'    {name:35} {timeit(edit) / 2:8.4f} s')
+
+def bench_coldstart():
+    '''
+    Start-up time of python3 -m gone.parser with and without cached tables
+    '''
+    import subprocess
+    import sys
+    from .parser import GoneParser
+
+    root = os.path.join(os.path.dirname(__file__), '..')
+    command = [sys.executable, '-m', 'gone.parser', os.path.join(_tests, 'parsetest0.g')]
+
+    def run(cached):
+        if not cached and os.path.exists(GoneParser.tablefile):
+            os.remove(GoneParser.tablefile)
+        subprocess.run(command, cwd=root, stdout=subprocess.DEVNULL, check=True)
+
+    run(True)
+    print(f'python3 -m gone.parser parsetest0.g (best of 5)')
+    for name, cached in [('tables built', False), ('tables loaded', True)]:
+        print(f'    {name:15} {timeit(lambda: run(cached), 5):8.3f} s')
+
+def kernel(lines, depth=6):
+    '''
+    Return a program of about lines lines of generated arithmetic, each
+    statement an expression tree of the given depth
+    '''
+    import random
+
+    rand = random.Random(lines)
+    def expr(depth):
+        if depth == 0:
+            return rand.choice(['x', 'y', '1.5', '2.0', '(x * y)'])
+        op = rand.choice('+-*/')
+        return f'({expr(depth - 1)} {op} {expr(depth - 1)})'
+    body = ''.join(f'    y = {expr(depth)};\n' for _ in range(lines))
+    return f'func kernel(x float, y float) float {{\n{body}    return y;\n}}\n'
+
+def bench_descent():
+    '''
+    Parse time of GoneParser and GoneDescentParser
+    '''
+    from .parser import GoneParser
+    from .descent import GoneDescentParser
+    from .scanner import GoneScanner
+
+    inputs = [('Tests/*.g', ''.join(source for _, source in test_programs())),
+              ('synthetic 20000 lines', synthesize(20000)),
+              ('kernel 2000 lines, depth 6', kernel(2000))]
+    for name, source in inputs:
+        with contextlib.redirect_stderr(io.StringIO()):
+            tokens = list(GoneScanner().tokenize(source))
+        print(f'{name}: {len(tokens)} tokens')
+        for parser in (GoneParser, GoneDescentParser):
+            elapsed = timeit(lambda: parser().parse(iter(tokens)))
+            print(f'    {parser.__name__:18} {len(tokens)/elapsed:12,.0f} tokens/sec')
+
+def bench_ast():
+    '''
+    Memory per node and parse throughput, with and without checking the
+    types of node fields
+    '''
+    import tracemalloc
+    from .ast import flatten, unchecked
+    from .checker import check_program
+    from .parser import GoneParser
+    from .descent import GoneDescentParser
+    from .scanner import GoneScanner
+
+    source = synthesize(100000)
+    tokens = list(GoneScanner().tokenize(source))
+    tracemalloc.start()
+    ast = GoneDescentParser().parse(iter(tokens))
+    parsed = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stderr(io.StringIO()):
+        check_program(ast)
+    checked = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    nodes = sum(1 for _ in flatten(ast))
+    print(f'synthetic 100000 lines: {nodes} nodes')
+    print(f'    after parsing  {parsed/nodes:8.1f} bytes/node')
+    print(f'    after checking {checked/nodes:8.1f} bytes/node')
+
+    def parse_unchecked(parser):
+        with unchecked():
+            parser().parse(iter(tokens))
+
+    for parser in (GoneParser, GoneDescentParser):
+        checked = timeit(lambda: parser().parse(iter(tokens)))
+        unchecked_ = timeit(lambda: parse_unchecked(parser))
+        print(f'    {parser.__name__:18} {nodes/checked:10,.0f} nodes/sec checked'
+              f'  {nodes/unchecked_:10,.0f} nodes/sec unchecked')
+
+def bench_visit():
+    '''
+    Nodes per second visited by CheckProgramVisitor, GenerateCode and
+    flatten()
+    '''
+    from .ast import flatten
+    from .checker import CheckProgramVisitor
+    from .ircode import GenerateCode
+    from .parser import parse
+
+    source = synthesize(100000)
+    ast = parse(source, lexer='scanner', parser='descent')
+    nodes = sum(1 for _ in flatten(ast))
+    print(f'synthetic 100000 lines: {nodes} nodes')
+    for name, func in [('CheckProgramVisitor', lambda: CheckProgramVisitor().visit(ast)),
+                       ('GenerateCode', lambda: GenerateCode().visit(ast)),
+                       ('flatten', lambda: flatten(ast))]:
+        print(f'    {name:20} {nodes/timeit(func):12,.0f} nodes/sec')
+
+def bench_arena():
+    '''
+    Memory per node and the speed of CheckProgramVisitor and GenerateCode
+    for the object-graph AST and for an ASTArena
+    '''
+    import tracemalloc
+    from . import arena
+    from .ast import flatten
+    from .checker import CheckProgramVisitor, check_program
+    from .ircode import GenerateCode
+    from .parser import parse
+
+    source = synthesize(100000)
+    trees = {}
+    for name, build in [('objects', lambda: parse(source, lexer='scanner', parser='descent')),
+                        ('arena', lambda: arena.parse(source).ast)]:
+        tracemalloc.start()
+        ast = build()
+        parsed = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stderr(io.StringIO()):
+            check_program(ast)
+        checked = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        trees[name] = ast, parsed, checked
+
+    nodes = sum(1 for _ in flatten(trees['objects'][0]))
+    print(f'synthetic 100000 lines: {nodes} nodes')
+    for name, (ast, parsed, checked) in trees.items():
+        check = timeit(lambda: CheckProgramVisitor().visit(ast))
+        generate = timeit(lambda: GenerateCode().visit(ast))
+        print(f'    {name:8} {parsed/nodes:6.1f} bytes/node parsed'
+              f' {checked/nodes:6.1f} checked'
+              f' {nodes/check:10,.0f} nodes/sec checking'
+              f' {nodes/generate:10,.0f} generating code')
+
+def bench_interp():
+    '''
+    Run time of Tests/mandel.g in the interpreter, with variables named
+    by name and by slot
+    '''
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+
+    with open(os.path.join(_tests, 'mandel.g')) as f:
+        source = f.read()
+    print('mandel.g')
+    for slots in (False, True):
+        functions = compile_ircode(source, slots)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = timeit(lambda: Interpreter().execute(functions), repeat=1)
+        print(f"    {'slots' if slots else 'names':8} {elapsed:8.3f}s")
+
+def bench_packed():
+    '''
+    Memory per instruction of the packed IR and of the same code as a
+    list of tuples, and the speed of reading each
+    '''
+    import tracemalloc
+    from .ircode import Function, compile_ircode
+
+    source = synthesize(20000)
+    with contextlib.redirect_stderr(io.StringIO()):
+        functions = compile_ircode(source, slots=True)
+    tuples = [list(function.body) for function in functions]
+    tracemalloc.start()
+    copies = []
+    for function, body in zip(functions, tuples):
+        copy = Function(function.name)
+        copy.body = body
+        copies.append(copy)
+    packed = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # As made by GenerateCode before, with one string per register
+    tracemalloc.start()
+    names = { }
+    copies = [[tuple([names.setdefault(operand, operand) if operand.__class__ is str else operand
+                      for operand in inst]) for inst in body] for body in tuples]
+    unpacked = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copies, names
+    count = sum(len(function) for function in functions)
+
+    def read_packed():
+        for function in functions:
+            for op, operands in function.instructions():
+                pass
+    def read_tuples():
+        for body in tuples:
+            for inst in body:
+                pass
+    print(f'synthetic 20000 lines: {count} instructions')
+    print(f'    packed {packed/count:6.1f} bytes/instruction'
+          f' {count/timeit(read_packed):12,.0f} instructions/sec read')
+    print(f'    tuples {unpacked/count:6.1f} bytes/instruction'
+          f' {count/timeit(read_tuples):12,.0f} instructions/sec iterated')
+
+def bench_optimize():
+    '''
+    Instructions removed by each optimization pass from Tests/mandel.g
+    and its run time in the interpreter before and after
+    '''
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+    from .optimize import optimize
+
+    with open(os.path.join(_tests, 'mandel.g')) as f:
+        source = f.read()
+    functions = compile_ircode(source, slots=True)
+    print(f'mandel.g: {sum(len(function) for function in functions)} instructions')
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = timeit(lambda: Interpreter().execute(functions), repeat=1)
+    for name, removed in optimize(functions).items():
+        print(f'    {name:12} {removed:6} removed')
+    with contextlib.redirect_stdout(io.StringIO()):
+        after = timeit(lambda: Interpreter().execute(functions), repeat=1)
+    print(f'    interpreter  {before:8.3f}s before {after:8.3f}s after')
+
+def bench_dce():
+    '''
+    Instructions in each of Tests/*.g before and after dead code
+    elimination by itself, and after all the optimization passes
+    '''
+    from .dce import eliminate_dead_code
+    from .ircode import compile_ircode
+    from .optimize import optimize
+
+    totals = [0, 0, 0]
+    print(f"{'':20} {'before':>8} {'dce':>8} {'all':>8}")
+    for filename, source in test_programs():
+        with contextlib.redirect_stderr(io.StringIO()):
+            functions = compile_ircode(source, slots=True)
+        if not functions:
+            continue
+        counts = [sum(len(function) for function in functions)]
+        eliminate_dead_code(functions)
+        counts.append(sum(len(function) for function in functions))
+        functions = compile_ircode(source, slots=True)
+        optimize(functions)
+        counts.append(sum(len(function) for function in functions))
+        print(f'{filename:20} {counts[0]:8} {counts[1]:8} {counts[2]:8}')
+        totals = [total + count for total, count in zip(totals, counts)]
+    print(f"{'total':20} {totals[0]:8} {totals[1]:8} {totals[2]:8}")
+
+# A condition-heavy loop, with && and || (lazy) or with the right
+# operands evaluated first, as they were before short-circuit evaluation
+_conditions = '''\
+func expensive(n int) bool {{
+    var i int = 0;
+    var s int = 0;
+    while i < 20 {{
+        s = s + i * n;
+        i = i + 1;
+    }}
+    return s > 1000;
+}}
+func count(n int) int {{
+    var hits int = 0;
+    var i int = 0;
+    while i < n {{
+        {eager}
+        if i / 3 * 3 == i && {first} {{
+            hits = hits + 1;
+        }}
+        if i < 10 || {second} {{
+            hits = hits + 1;
+        }}
+        i = i + 1;
+    }}
+    return hits;
+}}
+func main() int {{
+    print count(3000);
+    return 0;
+}}
+'''
+
+def bench_shortcircuit():
+    '''
+    Run time of a condition-heavy loop in the interpreter, evaluating
+    the right operands of && and || always or only when needed
+    '''
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+
+    programs = [
+        ('always', _conditions.format(eager='var a bool = expensive(i); var b bool = expensive(i);',
+                                      first='a', second='b')),
+        ('needed', _conditions.format(eager='', first='expensive(i)', second='expensive(i)')),
+    ]
+    for optimize in (False, True):
+        print('-O' if optimize else 'no -O')
+        for name, source in programs:
+            functions = compile_ircode(source, slots=True, optimize=optimize)
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = timeit(lambda: Interpreter().execute(functions), repeat=1)
+            print(f'    {name:8} {elapsed:8.3f}s')
+
+def executed(functions):
+    '''
+    Return the number of instructions that the interpreter runs for the
+    program functions
+    '''
+    from .interp import Interpreter
+
+    class Counter(Interpreter):
+        count = 0
+
+        def _prepare(self, function):
+            code, labels, registers = super()._prepare(function)
+            return [(self._counted(method), args) for method, args in code], labels, registers
+
+        def _counted(self, method):
+            def run(*args):
+                self.count += 1
+                return method(*args)
+            return run
+
+    interpreter = Counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.execute(functions)
+    return interpreter.count
+
+def bench_gvn():
+    '''
+    Instructions run by the interpreter for Tests/mandel.g, with and
+    without value numbering, by itself and after the other passes
+    '''
+    from .ircode import compile_ircode
+    from .optimize import PASSES, optimize
+
+    with open(os.path.join(_tests, 'mandel.g')) as f:
+        source = f.read()
+    others = [name for name, run in PASSES if name != 'gvn']
+    print('mandel.g, instructions run')
+    for name, passes in [('none', []), ('gvn', ['gvn']),
+                         ('others', others), ('others + gvn', others + ['gvn'])]:
+        functions = compile_ircode(source, slots=True)
+        optimize(functions, passes)
+        print(f'    {name:14} {executed(functions):12,}')
+
+def bench_licm():
+    '''
+    Instructions run by the interpreter for the nested loops of
+    Tests/mandel.g, nestedwhile.g and nestedcond.g, with and without
+    loop-invariant code motion, by itself and after the other passes
+    '''
+    from .ircode import compile_ircode
+    from .optimize import PASSES, optimize
+
+    others = [name for name, run in PASSES if name != 'licm']
+    runs = [('none', []), ('licm', ['licm']), ('others', others), ('others + licm', None)]
+    print(f"{'instructions run':16}" + ''.join(f'{name:>15}' for name, passes in runs))
+    for filename in ('mandel.g', 'nestedwhile.g', 'nestedcond.g'):
+        with open(os.path.join(_tests, filename)) as f:
+            source = f.read()
+        counts = []
+        for name, passes in runs:
+            functions = compile_ircode(source, slots=True)
+            optimize(functions, passes)
+            counts.append(executed(functions))
+        print(f'{filename:16}' + ''.join(f'{count:15,}' for count in counts))
+
+def bench_inline():
+    '''
+    Calls inlined in Tests/mandel.g and func.g, and the instructions
+    run and time taken by the interpreter after the other passes, with
+    and without inlining
+    '''
+    from .inline import inline_calls
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+    from .optimize import PASSES, optimize
+
+    others = [name for name, run in PASSES if name != 'inline']
+    for filename in ('mandel.g', 'func.g'):
+        with open(os.path.join(_tests, filename)) as f:
+            source = f.read()
+        print(filename)
+        for name in ('others', 'inline'):
+            functions = compile_ircode(source, slots=True)
+            inlined = []
+            if name == 'inline':
+                inline_calls(functions, inlined=inlined)
+            optimize(functions, others)
+            count = executed(functions)
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = timeit(lambda: Interpreter().execute(functions))
+            print(f'    {name:8} {count:12,} instructions {elapsed:8.3f}s')
+            for caller, callee in inlined:
+                print(f'        {callee} inlined into {caller}')
+
+def bench_tailcall():
+    '''
+    Interpreter time of a self tail-recursive sum() of n numbers, with
+    calls and after tail-call elimination
+    '''
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+    from .tailcall import eliminate_tail_calls
+
+    source = ('func sum(n int, acc int) int {\n'
+              '    if n == 0 { return acc; }\n'
+              '    return sum(n - 1, acc + n);\n'
+              '}\n'
+              'func main() int { print sum({n}, 0); return 0; }\n')
+    print(f"{'n':>8} {'calls':>16} {'tailcall':>10}")
+    for n in (100, 1000, 100000):
+        times = []
+        for eliminate in (False, True):
+            functions = compile_ircode(source.replace('{n}', str(n)), slots=True)
+            if eliminate:
+                eliminate_tail_calls(functions)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    times.append(f'{timeit(lambda: Interpreter().execute(functions), repeat=1):9.3f}s')
+            except RecursionError:
+                times.append('RecursionError')
+        print(f'{n:8} {times[0]:>16} {times[1]:>10}')
+
+def bench_ipcp():
+    '''
+    Size of the code of Tests/mandel.g and func.g, and the instructions
+    run and time taken by the interpreter, optimized with and without
+    the clones of ipcp, and with and without inlining
+    '''
+    from .interp import Interpreter
+    from .ircode import compile_ircode
+    from .optimize import PASSES, optimize
+
+    for filename in ('mandel.g', 'func.g'):
+        with open(os.path.join(_tests, filename)) as f:
+            source = f.read()
+        print(filename)
+        for without in (['ipcp'], [], ['inline', 'ipcp'], ['inline']):
+            passes = [name for name, run in PASSES if name not in without]
+            functions = compile_ircode(source, slots=True)
+            optimize(functions, passes)
+            size = sum(len(function) for function in functions)
+            count = executed(functions)
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = timeit(lambda: Interpreter().execute(functions))
+            name = ' '.join(f'-{name}' for name in without) or 'all'
+            print(f'    {name:16} {len(functions):3} functions {size:5} instructions '
+                  f'{count:12,} run {elapsed:8.3f}s')
+
+def bench_types():
+    '''
+    Checking plus IR generation on expression-heavy code, and the
+    operator type checks by themselves
+    '''
+    from .ast import flatten
+    from .checker import check_program
+    from .ircode import GenerateCode
+    from .parser import parse
+    from .typesys import check_binop, builtin_types
+
+    source = kernel(5000)
+    ast = parse(source, lexer='scanner', parser='descent')
+    nodes = sum(1 for _ in flatten(ast))
+    def compile():
+        check_program(ast)
+        GenerateCode().visit(ast)
+    print(f'kernel 5000 lines: {nodes} nodes')
+    print(f'    check + GenerateCode {nodes/timeit(compile):12,.0f} nodes/sec')
+
+    float_type = builtin_types['float']
+    ops = ['+', '-', '*', '/', '<', '==', '&&'] * 10000
+    def checks():
+        for op in ops:
+            check_binop(float_type, op, float_type)
+    print(f'    check_binop          {len(ops)/timeit(checks):12,.0f} calls/sec')
+
+def bench_parallel():
+    '''
+    The checker with the bodies of functions checked sequentially and by
+    1, 2 and os.cpu_count() worker processes
+    '''
+    from .checker import check_program
+    from .parser import parse
+
+    source = synthesize(100000)
+    lines = source.count('\n')
+    print(f'synthetic {lines} lines, {os.cpu_count()} cpus')
+    for processes in [None, 1, 2, 0]:
+        def check():
+            ast = parse(source, lexer='scanner', parser='descent')
+            start = time.perf_counter()
+            check_program(ast, processes)
+            return time.perf_counter() - start
+        elapsed = min(check() for _ in range(3))
+        name = 'sequential' if processes is None else f'{processes or os.cpu_count()} processes'
+        print(f'    {name:14} {lines/elapsed:12,.0f} lines/sec')
+
+def main():
+    import sys
+
+    benchmarks = sorted(name[6:] for name in globals() if name.startswith('bench_'))
+    if len(sys.argv) < 2 or any(name not in benchmarks for name in sys.argv[1:]):
+        sys.stderr.write(f"Usage: python3 -m gone.bench {'|'.join(benchmarks)} ...\n")
+        raise SystemExit(1)
+
+    for name in sys.argv[1:]:
+        globals()['bench_' + name]()
+
+if __name__ == '__main__':
+    main()
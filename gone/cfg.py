@@ -0,0 +1,379 @@
+# gone/cfg.py
+'''
+Control-flow graph
+==================
+The code of a function made by GenerateCode (see ircode.py) is one
+sequence of instructions, in which LABEL, BRANCH, CBRANCH and RET
+divide the code into basic blocks: straight runs of instructions that
+are only entered at the top and only left at the bottom.  CFG makes
+these blocks explicit:
+
+     cfg = CFG(function)
+     for block in cfg.blocks:
+         print(block.label, block.preds, block.succs)
+
+A BasicBlock has a label, its instructions as (Op, operands) pairs as
+given by Function.instructions() (without the LABEL that starts it),
+and its predecessors and successors.  The first block is labelled
+'entry'.  A block that ends without a branch falls through to the next
+one.  Code following a branch without a label of its own (as after a
+return in the middle of a loop) can't be reached; it is kept in a block
+labelled None, with no predecessors.
+
+Blocks keep the order of the code, and instructions() gives the code
+back in the same form, so that a pass can change the blocks and turn
+the graph into a Function again with function().  After changing the
+branches, call update() to recompute the edges, and remove_unreachable()
+to drop the blocks that can no longer be reached.  update() also drops
+the values that PHI instructions (see ssa.py) take from blocks that are
+no longer predecessors.
+
+The graph also gives the dominator tree: block a dominates block b if
+every path from the entry to b goes through a.  idom maps each block
+that can be reached to its immediate dominator (the entry to None), and
+children to the blocks that it immediately dominates.  They are found
+with the iterative algorithm of Cooper, Harvey and Kennedy ("A Simple,
+Fast Dominance Algorithm").  The dominance frontier of a block,
+frontiers[block], is the set of blocks where its dominance ends: those
+with a predecessor that the block dominates but which it does not
+strictly dominate itself.
+
+loops lists the natural loops.  An edge from a block to one that
+dominates it is a back edge, and the loop of a header is the header
+plus the blocks that reach one of its back edges without going through
+the header.  Loops are listed innermost first.
+
+Function.cfg() builds the graph of a function once, for the passes, the
+interpreter and the LLVM generator to share.  To print the graph of the
+functions of a program, run:
+
+     bash % python3 -m gone.cfg someprogram.g
+'''
+
+from .ircode import Function, Op
+
+# Instructions that end a block
+_terminators = {Op.BRANCH, Op.CBRANCH, Op.RET}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+
+class BasicBlock(object):
+    '''
+    A basic block: a label, the instructions as (op, operands) pairs and
+    the lists of predecessor and successor blocks
+    '''
+    def __init__(self, label):
+        self.label = label
+        self.instructions = []
+        self.preds = []
+        self.succs = []
+
+    @property
+    def terminator(self):
+        '''
+        The branch or return ending the block, or None if it falls through
+        '''
+        if self.instructions and self.instructions[-1][0] in _terminators:
+            return self.instructions[-1]
+        return None
+
+    def __repr__(self):
+        return f'BasicBlock({self.label!r})'
+
+class Loop(object):
+    '''
+    A natural loop: its header, the blocks of the loop (in the order of
+    the code) and the latches, the blocks with a back edge to the header
+    '''
+    def __init__(self, header, blocks, latches):
+        self.header = header
+        self.blocks = blocks
+        self.latches = latches
+
+    @property
+    def exits(self):
+        '''
+        The blocks outside the loop that are successors of blocks in it
+        '''
+        inside = set(self.blocks)
+        exits = []
+        for block in self.blocks:
+            for succ in block.succs:
+                if succ not in inside and succ not in exits:
+                    exits.append(succ)
+        return exits
+
+    def __contains__(self, block):
+        return block in self.blocks
+
+    def __repr__(self):
+        return f'Loop({self.header.label!r}, {[block.label for block in self.blocks]})'
+
+class CFG(object):
+    '''
+    The control-flow graph of the Function function
+    '''
+    def __init__(self, function):
+        self.name = function.name
+        self.return_type = function.return_type
+        self.param_names = function.param_names
+        self.param_types = function.param_types
+        self.frame_size = function.frame_size
+
+        self.entry = BasicBlock('entry')
+        self.blocks = [self.entry]
+        block = self.entry
+        for op, operands in function.instructions():
+            if op is Op.LABEL:
+                block = BasicBlock(operands[0])
+                self.blocks.append(block)
+                continue
+            if block.terminator:
+                # Nothing branches here
+                block = BasicBlock(None)
+                self.blocks.append(block)
+            block.instructions.append((op, operands))
+        self.update()
+
+    def update(self):
+        '''
+        Recompute the edges (and the dominators and loops when next
+        asked for) from the branches of the blocks
+        '''
+        self.labels = {block.label: block for block in self.blocks if block.label is not None}
+        for block in self.blocks:
+            block.preds = []
+            block.succs = []
+        for n, block in enumerate(self.blocks):
+            terminator = block.terminator
+            if terminator is None:
+                succs = self.blocks[n + 1:n + 2]
+            elif terminator[0] is Op.BRANCH:
+                succs = [self.labels[terminator[1][0]]]
+            elif terminator[0] is Op.CBRANCH:
+                succs = [self.labels[label] for label in terminator[1][1:]]
+            else:
+                succs = []
+            for succ in succs:
+                if succ not in block.succs:
+                    block.succs.append(succ)
+                    succ.preds.append(block)
+        for block in self.blocks:
+            if block.instructions and block.instructions[0][0] in _phis:
+                self._prune_phis(block)
+        self._idom = None
+        self._children = None
+        self._frontiers = None
+        self._loops = None
+
+    def _prune_phis(self, block):
+        '''
+        Drop the values that the PHIs of block take from blocks that are
+        no longer predecessors
+        '''
+        preds = {pred.label for pred in block.preds}
+        for n, (op, operands) in enumerate(block.instructions):
+            if op not in _phis:
+                break
+            incoming = [operand for label, register in zip(operands[:-1:2], operands[1:-1:2])
+                        if label in preds for operand in (label, register)]
+            if len(incoming) < len(operands) - 1:
+                block.instructions[n] = (op, (*incoming, operands[-1]))
+
+    def remove_unreachable(self):
+        '''
+        Remove the blocks that can't be reached from the entry
+        '''
+        reachable = set(self.reverse_postorder())
+        if len(reachable) < len(self.blocks):
+            self.blocks = [block for block in self.blocks if block in reachable]
+            self.update()
+
+    def instructions(self):
+        '''
+        Generate the code of the graph as (op, operands) pairs, in the
+        form of Function.instructions()
+        '''
+        for block in self.blocks:
+            if block is not self.entry and block.label is not None:
+                yield Op.LABEL, (block.label,)
+            yield from block.instructions
+
+    def function(self, function=None):
+        '''
+        Return a new Function holding the code of the graph, or if function
+        is given, replace its code with that of the graph
+        '''
+        if function is None:
+            function = Function(self.name, self.return_type, self.param_names, self.param_types)
+        else:
+            function.clear()
+        function.frame_size = self.frame_size
+        for op, operands in self.instructions():
+            function.emit(op, *operands)
+        function._cfg = self
+        return function
+
+    def reverse_postorder(self):
+        '''
+        Return the blocks that can be reached from the entry, in reverse
+        postorder
+        '''
+        order = []
+        seen = {self.entry}
+        stack = [(self.entry, iter(self.entry.succs))]
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+    @property
+    def idom(self):
+        if self._idom is None:
+            self._idom = self._dominators()
+        return self._idom
+
+    @property
+    def children(self):
+        '''
+        The blocks immediately dominated by each block, as a dict of
+        lists in the order of the code
+        '''
+        if self._children is None:
+            idom = self.idom
+            children = {block: [] for block in self.blocks if block in idom}
+            for block in children:
+                if idom[block] is not None:
+                    children[idom[block]].append(block)
+            self._children = children
+        return self._children
+
+    def dominates(self, a, b):
+        '''
+        Return True if block a dominates block b
+        '''
+        idom = self.idom
+        if b not in idom:
+            return False
+        while b is not None:
+            if b is a:
+                return True
+            b = idom[b]
+        return False
+
+    @property
+    def frontiers(self):
+        '''
+        The dominance frontier of each block that can be reached, as a dict
+        of sets
+        '''
+        if self._frontiers is None:
+            idom = self.idom
+            frontiers = {block: set() for block in idom}
+            for block in idom:
+                preds = [pred for pred in block.preds if pred in idom]
+                if len(preds) < 2:
+                    continue
+                for pred in preds:
+                    # Walk up from each predecessor to the immediate
+                    # dominator of the join
+                    runner = pred
+                    while runner is not idom[block]:
+                        frontiers[runner].add(block)
+                        runner = idom[runner]
+            self._frontiers = frontiers
+        return self._frontiers
+
+    def _dominators(self):
+        order = self.reverse_postorder()
+        number = {block: n for n, block in enumerate(order)}
+        idom = {self.entry: self.entry}
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new = None
+                for pred in block.preds:
+                    if pred not in idom:
+                        continue
+                    if new is None:
+                        new = pred
+                        continue
+                    # Walk up from both to their closest common dominator
+                    a, b = pred, new
+                    while a is not b:
+                        while number[a] > number[b]:
+                            a = idom[a]
+                        while number[b] > number[a]:
+                            b = idom[b]
+                    new = a
+                if idom.get(block) is not new:
+                    idom[block] = new
+                    changed = True
+        idom[self.entry] = None
+        return idom
+
+    @property
+    def loops(self):
+        if self._loops is None:
+            self._loops = self._find_loops()
+        return self._loops
+
+    def _find_loops(self):
+        latches = { }
+        for block in self.idom:
+            for succ in block.succs:
+                if self.dominates(succ, block):
+                    latches.setdefault(succ, []).append(block)
+        loops = []
+        for header, tails in latches.items():
+            body = {header}
+            stack = [tail for tail in tails if tail is not header]
+            body.update(stack)
+            while stack:
+                for pred in stack.pop().preds:
+                    if pred not in body and pred in self.idom:
+                        body.add(pred)
+                        stack.append(pred)
+            blocks = [block for block in self.blocks if block in body]
+            loops.append(Loop(header, blocks, tails))
+        loops.sort(key=lambda loop: len(loop.blocks))
+        return loops
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import as_tuple, compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.cfg filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    for function in functions:
+        cfg = function.cfg()
+        print('FUNCTION:', function.name)
+        for block in cfg.blocks:
+            idom = cfg.idom.get(block)
+            print(f'{block.label}: preds {[pred.label for pred in block.preds]}'
+                  f' succs {[succ.label for succ in block.succs]}'
+                  f' idom {idom.label if idom else None}')
+            for op, operands in block.instructions:
+                print('\t', as_tuple(op, operands))
+        for loop in cfg.loops:
+            print('loop', loop.header.label, [block.label for block in loop.blocks])
+        print('='*80)
+
+if __name__ == '__main__':
+    main()
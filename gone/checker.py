@@ -105,10 +105,10 @@ It's not always clear how to best organize all of that.  So, expect to
 fumble around a bit at first.
 '''
 
-from .errors import error
+from .errors import error, collect_errors, report
 from .ast import *
-from .typesys import check_binop, check_unaryop, builtin_types
-from collections import ChainMap
+from .typesys import check_binop, check_unaryop, builtin_types, INT, FLOAT, CHAR, BOOL, VOID, ERROR
+from collections import namedtuple
 
 class CheckProgramVisitor(NodeVisitor):
     '''
@@ -116,12 +116,26 @@ class CheckProgramVisitor(NodeVisitor):
     in ast.py.   You need to define methods of the form visit_NodeName()
     for each kind of AST node that you want to process.  You may need to
     adjust the method names here if you've picked different AST node names.
+
+    Methods that visit the children of a node are generators yielding
+    the children (see NodeVisitor in ast.py), so that deeply nested
+    programs are checked without recursion.
+
+    Every declaration of a variable, constant or function argument is
+    given a Slot (see SymbolTable), and every SimpleLocation referring to
+    one gets the same Slot, so that code generation can address storage
+    by number instead of by name.
     '''
     def __init__(self):
         # Initialize the symbol table
-        self.symbols = SymbolMap()
+        self.symbols = SymbolTable()
         self._function = None
 
+        # If a list, the bodies of top-level functions are not checked
+        # but entered here as (node, number of global declarations
+        # visible to it), to be checked with check_function()
+        self.deferred = None
+
     def visit_ConstDeclaration(self, node):
         # For a declaration, you'll need to check that it isn't already defined.
         # You'll put the declaration into the symbol table so that it can be
@@ -132,9 +146,10 @@ class CheckProgramVisitor(NodeVisitor):
         if name in builtin_types:
             error(node.lineno, f'NameError: cannot declare variable with name {name}')
             return
-        elif name not in self.symbols.maps[0]:
+        elif not self.symbols.declared_here(name):
             self.symbols[name] = node
-            self.visit(node.value)
+            node.slot = node.name.slot = self.symbols.new_slot(name)
+            yield node.value
             node.type = node.value.type
         else:
             error(node.lineno, f'NameError: constant "{name}" already defined.')
@@ -146,116 +161,137 @@ class CheckProgramVisitor(NodeVisitor):
         if name in builtin_types:
             error(node.lineno, f'NameError: cannot declare variable with name {name}')
             return
-        elif name not in self.symbols.maps[0]:
+        elif not self.symbols.declared_here(name):
             self.symbols[name] = node
-            self.visit(node.datatype)
+            node.slot = node.name.slot = self.symbols.new_slot(name)
+            yield node.datatype
             node.type = node.datatype.type
         else:
             error(node.lineno, f'NameError: variable "{name}" already defined.')
             return
         if node.value is not None:
-            self.visit(node.value)
-            if node.value.type != 'error' and node.type != node.value.type:
+            yield node.value
+            if node.value.type is not ERROR and node.type != node.value.type:
                 error(node.lineno, f'TypeError: assigning type {node.value.type} to "{node.name.name}" of type {node.type}')
 
     def visit_Assignment(self, node):
         node.name.usage = 'write'
-        self.visit(node.name)
-        self.visit(node.value)
-        if 'error' not in {node.name.type, node.value.type} and node.name.type != node.value.type:
+        yield node.name
+        yield node.value
+        if node.name.type is not ERROR and node.value.type is not ERROR and node.name.type != node.value.type:
             error(node.lineno, f'TypeError: assigning type {node.value.type} to "{node.name.name}" of type {node.name.type}')
 
     def visit_IfStatement(self, node):
-        self.symbols = self.symbols.new_child()
-        self.visit(node.condition)
-        if node.condition.type != 'bool':
+        self.symbols.enter_scope()
+        yield node.condition
+        if node.condition.type is not BOOL:
             error(node.lineno, 'TypeError: if-statement condition is not a boolean')
             return
         if self._function is not None:
             self._function.branch()
-        self.visit(node.then_block)
+        yield node.then_block
         if self._function is not None:
             self._function.branch()
-        self.visit(node.else_block)
-        self.symbols = self.symbols.parents
+        yield node.else_block
+        self.symbols.leave_scope()
 
     def visit_WhileStatement(self, node):
-        self.symbols = self.symbols.new_child()
-        self.visit(node.condition)
-        if node.condition.type != 'bool':
+        self.symbols.enter_scope()
+        yield node.condition
+        if node.condition.type is not BOOL:
             error(node.lineno, 'TypeError: while-statement condition is not a boolean')
             return
-        self.visit(node.loop_block)
-        self.symbols = self.symbols.parents
+        yield node.loop_block
+        self.symbols.leave_scope()
 
     def visit_ForStatement(self, node):
-        self.visit(node.init)
-        self.visit(node.cond)
-        if node.cond.type != 'bool':
+        yield node.init
+        yield node.cond
+        if node.cond.type is not BOOL:
             error(node.lineno, 'TypeError: for-statement condition is not a boolean')
-        self.visit(node.step)
-        self.visit(node.body)
+        yield node.step
+        yield node.body
 
     def visit_FuncDeclaration(self, node):
         node.callable = True
         self.symbols[node.name] = node
-        self.visit(node.datatype)
+        yield node.datatype
         node.type = node.datatype.type
-        self.symbols = self.symbols.new_child()
-        self.visit(node.arguments)
+        self.symbols.enter_function()
+        yield node.arguments
+        if self.deferred is not None and len(self.symbols.marks) == 1:
+            self.deferred.append((node, len(self.symbols.top_level)))
+            self.symbols.leave_function()
+            return
+        yield from self._check_body(node)
+
+    def _check_body(self, node):
         self._function = Function(node.type)
-        self.visit(node.body)
+        yield node.body
         # if not self._function.returned:
         #     if node.type != 'void':
         #         error(node.lineno, 'TypeError: missing return statement')
         self._function = None
-        node.symbols = self.symbols
-        self.symbols = self.symbols.parents
+        node.symbols = self.symbols.leave_function()
+
+    def check_function(self, node):
+        '''
+        Check the body of the top-level function node, whose signature
+        has been checked.  The global declarations that it sees must be
+        in the symbol table.
+        '''
+        self.symbols.enter_function()
+        for arg in node.arguments:
+            self.symbols[arg.name] = arg
+        self.symbols.frame = len(node.arguments)
+        self._run(self._check_body(node))
 
     def visit_FuncArgument(self, node):
         node.writeable = True
+        node.callable = False
         self.symbols[node.name] = node
-        self.visit(node.datatype)
+        node.slot = self.symbols.new_slot(node.name)
+        yield node.datatype
         node.type = node.datatype.type
 
     def visit_FunctionCall(self, node):
         node.name.usage = 'read'
-        self.visit(node.name)
-        self.visit(node.arguments)
+        yield node.name
+        yield node.arguments
         try:
             func = self.symbols[node.name.name]
             if not func.callable:
                 error(node.lineno, f'TypeError: "{node.name.name}" is not callable.')
-                node.type = 'error'
+                node.type = ERROR
                 return
             if len(func.arguments) != len(node.arguments):
                 error(node.lineno, f'TypeError: {func.name}() takes {len(func.arguments)} argument{"s" if len(func.arguments) > 1 else ""} but {len(node.arguments)} given')
-                node.type = 'error'
+                node.type = ERROR
                 return
             expected_types = tuple(arg.type for arg in func.arguments)
             call_types = tuple(arg.type for arg in node.arguments)
             if expected_types != call_types:
                 error(node.lineno, f'TypeError: {func.name}() expecting {expected_types}, got {call_types}')
-                node.type = 'error'
+                node.type = ERROR
                 return
         except KeyError:
-            node.type = 'error'
+            node.type = ERROR
             return
         node.type = node.name.type
 
     def visit_ReturnStatement(self, node):
-        self.visit(node.value)
-        node.type = node.value.type if node.value is not None else 'void'
+        yield node.value
+        node.type = node.value.type if node.value is not None else VOID
         if self._function is not None:
             if node.type != self._function.return_type:
                 error(node.lineno, f'TypeError: returning {node.type} instead of {self._function.return_type}')
-                self._function.type = 'error'
+                self._function.type = ERROR
             self._function.return_branch(node.type)
         else:
             error(node.lineno, f'TypeError: returning outside a function.')
 
     def visit_PrintStatement(self, node):
-        self.visit(node.value)
+        yield node.value
 
     def visit_SimpleLocation(self, node):
         # A location represents a place where you can read/write a value.
@@ -263,55 +299,57 @@ class CheckProgramVisitor(NodeVisitor):
         try:
             symbol = self.symbols[node.name]
             node.type = symbol.type
+            if not symbol.callable:
+                node.slot = symbol.slot
             if node.usage == 'write' and not symbol.writeable:
                 error(node.lineno, f'TypeError: cannot assign to constant "{node.name}"')
         except KeyError:
             error(node.lineno, f'NameError: symbol "{node.name}" undefined.')
-            node.type = 'error'
+            node.type = ERROR
 
     def visit_ReadLocation(self, node):
         node.location.usage = 'read'
-        self.visit(node.location)
+        yield node.location
         node.type = node.location.type
 
     def visit_IntegerLiteral(self, node):
         # For literals, you'll need to assign a type to the node and allow it to
         # propagate.  This type will work it's way through various operators
-        node.type = 'int'
+        node.type = INT
 
     def visit_FloatLiteral(self, node):
-        node.type = 'float'
+        node.type = FLOAT
 
     def visit_CharLiteral(self, node):
-        node.type = 'char'
+        node.type = CHAR
 
     def visit_BoolLiteral(self, node):
-        node.type = 'bool'
+        node.type = BOOL
 
     def visit_BinOp(self, node):
         # For operators, you need to visit each operand separately.  You'll
         # then need to make sure the types and operator are all compatible.
-        self.visit(node.left)
-        self.visit(node.right)
+        yield node.left
+        yield node.right
         node.type = check_binop(node.left.type, node.op, node.right.type)
-        if 'error' not in {node.left.type, node.right.type} and node.type == 'error':
+        if node.left.type is not ERROR and node.right.type is not ERROR and node.type is ERROR:
             msg = f'TypeError: performing "{node.op}" on {node.left.type} and {node.right.type}'
             error(node.lineno, msg)
 
     def visit_UnaryOp(self, node):
-        self.visit(node.value)
+        yield node.value
         node.type = check_unaryop(node.op, node.value.type)
-        if node.value.type != 'error' and node.type == 'error':
+        if node.value.type is not ERROR and node.type is ERROR:
             msg = f'TypeError: performing "{node.op}" on {node.value.type}'
             error(node.lineno, msg)
 
     def visit_SimpleType(self, node):
         # Associate a type name such as "int" with a Type object
         if node.name in builtin_types:
-            node.type = node.name
+            node.type = builtin_types[node.name]
         else:
             error(node.lineno, f'TypeError: unknown type "{node.name}"')
-            node.type = 'error'
+            node.type = ERROR
 
 class Function:
     def __init__(self, return_type):
@@ -338,32 +376,266 @@ class Branch:
     def __bool__(self):
         return bool(self.return_type)
 
-class SymbolMap(ChainMap):
-    def __init__(self, *maps):
-        assert all(isinstance(m, ScopeDict) for m in maps)
-        self.maps = list(maps) or [ScopeDict('global')]
+# Kinds of storage of a Slot
+GLOBAL, LOCAL = 0, 1
 
-    def new_child(self):
-        return super().new_child(ScopeDict('local'))
+# Where the value of a variable, constant or function argument is kept:
+# slot index of the global variables (scope GLOBAL) or of the frame of
+# the function that declares it (scope LOCAL).  name is for messages
+# and for naming the storage in generated code.
+Slot = namedtuple('Slot', ['scope', 'index', 'name'])
 
-class ScopeDict(dict):
-    def __init__(self, scope='local'):
-        self.scope = scope
+class SymbolTable(object):
+    '''
+    Flat symbol table.  bindings maps each name to its innermost visible
+    declaration and the depth of the scope declaring it.  A declaration
+    records the binding that it shadows in an undo log, and leaving a
+    scope pops the log back to where it was when the scope was entered,
+    so entering or leaving a scope and looking up a name take the same
+    time however deeply scopes are nested.
+
+    new_slot() numbers storage: global declarations in order, and the
+    declarations in functions (or in blocks outside of any function,
+    which belong to the module initialization code) in order within
+    the frame of their function, arguments first.
+    '''
+    def __init__(self):
+        self.bindings = { }     # name -> (declaration, depth)
+        self.top_level = []     # (name, declaration) of all global declarations
+        self.log = []           # (name, shadowed binding or None)
+        self.marks = []         # Length of log when each open scope was entered
+        self.globals = 0        # Number of global slots
+        self.frame = 0          # Number of slots in the current frame
+        self._frames = []       # Sizes of the frames of enclosing functions
+
+    def __contains__(self, name):
+        return name in self.bindings
+
+    def __getitem__(self, name):
+        return self.bindings[name][0]
+
+    def __setitem__(self, name, node):
+        depth = len(self.marks)
+        node.scope = 'local' if depth else 'global'
+        if not depth:
+            self.top_level.append((name, node))
+        self.log.append((name, self.bindings.get(name)))
+        self.bindings[name] = (node, depth)
+
+    def declared_here(self, name):
+        '''
+        Whether name is declared in the innermost scope
+        '''
+        binding = self.bindings.get(name)
+        return binding is not None and binding[1] == len(self.marks)
+
+    def new_slot(self, name):
+        if not self.marks:
+            self.globals += 1
+            return Slot(GLOBAL, self.globals - 1, name)
+        self.frame += 1
+        return Slot(LOCAL, self.frame - 1, name)
+
+    def enter_scope(self):
+        self.marks.append(len(self.log))
+
+    def leave_scope(self):
+        '''
+        Leave the innermost scope, returning a dict of the declarations
+        made in it by name
+        '''
+        mark = self.marks.pop()
+        entries = self.log[mark:]
+        del self.log[mark:]
+        declared = {name: self.bindings[name][0] for name, _ in entries}
+        for name, shadowed in reversed(entries):
+            if shadowed is None:
+                del self.bindings[name]
+            else:
+                self.bindings[name] = shadowed
+        return declared
+
+    def enter_function(self):
+        self._frames.append(self.frame)
+        self.frame = 0
+        self.enter_scope()
+
+    def leave_function(self):
+        declared = self.leave_scope()
+        self.frame = self._frames.pop()
+        return declared
 
-    def __setitem__(self, key, value):
-        value.scope = self.scope
-        super().__setitem__(key, value)
+# ----------------------------------------------------------------------
+# Parallel checking
+#
+# Once the global declarations and the signatures of the functions
+# before it are known, the body of a top-level function can be checked
+# by itself.  check_parallel() first checks everything but those bodies
+# in order, then hands the bodies to a pool of processes in batches of
+# consecutive functions.  The workers get the program and the global
+# declarations when they start (without copying, where processes are
+# forked), and a job is just the position of a function in the program
+# and the number of global declarations that it sees.  Sending checked
+# trees back would cost much more than checking them, so a worker only
+# returns the attributes that the checker set on the nodes of the
+# function (see _annotations()), with the errors that it found.  The
+# errors are reported after those of the statements before the
+# function, in the same order as the sequential checker reports them.
+# ----------------------------------------------------------------------
+
+class _Missing(object):
+    '''
+    Marks an attribute that is not set (the class itself is used)
+    '''
+
+# Names of the attributes of each node class
+_attribute_names = { }
+
+def _attributes_of(cls):
+    try:
+        return _attribute_names[cls]
+    except KeyError:
+        names = tuple(name for klass in reversed(cls.__mro__)
+                      for name in vars(klass).get('_attributes', ()) if name != 'lineno')
+        _attribute_names[cls] = names
+        return names
+
+def _preorder(top):
+    '''
+    Return the nodes of the subtree top in preorder
+    '''
+    nodes = []
+    stack = [top]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, AST):
+            nodes.append(node)
+            stack.extend(getattr(node, name) for name in reversed(node._fields))
+    return nodes
+
+def _annotations(top):
+    '''
+    Return the attributes of the nodes of the subtree top, as a list of
+    tuples in preorder.  In the dict of symbols of a function, nodes
+    are replaced by their positions in the list.
+    '''
+    nodes = _preorder(top)
+    positions = {id(node): n for n, node in enumerate(nodes)}
+    annotations = []
+    for node in nodes:
+        names = _attributes_of(node.__class__)
+        values = [getattr(node, name, _Missing) for name in names]
+        if isinstance(node, FuncDeclaration) and hasattr(node, 'symbols'):
+            symbols = {name: positions[id(symbol)] for name, symbol in node.symbols.items()}
+            values[names.index('symbols')] = symbols
+        annotations.append(tuple(values))
+    return annotations
+
+def _annotate(top, annotations):
+    '''
+    Set the attributes returned by _annotations() on the subtree top
+    '''
+    nodes = _preorder(top)
+    for node, values in zip(nodes, annotations):
+        for name, value in zip(_attributes_of(node.__class__), values):
+            if value is not _Missing:
+                setattr(node, name, value)
+        if isinstance(node, FuncDeclaration) and hasattr(node, 'symbols'):
+            node.symbols = {name: nodes[n] for name, n in node.symbols.items()}
+
+class _Symbol(object):
+    '''
+    Stand-in for a global declaration, holding the attributes that the
+    checker looks up on symbols
+    '''
+    def __init__(self, node):
+        for name in ('name', 'type', 'writeable', 'callable', 'slot'):
+            if hasattr(node, name):
+                setattr(self, name, getattr(node, name))
+        if isinstance(self.name, Location):
+            self.name = self.name.name
+        if isinstance(node, FuncDeclaration):
+            self.arguments = [_Symbol(arg) for arg in node.arguments]
+
+# The program and its global declarations in a worker process
+_program = None
+_globals = []
+
+def _start_worker(ast, symbols):
+    global _program, _globals
+    _program = ast
+    _globals = symbols
+
+def _check_batch(jobs):
+    '''
+    Check the bodies of the functions in jobs, a list of (position in the
+    program, number of global declarations visible) in order.  Return a
+    list of (annotations, errors).
+    '''
+    checker = CheckProgramVisitor()
+    bound = 0
+    results = []
+    for position, visible in jobs:
+        for name, symbol in _globals[bound:visible]:
+            checker.symbols[name] = symbol
+        bound = visible
+        node = _program[position]
+        with collect_errors() as errors:
+            checker.check_function(node)
+        results.append((_annotations(node), errors))
+    return results
+
+def check_parallel(ast, processes=0):
+    '''
+    Check the program ast, checking the bodies of top-level functions in
+    parallel by processes worker processes (os.cpu_count() if 0)
+    '''
+    import concurrent.futures
+    import os
+
+    checker = CheckProgramVisitor()
+    checker.deferred = []
+    errors = []
+    for statement in ast:
+        with collect_errors() as statement_errors:
+            checker.visit(statement)
+        errors.append(statement_errors)
+
+    function_errors = { }
+    if checker.deferred:
+        positions = {id(statement): n for n, statement in enumerate(ast)}
+        jobs = [(positions[id(node)], visible) for node, visible in checker.deferred]
+        symbols = [(name, _Symbol(node)) for name, node in checker.symbols.top_level]
+        size = max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1)))
+        batches = [jobs[n:n + size] for n in range(0, len(jobs), size)]
+        with concurrent.futures.ProcessPoolExecutor(processes or None, initializer=_start_worker,
+                                                    initargs=(ast, symbols)) as pool:
+            for batch, results in zip(batches, pool.map(_check_batch, batches)):
+                for (position, _), (annotations, found) in zip(batch, results):
+                    _annotate(ast[position], annotations)
+                    function_errors[position] = found
+
+    for position, statement_errors in enumerate(errors):
+        report(statement_errors)
+        report(function_errors.get(position, []))
 
 # ----------------------------------------------------------------------
 #                       DO NOT MODIFY ANYTHING BELOW       
 # ----------------------------------------------------------------------
 
-def check_program(ast):
+def check_program(ast, processes=None):
     '''
-    Check the supplied program (in the form of an AST)
+    Check the supplied program (in the form of an AST).  If processes is
+    given, the bodies of top-level functions are checked in parallel by
+    that many worker processes (os.cpu_count() if 0).
     '''
-    checker = CheckProgramVisitor()
-    checker.visit(ast)
+    if processes is None:
+        checker = CheckProgramVisitor()
+        checker.visit(ast)
+    else:
+        check_parallel(ast, processes)
 
 def main():
     '''
@@ -376,7 +648,8 @@ def main():
         sys.stderr.write('Usage: python3 -m gone.checker filename\n')
         raise SystemExit(1)
 
-    ast = parse(open(sys.argv[1]).read())
+    with open(sys.argv[1]) as source:
+        ast = parse(source)
     check_program(ast)
     if '--show-types' in sys.argv:
         for depth, node in flatten(ast):
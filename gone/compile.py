@@ -28,8 +28,8 @@ def main():
         sys.stderr.write("Usage: python3 -m gone.compile filename\n")
         raise SystemExit(1)
 
-    source = open(sys.argv[1]).read()
-    llvm_code = compile_llvm(source)
+    with open(sys.argv[1]) as source:
+        llvm_code = compile_llvm(source)
     if not errors_reported():
         with tempfile.NamedTemporaryFile(suffix='.ll') as f:
             f.write(llvm_code.encode('utf-8'))
@@ -0,0 +1,305 @@
+# gone/constprop.py
+'''
+Constant propagation and folding
+================================
+GenerateCode turns every literal into a MOV and every use of a
+constant into a LOAD, so that
+
+     const width = 80.0;
+     ...
+     var dx float = (xmax - xmin)/width;
+
+does the arithmetic each time it runs.  propagate_constants() works out
+the values that are known before the program runs and does that work
+at compile time:
+
+  * A register set by a MOV holds a known value.  So does the target of
+    an arithmetic, comparison, logical or conversion instruction on
+    registers with known values, and such an instruction is replaced by
+    a MOV of its result (folding).
+
+  * A global variable that is stored exactly once, by its declaration
+    in the module initialization code outside any loop, with a known
+    value, is a constant: every const declared at the top level, and
+    variables that are never assigned after their declaration.  A LOAD
+    of it is replaced by a MOV of the value.  The checker only lets code
+    use a global after its declaration, so no LOAD runs before the
+    store.  A variable declared without a value and assigned later
+    isn't one, as a function called before the assignment may load it.
+    In __init, only the LOADs that the store dominates are replaced.
+
+  * Within a block, a LOAD of a variable that was just stored with a
+    known value gets the value, as long as there is no other store of
+    the variable (or, for a global, call) in between.
+
+  * A CBRANCH on a known value becomes a BRANCH, and the blocks that
+    can no longer be reached are removed.
+
+  * In SSA form (see ssa.py), a PHI whose registers all hold the same
+    known value becomes a MOV of it.
+
+Finally the MOVs whose registers are no longer used are removed.
+
+Folding must not change what a program does, in the interpreter or in
+the LLVM code.  Integers are 32 bits in the LLVM code and unbounded in
+the interpreter, so an integer result outside 32 bits isn't folded.
+DIVI is floor division in the interpreter and truncating division
+(sdiv) in LLVM; it is only folded when the two agree, that is, when the
+division is exact or the operands have the same sign.  Division by zero
+is left for the program to run into, and float results that are not
+finite, or comparisons involving a NaN, are not folded.
+
+To see the code of a program after the pass and the number of
+instructions it removed, run:
+
+     bash % python3 -m gone.constprop someprogram.g
+'''
+
+import math
+import operator
+
+from .checker import LOCAL
+from .ircode import Op, registers
+
+# Range of the integers of the LLVM code
+INT_MIN = -2**31
+INT_MAX = 2**31 - 1
+
+_compare = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+}
+
+def _int(value):
+    if INT_MIN <= value <= INT_MAX:
+        return value
+    return None
+
+def _float(value):
+    if math.isfinite(value):
+        return value
+    return None
+
+def _divi(left, right):
+    if right == 0 or (left % right and (left < 0) != (right < 0)):
+        return None
+    return _int(left // right)
+
+def _divf(left, right):
+    if right == 0:
+        return None
+    return _float(left / right)
+
+def _ftoi(value):
+    if not math.isfinite(value):
+        return None
+    return _int(int(value))
+
+def _compare_values(op, left, right):
+    if left != left or right != right:
+        # NaN
+        return None
+    return int(_compare[op](left, right))
+
+# For each instruction that can be folded: the MOV of the result and a
+# function computing it from the values of the operands (with the
+# operator first for CMP), or returning None if it must not be folded
+_folding = {
+    Op.ADDI: (Op.MOVI, lambda left, right: _int(left + right)),
+    Op.SUBI: (Op.MOVI, lambda left, right: _int(left - right)),
+    Op.MULI: (Op.MOVI, lambda left, right: _int(left * right)),
+    Op.DIVI: (Op.MOVI, _divi),
+    Op.ADDF: (Op.MOVF, lambda left, right: _float(left + right)),
+    Op.SUBF: (Op.MOVF, lambda left, right: _float(left - right)),
+    Op.MULF: (Op.MOVF, lambda left, right: _float(left * right)),
+    Op.DIVF: (Op.MOVF, _divf),
+    Op.CMPI: (Op.MOVI, _compare_values),
+    Op.CMPF: (Op.MOVI, _compare_values),
+    Op.CMPB: (Op.MOVI, _compare_values),
+    Op.AND:  (Op.MOVI, operator.and_),
+    Op.OR:   (Op.MOVI, operator.or_),
+    Op.XOR:  (Op.MOVI, operator.xor),
+    Op.ITOF: (Op.MOVF, float),
+    Op.FTOI: (Op.MOVI, _ftoi),
+    Op.BTOI: (Op.MOVI, lambda value: value),
+    Op.ITOB: (Op.MOVB, lambda value: value & 0xff),
+}
+
+_moves = {Op.MOVI, Op.MOVF, Op.MOVB}
+_loads = {Op.LOADI: Op.MOVI, Op.LOADF: Op.MOVF, Op.LOADB: Op.MOVB}
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_vars = {Op.VARI, Op.VARF, Op.VARB}
+_allocs = {Op.ALLOCI, Op.ALLOCF, Op.ALLOCB}
+_phis = {Op.PHII: Op.MOVI, Op.PHIF: Op.MOVF, Op.PHIB: Op.MOVB}
+
+def propagate_constants(functions):
+    '''
+    Propagate and fold the constants of the program functions (the list
+    of Functions made by GenerateCode), changing their code.  Return the
+    number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    init = next((function for function in functions if function.name == '__init'), None)
+    constants = { }
+    if init is not None:
+        _fold(init.cfg(), { }, True)
+        constants = _global_constants(functions, init.cfg())
+    for function in functions:
+        cfg = function.cfg()
+        _fold(cfg, constants, function is init)
+        cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def _global_constants(functions, cfg):
+    '''
+    Return a dict mapping the global variables that are constants to
+    (the block of __init storing them, their value)
+    '''
+    declared = { }
+    locals = set()
+    stores = { }
+    for function in functions:
+        locals.update(function.param_names)
+        for op, operands in function.instructions():
+            if op in _vars:
+                declared[operands[0]] = declared.get(operands[0], 0) + 1
+            elif op in _allocs:
+                locals.add(operands[0])
+            elif op in _stores:
+                stores[operands[1]] = stores.get(operands[1], 0) + 1
+
+    in_loops = {block for loop in cfg.loops for block in loop.blocks}
+    values = _known_registers(cfg)
+    constants = { }
+    for block in cfg.reverse_postorder():
+        if block in in_loops:
+            continue
+        previous = None
+        for op, operands in block.instructions:
+            # Only the store of the declaration's own initializer: a later
+            # store may come after calls of functions that load the
+            # variable
+            if op in _stores and previous is not None and previous[0] in _vars:
+                register, variable = operands
+                if (previous[1][0] == variable and declared.get(variable) == 1
+                    and stores[variable] == 1 and variable not in locals
+                    and register in values):
+                    constants[variable] = (block, values[register])
+            previous = op, operands
+    return constants
+
+def _known_registers(cfg):
+    values = { }
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            if op in _moves:
+                values[operands[1]] = operands[0]
+    return values
+
+def _fold(cfg, constants, init):
+    '''
+    Fold the code of the graph cfg, with the global constants constants.
+    init is true for __init, where constants are only used where their
+    store dominates.
+    '''
+    values = { }
+    for block in cfg.reverse_postorder():
+        stored = { }
+        code = []
+        for op, operands in block.instructions:
+            if op in _moves:
+                values[operands[1]] = operands[0]
+            elif op in _folding:
+                move, compute = _folding[op]
+                *args, target = operands
+                if op in (Op.CMPI, Op.CMPF, Op.CMPB):
+                    known = args[1] in values and args[2] in values
+                    args = [args[0]] + [values.get(arg) for arg in args[1:]]
+                else:
+                    known = all(arg in values for arg in args)
+                    args = [values.get(arg) for arg in args]
+                result = compute(*args) if known else None
+                if result is not None:
+                    op, operands = move, (result, target)
+                    values[target] = result
+            elif op in _loads:
+                variable, target = operands
+                if variable in stored:
+                    value = stored[variable]
+                elif variable in constants and _visible(cfg, constants[variable][0], block, init):
+                    value = constants[variable][1]
+                else:
+                    value = None
+                if value is not None:
+                    op, operands = _loads[op], (value, target)
+                    values[target] = value
+            elif op in _stores:
+                register, variable = operands
+                if register in values:
+                    stored[variable] = values[register]
+                else:
+                    stored.pop(variable, None)
+            elif op is Op.CALL:
+                # The function may store any global
+                stored = {variable: value for variable, value in stored.items()
+                          if getattr(variable, 'scope', None) == LOCAL}
+            elif op in _phis:
+                sources = operands[1:-1:2]
+                if all(source in values for source in sources):
+                    # repr() tells 0.0 from -0.0
+                    known = {repr(values[source]) for source in sources}
+                    if len(known) == 1:
+                        value = values[sources[0]]
+                        op, operands = _phis[op], (value, operands[-1])
+                        values[operands[1]] = value
+            elif op is Op.CBRANCH and operands[0] in values:
+                op, operands = Op.BRANCH, (operands[1] if values[operands[0]] else operands[2],)
+            code.append((op, operands))
+        block.instructions = code
+    cfg.update()
+    cfg.remove_unreachable()
+    _remove_unused_moves(cfg)
+
+def _visible(cfg, store, block, init):
+    '''
+    Can a LOAD in block use a constant stored in the block store?
+    '''
+    # In __init, a LOAD in the block of the store itself comes before the
+    # store unless it was forwarded within the block
+    if not init:
+        return True
+    return store is not block and cfg.dominates(store, block)
+
+def _remove_unused_moves(cfg):
+    used = set()
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            used.update(registers(op, operands)[0])
+    for block in cfg.blocks:
+        block.instructions = [(op, operands) for op, operands in block.instructions
+                              if op not in _moves or operands[1] in used]
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.constprop filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    removed = propagate_constants(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    print(f'{removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# gone/dce.py
+'''
+Dead code elimination
+=====================
+GenerateCode leaves code that does nothing: an if statement ends its
+then-part with a BRANCH to the label that follows the else-part, which
+is often the very next instruction, code after a return, break or
+continue is kept although it can't run, and other passes leave
+registers whose values are never read.  eliminate_dead_code() cleans
+up the control-flow graph of each function (see cfg.py):
+
+  * Blocks that can't be reached from the entry are removed.
+
+  * A CBRANCH with the same label twice becomes a BRANCH.
+
+  * An empty block, one holding only a BRANCH (or nothing, falling
+    through), is bypassed: its predecessors go straight to its target,
+    and the PHIs there take the value from them instead.
+
+  * A block whose only predecessor leads only to it is merged into the
+    predecessor, as long as the code stays in order.  PHIs in it have a
+    single value, and their targets are replaced by that register.
+
+  * A BRANCH to the block that follows it is removed; control falls
+    through.
+
+  * Pure instructions, those whose only effect is setting a register,
+    are removed if the register is never used, directly or through
+    other instructions that are used.  A CALL is never removed, nor is a
+    division unless it divides by a known non-zero constant, as it
+    stops the program in the interpreter.
+
+The steps are repeated until the code no longer changes.  To see the
+code of a program after the pass and the number of instructions it
+removed, run:
+
+     bash % python3 -m gone.dce someprogram.g
+'''
+
+from .ircode import Op, operand_kinds, registers
+
+_moves = {Op.MOVI, Op.MOVF, Op.MOVB}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+_divisions = {Op.DIVI, Op.DIVF}
+
+# Instructions that set a register and do nothing else
+_pure = frozenset(op for op in Op if op.name[:-1] in ('MOV', 'LOAD', 'PHI', 'ADD', 'SUB', 'MUL', 'DIV', 'CMP')
+                  or op.name in ('AND', 'OR', 'XOR', 'ITOF', 'FTOI', 'BTOI', 'ITOB'))
+
+def eliminate_dead_code(functions):
+    '''
+    Remove the dead code of the program functions (the list of Functions
+    made by GenerateCode), changing their code.  Return the number of
+    instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        cfg = function.cfg()
+        _eliminate(cfg)
+        cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def _eliminate(cfg):
+    '''
+    Remove the dead code of the graph cfg
+    '''
+    changed = True
+    while changed:
+        cfg.remove_unreachable()
+        changed = _simplify_branches(cfg)
+        changed |= _bypass_empty_blocks(cfg)
+        changed |= _merge_blocks(cfg)
+        changed |= _remove_jumps_to_next(cfg)
+        changed |= _remove_unused(cfg)
+
+def _simplify_branches(cfg):
+    changed = False
+    for block in cfg.blocks:
+        terminator = block.terminator
+        if terminator and terminator[0] is Op.CBRANCH and terminator[1][1] == terminator[1][2]:
+            block.instructions[-1] = (Op.BRANCH, (terminator[1][1],))
+            changed = True
+    if changed:
+        cfg.update()
+    return changed
+
+def _bypass_empty_blocks(cfg):
+    changed = False
+    for block in list(cfg.blocks):
+        if block is cfg.entry or not block.preds:
+            continue
+        n = cfg.blocks.index(block)
+        if not block.instructions and n + 1 < len(cfg.blocks):
+            target = cfg.blocks[n + 1]
+        elif len(block.instructions) == 1 and block.instructions[0][0] is Op.BRANCH:
+            target = cfg.labels[block.instructions[0][1][0]]
+        else:
+            continue
+        if target is block or (_has_phis(target) and set(block.preds) & set(target.preds)):
+            continue
+        for pred in block.preds:
+            _retarget(pred, block, target)
+        _rename_incoming(target, block, block.preds)
+        del cfg.blocks[n]
+        cfg.update()
+        changed = True
+    return changed
+
+def _retarget(pred, block, target):
+    '''
+    Make pred go to target where it went to block
+    '''
+    terminator = pred.terminator
+    if terminator is None:
+        pred.instructions.append((Op.BRANCH, (target.label,)))
+    elif terminator[0] is Op.BRANCH:
+        pred.instructions[-1] = (Op.BRANCH, (target.label,))
+    elif terminator[0] is Op.CBRANCH:
+        test, *labels = terminator[1]
+        labels = [target.label if label == block.label else label for label in labels]
+        pred.instructions[-1] = (Op.CBRANCH, (test, *labels))
+
+def _rename_incoming(block, old, preds):
+    '''
+    Make the PHIs of block take the value that they took from old from
+    each of preds instead
+    '''
+    for n, (op, operands) in enumerate(block.instructions):
+        if op not in _phis:
+            break
+        incoming = []
+        for label, register in zip(operands[:-1:2], operands[1:-1:2]):
+            if label == old.label:
+                for pred in preds:
+                    incoming += [pred.label, register]
+            else:
+                incoming += [label, register]
+        block.instructions[n] = (op, (*incoming, operands[-1]))
+
+def _has_phis(block):
+    return bool(block.instructions) and block.instructions[0][0] in _phis
+
+def _merge_blocks(cfg):
+    changed = False
+    rename = { }
+    n = 1
+    while n < len(cfg.blocks):
+        block = cfg.blocks[n]
+        pred = block.preds[0] if len(block.preds) == 1 else None
+        if (pred is None or pred is block or pred.succs != [block]
+            or (block.terminator is None and cfg.blocks[n - 1] is not pred)):
+            n += 1
+            continue
+        code = block.instructions
+        while code and code[0][0] in _phis:
+            rename[code[0][1][-1]] = code[0][1][1]
+            code = code[1:]
+        if pred.terminator is not None:
+            del pred.instructions[-1]
+        pred.instructions.extend(code)
+        for succ in block.succs:
+            _rename_incoming(succ, block, [pred])
+        cfg.blocks.remove(block)
+        cfg.update()
+        changed = True
+    if rename:
+        _rename_registers(cfg, rename)
+    return changed
+
+def _rename_registers(cfg, rename):
+    def resolve(register):
+        while register in rename:
+            register = rename[register]
+        return register
+    for block in cfg.blocks:
+        for n, (op, operands) in enumerate(block.instructions):
+            kinds = operand_kinds(op, len(operands))
+            block.instructions[n] = (op, tuple([resolve(operand) if kind == 'r' else operand
+                                                for kind, operand in zip(kinds, operands)]))
+
+def _remove_jumps_to_next(cfg):
+    changed = False
+    for block, next in zip(cfg.blocks, cfg.blocks[1:]):
+        terminator = block.terminator
+        if terminator and terminator[0] is Op.BRANCH and terminator[1][0] == next.label:
+            del block.instructions[-1]
+            changed = True
+    if changed:
+        cfg.update()
+    return changed
+
+def _remove_unused(cfg):
+    '''
+    Remove the pure instructions whose results are not used
+    '''
+    values = { }
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            if op in _moves:
+                values[operands[1]] = operands[0]
+
+    def removable(op, operands):
+        if op in _divisions:
+            return values.get(operands[1], 0) != 0
+        return op in _pure
+
+    # Mark the registers used by instructions that must stay, and those
+    # that the instructions setting them use in turn
+    sources = { }
+    work = []
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            reads, target = registers(op, operands)
+            if target is not None and removable(op, operands):
+                sources[target] = reads
+            else:
+                work.extend(reads)
+    used = set()
+    while work:
+        register = work.pop()
+        if register not in used:
+            used.add(register)
+            work.extend(sources.get(register, ()))
+
+    changed = False
+    for block in cfg.blocks:
+        code = [(op, operands) for op, operands in block.instructions
+                if not removable(op, operands) or operands[-1] in used]
+        if len(code) < len(block.instructions):
+            block.instructions = code
+            changed = True
+    return changed
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.dce filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    removed = eliminate_dead_code(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    print(f'{removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
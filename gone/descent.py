@@ -0,0 +1,388 @@
+# gone/descent.py
+'''
+Recursive descent parser
+========================
+GoneParser (see parser.py) is generated by SLY from the grammar rules.
+Most of the tokens of a typical program are in expressions, and the
+generic LALR driver spends a number of table lookups, stack operations
+and rule function calls on each of them: an operand passes through the
+literal or location rule, then the expression rule, and every operator
+costs a shift and a reduce.  Generated numeric code with long or deeply
+nested arithmetic is where this shows most.
+
+GoneDescentParser is a hand-written alternative.  Statements are parsed
+by recursive descent, one method per rule of the grammar, choosing the
+alternative by the next token.  Expressions are parsed by precedence
+climbing (Pratt parsing): an operand is parsed first, and binary
+operators are folded in for as long as they bind more tightly than the
+operator the expression belongs to.  The binding powers and
+associativity come from the precedence table of GoneParser, and the
+unary operators bind like the operator tokens of their rules, as they
+do under SLY's conflict resolution.  In particular, -a * b is -(a * b)
+and relational operators do not chain.
+
+The result is the same AST as GoneParser builds, node for node and
+with the same line numbers.  Syntax errors are detected at the same
+token, and recovery imitates that of SLY for a grammar without error
+rules: the offending token is reported (unless another error occurred
+less than three tokens before), everything parsed so far is thrown
+away, and parsing starts over at the next token that can begin a
+statement.  A syntax error at the end of the input returns None.
+
+To select it, use parse(source, parser='descent') from gone/parser.py.
+To compare the speed of the two parsers, run:
+
+     bash % python3 -m gone.bench descent
+'''
+
+from .errors import error
+from .ast import *
+
+# Binding power and associativity of the binary operators, after the
+# precedence table of GoneParser
+_binary = {
+    'OR': (1, 'left'),
+    'AND': (2, 'left'),
+    'LE': (3, 'nonassoc'), 'GE': (3, 'nonassoc'), 'LT': (3, 'nonassoc'),
+    'GT': (3, 'nonassoc'), 'EQ': (3, 'nonassoc'), 'NE': (3, 'nonassoc'),
+    'PLUS': (4, 'left'), 'MINUS': (4, 'left'),
+    'TIMES': (5, 'left'), 'DIVIDE': (5, 'left'),
+}
+
+# Binding power and associativity of the operand of the unary operators
+_unary = {
+    'PLUS': (4, 'left'),
+    'MINUS': (4, 'left'),
+    'NOT': (6, 'right'),
+}
+
+_augmented = {'AUG_PLUS', 'AUG_MINUS', 'AUG_TIMES', 'AUG_DIVIDE'}
+
+# Tokens that can follow an expression
+_expression_follows = set(_binary) | {'SEMI', 'LCBRACE', 'RPAREN', 'COMMA'}
+
+# Tokens that can start a statement
+_statement_starts = {
+    'ID', 'CONST', 'VAR', 'IF', 'WHILE', 'FOR', 'FUNC',
+    'BREAK', 'CONTINUE', 'RETURN', 'PRINT',
+}
+
+# Number of tokens that must be consumed after a syntax error before
+# another one is reported (as in SLY)
+ERROR_COUNT = 3
+
+class _End(object):
+    '''
+    Stand-in token for the end of the input
+    '''
+    type = '$end'
+    value = None
+    lineno = None
+
+_end = _End()
+
+class ParseError(Exception):
+    '''
+    Raised at a token that can't continue a valid program
+    '''
+
+class GoneDescentParser(object):
+    '''
+    Hand-written parser producing the same AST as GoneParser.  parse()
+    takes an iterator of tokens, as GoneParser.parse() does.
+    '''
+    def parse(self, tokens):
+        self.tokens = tokens
+        self.errorcount = 0
+        self.tok = next(tokens, None) or _end
+        while True:
+            try:
+                return self.program()
+            except ParseError:
+                tok = self.tok
+                if self.errorcount == 0:
+                    self.error(None if tok is _end else tok)
+                self.errorcount = ERROR_COUNT
+                if tok is _end:
+                    return None
+                # Throw away the offending token and any that follow
+                # it up to the start of a statement
+                self.tok = next(self.tokens, None) or _end
+                while self.tok is not _end and self.tok.type not in _statement_starts:
+                    self.tok = next(self.tokens, None) or _end
+
+    def error(self, p):
+        if p:
+            error(p.lineno, "Syntax error in input at token '%s'" % p.value)
+        else:
+            error('EOF','Syntax error. No more input.')
+
+    # ------------------------------------------------------------------
+    # Token handling
+
+    def advance(self):
+        '''
+        Consume the current token and return it
+        '''
+        tok = self.tok
+        self.tok = next(self.tokens, None) or _end
+        if self.errorcount:
+            self.errorcount -= 1
+        return tok
+
+    def expect(self, kind):
+        '''
+        Consume a token of type kind and return it
+        '''
+        if self.tok.type != kind:
+            raise ParseError()
+        return self.advance()
+
+    # ------------------------------------------------------------------
+    # Statements
+
+    def program(self):
+        statements = self.statements()
+        if self.tok is not _end:
+            raise ParseError()
+        return statements
+
+    def statements(self):
+        statements = []
+        while self.tok.type in _statement_starts:
+            statements.append(self.statement())
+        return statements
+
+    def block(self):
+        self.expect('LCBRACE')
+        statements = self.statements()
+        self.expect('RCBRACE')
+        return statements
+
+    def statement(self):
+        kind = self.tok.type
+        if kind == 'ID':
+            statement = self.assignment_statement()
+        elif kind == 'CONST':
+            statement = self.const_statement()
+        elif kind == 'VAR':
+            statement = self.var_statement()
+        elif kind == 'PRINT':
+            statement = self.print_statement()
+        elif kind == 'IF':
+            return self.if_statement()
+        elif kind == 'WHILE':
+            return self.while_statement()
+        elif kind == 'FOR':
+            return self.for_statement()
+        elif kind == 'FUNC':
+            return self.func_statement()
+        elif kind == 'BREAK':
+            lineno = self.tok.lineno
+            statement = BreakStatement(self.advance().value, lineno=lineno)
+        elif kind == 'CONTINUE':
+            lineno = self.tok.lineno
+            statement = ContinueStatement(self.advance().value, lineno=lineno)
+        elif kind == 'RETURN':
+            statement = self.return_statement()
+        else:
+            raise ParseError()
+        self.expect('SEMI')
+        return statement
+
+    def assignment_statement(self):
+        location = self.location()
+        lineno = location.lineno
+        kind = self.tok.type
+        if kind == 'ASSIGN':
+            self.advance()
+            return Assignment(location, self.expression(), lineno=lineno)
+        elif kind in _augmented:
+            op = self.advance().value[0]
+            value = self.expression()
+        elif kind == 'INCR' or kind == 'DECR':
+            op = self.advance().value[0]
+            value = IntegerLiteral(1, lineno=lineno)
+        else:
+            raise ParseError()
+        expr = BinOp(op, ReadLocation(location, lineno=lineno), value)
+        return Assignment(location, expr, lineno=lineno)
+
+    def const_statement(self):
+        lineno = self.advance().lineno
+        location = self.location()
+        self.expect('ASSIGN')
+        return ConstDeclaration(location, self.expression(), lineno=lineno)
+
+    def var_statement(self):
+        lineno = self.advance().lineno
+        location = self.location()
+        datatype = self.datatype()
+        value = None
+        if self.tok.type == 'ASSIGN':
+            self.advance()
+            value = self.expression()
+        return VarDeclaration(location, datatype, value, lineno=lineno)
+
+    def print_statement(self):
+        lineno = self.advance().lineno
+        return PrintStatement(self.expression(), lineno=lineno)
+
+    def if_statement(self):
+        lineno = self.advance().lineno
+        condition = self.expression()
+        then_block = self.block()
+        else_block = []
+        if self.tok.type == 'ELSE':
+            self.advance()
+            else_block = self.block()
+        return IfStatement(condition, then_block, else_block, lineno=lineno)
+
+    def while_statement(self):
+        lineno = self.advance().lineno
+        condition = self.expression()
+        return WhileStatement(condition, self.block(), lineno=lineno)
+
+    def for_statement(self):
+        lineno = self.advance().lineno
+        parens = self.tok.type == 'LPAREN'
+        if parens:
+            self.advance()
+        init = self.statement()
+        cond = self.expression()
+        self.expect('SEMI')
+        step = self.statement()
+        if parens:
+            self.expect('RPAREN')
+        return ForStatement(init, cond, step, self.block(), lineno=lineno)
+
+    def func_statement(self):
+        lineno = self.advance().lineno
+        name = self.expect('ID').value
+        self.expect('LPAREN')
+        arguments = []
+        if self.tok.type == 'ID':
+            arguments.append(self.argument())
+        # The argument list of the grammar may also start with a comma
+        while self.tok.type == 'COMMA':
+            self.advance()
+            arguments.append(self.argument())
+        self.expect('RPAREN')
+        datatype = self.datatype()
+        return FuncDeclaration(name, arguments, datatype, self.block(), lineno=lineno)
+
+    def argument(self):
+        tok = self.expect('ID')
+        return FuncArgument(tok.value, self.datatype(), lineno=tok.lineno)
+
+    def return_statement(self):
+        lineno = self.advance().lineno
+        value = None
+        if self.tok.type != 'SEMI':
+            value = self.expression()
+        return ReturnStatement(value, lineno=lineno)
+
+    def datatype(self):
+        tok = self.expect('ID')
+        return SimpleType(tok.value, lineno=tok.lineno)
+
+    def location(self):
+        tok = self.expect('ID')
+        return SimpleLocation(tok.value, lineno=tok.lineno)
+
+    # ------------------------------------------------------------------
+    # Expressions
+
+    def expression(self, power=0, assoc=None):
+        '''
+        Parse an expression as the operand of an operator with binding
+        power power and associativity assoc (0 for none).  Binary
+        operators binding more tightly are included, as are those binding
+        equally tightly when assoc is 'right'.
+        '''
+        # A binary operation gets the line number of its first token
+        lineno = self.tok.lineno
+        left = self.operand()
+        binary = _binary
+        while True:
+            kind = self.tok.type
+            if kind not in binary:
+                return left
+            level, op_assoc = binary[kind]
+            if level < power:
+                return left
+            if level == power:
+                if assoc == 'nonassoc':
+                    raise ParseError()
+                if assoc == 'left':
+                    return left
+            op = self.advance().value
+            right = self.expression(level, op_assoc)
+            left = BinOp(op, left, right, lineno=lineno)
+
+    def operand(self):
+        tok = self.tok
+        kind = tok.type
+        if kind == 'ID':
+            location = self.location()
+            if self.tok.type == 'LPAREN':
+                return self.function_call(location)
+            return ReadLocation(location, lineno=location.lineno)
+        elif kind == 'INTEGER':
+            self.advance()
+            # GoneParser only converts the value once it has seen that the
+            # next token is valid, which matters for values that int()
+            # rejects (the INTEGER pattern admits things like 0o17)
+            if self.tok.type not in _expression_follows:
+                raise ParseError()
+            return IntegerLiteral(int(tok.value), lineno=tok.lineno)
+        elif kind == 'FLOAT':
+            self.advance()
+            return FloatLiteral(float(tok.value), lineno=tok.lineno)
+        elif kind == 'CHAR':
+            self.advance()
+            return CharLiteral(eval(tok.value), lineno=tok.lineno)
+        elif kind == 'TRUE' or kind == 'FALSE':
+            self.advance()
+            return BoolLiteral(eval(tok.value.title()), lineno=tok.lineno)
+        elif kind == 'LPAREN':
+            self.advance()
+            expr = self.expression()
+            self.expect('RPAREN')
+            return expr
+        elif kind in _unary:
+            self.advance()
+            return UnaryOp(tok.value, self.expression(*_unary[kind]), lineno=tok.lineno)
+        raise ParseError()
+
+    def function_call(self, location):
+        self.advance()
+        arguments = []
+        if self.tok.type not in ('COMMA', 'RPAREN'):
+            arguments.append(self.expression())
+        # The argument list of the grammar may also start with a comma
+        while self.tok.type == 'COMMA':
+            self.advance()
+            arguments.append(self.expression())
+        self.expect('RPAREN')
+        return FunctionCall(location, arguments, lineno=location.lineno)
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .scanner import GoneScanner
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.descent filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        ast = GoneDescentParser().parse(GoneScanner().tokenize_stream(source))
+
+    for depth, node in flatten(ast):
+        print('%s: %s%s' % (getattr(node, 'lineno', None), ' '*(4*depth), node))
+
+if __name__ == '__main__':
+    main()
@@ -22,34 +22,134 @@ errors reported so far.  Different stages of the compiler might use
 this to decide whether or not to keep processing or not.
 
 Use clear_errors() to clear the total number of errors.
+
+The functions above report to the current Diagnostics object, which
+holds the errors of one compilation as Diagnostic tuples (lineno,
+message, filename).  Unless another one is in effect, this is a default
+object that prints each error to stderr as it is reported.  To compile
+several programs at once (in threads, say), give each compilation its
+own:
+
+       with Diagnostics() as diagnostics:
+           functions = compile_ircode(source)
+       for lineno, message, filename in diagnostics.diagnostics:
+           ...
+
+The current Diagnostics is local to the thread (or asyncio task), and
+compile_ircode() in ircode.py checks its program in a Diagnostics of
+its own, so the errors of one compilation never stop another.
+
+collect_errors() is a shorthand for collecting the errors reported in
+a with statement in a list, to be reported later with report().  This
+is how the parallel checker (see check_program() in checker.py) passes
+the errors found in worker processes back.
 '''
 
+import contextlib
+import contextvars
 import sys
+from collections import namedtuple
+
+class Diagnostic(namedtuple('Diagnostic', ['lineno', 'message', 'filename'])):
+    '''
+    An error reported by the compiler
+    '''
+    __slots__ = ()
+
+    def __str__(self):
+        if not self.filename:
+            return "{}: {}".format(self.lineno, self.message)
+        else:
+            return "{}:{}: {}".format(self.filename, self.lineno, self.message)
+
+class Diagnostics(object):
+    '''
+    The errors reported during a compilation, in the order reported.  If
+    echo is true, each one is also printed to stderr.  Used as a context
+    manager, it becomes the current Diagnostics for the body of the with
+    statement.
+    '''
+    def __init__(self, echo=False):
+        self.diagnostics = []
+        self.echo = echo
+        self._tokens = []
+
+    def error(self, lineno, message, filename=None):
+        diagnostic = Diagnostic(lineno, message, filename)
+        self.diagnostics.append(diagnostic)
+        if self.echo:
+            print(str(diagnostic), file=sys.stderr)
+
+    def errors_reported(self):
+        return len(self.diagnostics)
+
+    def clear_errors(self):
+        del self.diagnostics[:]
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
 
-_num_errors = 0
+    def __exit__(self, *exc_info):
+        _current.reset(self._tokens.pop())
+
+# Where errors go when no other Diagnostics is in effect.  Only the
+# number of errors is of interest here, so they are not kept.
+class _DefaultDiagnostics(Diagnostics):
+    def __init__(self):
+        super().__init__(echo=True)
+        self._count = 0
+
+    def error(self, lineno, message, filename=None):
+        print(str(Diagnostic(lineno, message, filename)), file=sys.stderr)
+        self._count += 1
+
+    def errors_reported(self):
+        return self._count
+
+    def clear_errors(self):
+        self._count = 0
+
+_default = _DefaultDiagnostics()
+_current = contextvars.ContextVar('diagnostics', default=_default)
+
+def current_diagnostics():
+    '''
+    Return the Diagnostics that errors are reported to
+    '''
+    return _current.get()
 
 def error(lineno, message, filename=None):
     '''
     Report a compiler error to all subscribers
     '''
-    global _num_errors
-    if not filename:
-        errmsg = "{}: {}".format(lineno, message)
-    else:
-        errmsg = "{}:{}: {}".format(filename,lineno,message)
-
-    print(errmsg, file=sys.stderr)
-    _num_errors += 1
+    _current.get().error(lineno, message, filename)
 
 def errors_reported():
     '''
     Return number of errors reported
     '''
-    return _num_errors
+    return _current.get().errors_reported()
 
 def clear_errors():
     '''
     Clear the total number of errors reported.
     '''
-    global _num_errors
-    _num_errors = 0
+    _current.get().clear_errors()
+
+@contextlib.contextmanager
+def collect_errors():
+    '''
+    Context manager collecting the errors reported in it as (lineno,
+    message, filename) tuples in the list that it yields.  They are not
+    printed or counted.
+    '''
+    with Diagnostics() as diagnostics:
+        yield diagnostics.diagnostics
+
+def report(errors):
+    '''
+    Report the errors collected by collect_errors()
+    '''
+    for lineno, message, filename in errors:
+        error(lineno, message, filename)
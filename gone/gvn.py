@@ -0,0 +1,219 @@
+# gone/gvn.py
+'''
+Value numbering
+===============
+The same value is often computed more than once.  In Tests/mandel.g,
+
+     xtemp = x*x - y*y + x0;
+     ...
+     if x*x + y*y > 4.0 {
+
+computes x*x and y*y twice on every iteration, and GenerateCode loads a
+variable again each time that it is read.  number_values() finds the
+instructions that compute a value already held in a register and
+replaces their targets with that register.
+
+It walks the dominator tree of each function (see cfg.py) with a table
+mapping each pure instruction, as its opcode and operands, to the
+register holding its result.  An entry made in a block is seen in the
+blocks that it dominates, where the register is sure to be set, and
+dropped when the walk leaves them.  This is the dominator-based value
+numbering of Briggs, Cooper and Simpson ("Value Numbering").  As
+registers are only assigned once, a register is its own value number:
+
+  * Instructions are matched by opcode, operator and registers.  For
+    ADD, MUL, AND, OR, XOR and the == and != comparisons, the order of
+    the registers doesn't matter, and a > b is b < a.  MOVs are matched
+    by value, telling 0.0 from -0.0.
+
+  * A PHI that takes the same register on every edge (apart from
+    itself) is that register, and two PHIs of a block with the same
+    incoming registers are the same.
+
+  * Variables change, so a LOAD only reuses the register of a LOAD or
+    STORE of the same variable earlier in the block, with no store to
+    it (or, unless it is a local variable by Slot, call) in between.  A
+    variable that is never stored in the function (a global constant,
+    or any global in a function without calls) is matched like a pure
+    instruction across blocks.
+
+To see the code of a program after the pass and the number of
+instructions it removed, run:
+
+     bash % python3 -m gone.gvn someprogram.g
+'''
+
+from .checker import Slot, LOCAL
+from .ircode import Op, operand_kinds
+
+_moves = {Op.MOVI, Op.MOVF, Op.MOVB}
+_loads = {Op.LOADI, Op.LOADF, Op.LOADB}
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+
+# Instructions on registers that set a register and do nothing else.
+# DIV is left out: a division by zero stops the interpreter where it is.
+_pure = frozenset(op for op in Op if op.name[:-1] in ('ADD', 'SUB', 'MUL', 'CMP')
+                  or op.name in ('AND', 'OR', 'XOR', 'ITOF', 'FTOI', 'BTOI', 'ITOB'))
+_commutative = frozenset(op for op in _pure if op.name[:-1] in ('ADD', 'MUL')
+                         or op.name in ('AND', 'OR', 'XOR'))
+_cmps = {Op.CMPI, Op.CMPF, Op.CMPB}
+_swapped = {'>': '<', '>=': '<='}
+
+# Instructions that set a variable
+_sets = _stores | {Op.VARI, Op.VARF, Op.VARB, Op.ALLOCI, Op.ALLOCF, Op.ALLOCB}
+
+def number_values(functions):
+    '''
+    Remove the instructions of the program functions (the list of
+    Functions made by GenerateCode) that compute a value that is already
+    in a register, changing their code.  Return the number of
+    instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        cfg = function.cfg()
+        _number(cfg)
+        cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def _local(variable):
+    return variable.__class__ is Slot and variable.scope == LOCAL
+
+def _number(cfg):
+    '''
+    Number the values of the graph cfg, removing the redundant
+    instructions
+    '''
+    cfg.remove_unreachable()
+    stored = set()
+    calls = False
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            if op in _stores:
+                stored.add(operands[1])
+            elif op in _sets:
+                stored.add(operands[0])
+            elif op is Op.CALL:
+                calls = True
+
+    def stable(variable):
+        return variable not in stored and (not calls or _local(variable))
+
+    # The registers replacing the targets of the instructions removed
+    rename = { }
+    table = { }
+    work = [cfg.entry]
+    while work:
+        block = work.pop()
+        if block.__class__ is list:
+            # Leaving the subtree of a block: drop its entries
+            for key in block:
+                del table[key]
+            continue
+        added = []
+        memory = { }
+        code = []
+        for op, operands in block.instructions:
+            if op not in _phis:
+                kinds = operand_kinds(op, len(operands))
+                operands = tuple([rename.get(operand, operand) if kind == 'r' else operand
+                                  for kind, operand in zip(kinds, operands)])
+            key = None
+            if op in _pure:
+                key = _key(op, operands)
+            elif op in _moves:
+                key = (op, repr(operands[0]))
+            elif op in _phis:
+                target = operands[-1]
+                incoming = [rename.get(register, register) for register in operands[1:-1:2]]
+                sources = set(incoming) - {target}
+                if len(sources) == 1:
+                    rename[target] = sources.pop()
+                    continue
+                key = (op, block, tuple(zip(operands[:-1:2], incoming)))
+            elif op in _loads:
+                variable, target = operands
+                if stable(variable):
+                    key = (op, variable)
+                elif variable in memory:
+                    rename[target] = memory[variable]
+                    continue
+                else:
+                    memory[variable] = target
+            elif op in _stores:
+                memory[operands[1]] = operands[0]
+            elif op in _sets:
+                memory.pop(operands[0], None)
+            elif op is Op.CALL:
+                # The function may store any global
+                memory = {variable: register for variable, register in memory.items()
+                          if _local(variable)}
+
+            if key is not None:
+                if key in table:
+                    rename[operands[-1]] = table[key]
+                    continue
+                table[key] = operands[-1]
+                added.append(key)
+            code.append((op, operands))
+        block.instructions = code
+        work.append(added)
+        work.extend(reversed(cfg.children[block]))
+
+    # PHIs take registers from blocks that may come later in the walk
+    if rename:
+        for block in cfg.blocks:
+            for n, (op, operands) in enumerate(block.instructions):
+                if op not in _phis:
+                    break
+                kinds = operand_kinds(op, len(operands))
+                block.instructions[n] = (op, tuple([_resolve(rename, operand) if kind == 'r' else operand
+                                                    for kind, operand in zip(kinds, operands)]))
+
+def _resolve(rename, register):
+    while register in rename:
+        register = rename[register]
+    return register
+
+def _key(op, operands):
+    '''
+    The key of the pure instruction op with operands in the table, the
+    same for instructions that compute the same value
+    '''
+    *args, target = operands
+    if op in _cmps:
+        operator, left, right = args
+        if operator in _swapped:
+            operator, left, right = _swapped[operator], right, left
+        elif operator in ('==', '!=') and right < left:
+            left, right = right, left
+        return (op, operator, left, right)
+    if op in _commutative:
+        args.sort()
+    return (op, *args)
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.gvn filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    removed = number_values(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    print(f'{removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+# gone/inline.py
+'''
+Inlining
+========
+A CALL is the most expensive instruction to run: the interpreter makes
+a new frame and copies the arguments into it, and no pass can look
+through it.  In Tests/mandel.g,
+
+     while x < xmax {
+         if in_mandelbrot(x,y,threshhold) {
+         ...
+
+calls in_mandelbrot() 3,200 times from the inner loop of mandel().
+inline_calls() replaces such calls with a copy of the code of the
+function called, in the control-flow graph of the caller (see cfg.py):
+
+  * The block of the call is split in two at the CALL.  The first part
+    stores the arguments into new local variables, by Slot, standing
+    for the parameters, and branches to the copy of the callee's code.
+    The second part, a new block, continues after the call.
+
+  * The registers, labels and local variables of the callee are given
+    new numbers in the caller, whose frame grows to hold them.
+
+  * Each RET becomes a BRANCH to the continuation.  The target of the
+    call is replaced by the register returned, or by a PHI of the
+    registers when the callee has more than one RET.
+
+Only code with variables by Slot is inlined (see ircode.py), and only
+callees that always end with a RET and can't call themselves, directly
+or through other functions.  Functions are done callees first, so that
+a function is inlined with the calls that it makes already inlined.
+
+The heuristics are given by the arguments of inline_calls(): a callee
+of up to size instructions is inlined at every call, and one of up to
+loop_size instructions where the call is in a loop.  The optimize()
+pass (see optimize.py) uses SIZE and LOOP_SIZE, and runs first, so
+that mem2reg promotes the new variables.  To see the calls inlined in
+a program and its code after the pass, run:
+
+     bash % python3 -m gone.inline someprogram.g
+'''
+
+from .cfg import CFG, BasicBlock
+from .checker import Slot, LOCAL
+from .ircode import Op, operand_kinds, registers
+from .typesys import lookup_type
+
+# Default sizes of the callees inlined, anywhere and in loops
+SIZE = 20
+LOOP_SIZE = 80
+
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_variables = _stores | {op for op in Op if op.name[:-1] in ('LOAD', 'VAR', 'ALLOC')}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+_labelled = _phis | {Op.BRANCH, Op.CBRANCH}
+
+def inline_calls(functions, size=SIZE, loop_size=LOOP_SIZE, inlined=None):
+    '''
+    Inline the calls to small functions in the program functions (the
+    list of Functions made by GenerateCode), changing their code.  If
+    inlined is a list, a (caller, callee) pair of names is added to it
+    for each call inlined.  Return the number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        for op, operands in function.instructions():
+            if op in _variables:
+                variable = operands[1] if op in _stores else operands[0]
+                if variable.__class__ is not Slot:
+                    return 0
+
+    # The functions called by each function
+    calls = {function.name: set() for function in functions}
+    top = 0
+    numbers = [0]
+    for function in functions:
+        for op, operands in function.instructions():
+            reads, target = registers(op, operands)
+            top = max(top, -1 if target is None else target, *reads)
+            if op is Op.CALL:
+                calls[function.name].add(operands[0])
+            elif op is Op.LABEL and operands[0][1:].isdigit():
+                numbers.append(int(operands[0][1:]))
+    names = _Names(top + 1, max(numbers) + 1)
+
+    by_name = {function.name: function for function in functions}
+    recursive = _recursive(calls)
+    for function in _callees_first(functions, calls):
+        cfg = function.cfg()
+        cfg.remove_unreachable()
+        changed = False
+        while True:
+            in_loops = {block for loop in cfg.loops for block in loop.blocks}
+            site = None
+            for block in cfg.blocks:
+                for n, (op, operands) in enumerate(block.instructions):
+                    if op is not Op.CALL or operands[0] not in by_name:
+                        continue
+                    callee = by_name[operands[0]]
+                    limit = loop_size if block in in_loops else size
+                    if (callee.name not in recursive and callee.name != '__init'
+                        and len(callee) <= limit and _returns(callee)):
+                        site = block, n, callee
+                        break
+                if site:
+                    break
+            if site is None:
+                break
+            _inline(cfg, *site, names)
+            changed = True
+            if inlined is not None:
+                inlined.append((function.name, site[2].name))
+        if changed:
+            cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+class _Names(object):
+    '''
+    The numbers of the next new register and label of the program
+    '''
+    def __init__(self, register, label):
+        self.register = register
+        self.label = label
+
+    def new_register(self):
+        self.register += 1
+        return self.register - 1
+
+    def new_label(self):
+        self.label += 1
+        return f'B{self.label - 1}'
+
+def _recursive(calls):
+    '''
+    Return the names of the functions that can call themselves, given
+    the functions called by each function
+    '''
+    recursive = set()
+    for name in calls:
+        seen = set()
+        work = list(calls[name])
+        while work:
+            callee = work.pop()
+            if callee == name:
+                recursive.add(name)
+                break
+            if callee not in seen and callee in calls:
+                seen.add(callee)
+                work.extend(calls[callee])
+    return recursive
+
+def _callees_first(functions, calls):
+    '''
+    Return the functions in an order in which each comes after the
+    functions it calls (apart from recursive calls)
+    '''
+    by_name = {function.name: function for function in functions}
+    order = []
+    seen = set()
+    for function in functions:
+        if function.name in seen:
+            continue
+        seen.add(function.name)
+        stack = [(function.name, iter(sorted(calls[function.name])))]
+        while stack:
+            name, callees = stack[-1]
+            for callee in callees:
+                if callee not in seen and callee in calls:
+                    seen.add(callee)
+                    stack.append((callee, iter(sorted(calls[callee]))))
+                    break
+            else:
+                stack.pop()
+                order.append(by_name[name])
+    return order
+
+def _returns(function):
+    '''
+    Return True if function ends each path through its code with a RET
+    '''
+    cfg = CFG(function)
+    cfg.remove_unreachable()
+    ends = [block for block in cfg.blocks if not block.succs]
+    return bool(ends) and all(block.terminator and block.terminator[0] is Op.RET for block in ends)
+
+def _inline(cfg, block, n, callee, names):
+    '''
+    Replace the CALL at index n of the instructions of block in the graph
+    cfg with the code of the Function callee
+    '''
+    _, *args, target = block.instructions[n][1]
+    code = CFG(callee)
+    code.remove_unreachable()
+
+    # New names for the registers, labels and local variables of callee
+    renamed = { }
+    labels = {copy.label: names.new_label() for copy in code.blocks}
+    offset = cfg.frame_size
+    cfg.frame_size += max(callee.frame_size, len(callee.param_names))
+
+    def rename(op, operands):
+        kinds = operand_kinds(op, len(operands))
+        new = []
+        for kind, operand in zip(kinds, operands):
+            if kind == 'r':
+                if operand not in renamed:
+                    renamed[operand] = names.new_register()
+                operand = renamed[operand]
+            elif operand.__class__ is Slot and operand.scope == LOCAL:
+                operand = Slot(LOCAL, operand.index + offset, operand.name)
+            elif op in _labelled and operand in labels:
+                operand = labels[operand]
+            new.append(operand)
+        return op, tuple(new)
+
+    # The call's block stores the arguments and goes to the callee's code
+    rest = block.instructions[n + 1:]
+    start = block.instructions[:n]
+    for index, (name, type, arg) in enumerate(zip(callee.param_names, callee.param_types, args)):
+        slot = Slot(LOCAL, index + offset, name)
+        char = lookup_type(type).char
+        start.append((Op['ALLOC' + char], (slot,)))
+        start.append((Op['STORE' + char], (arg, slot)))
+    start.append((Op.BRANCH, (labels['entry'],)))
+    block.instructions = start
+
+    after = BasicBlock(names.new_label())
+    returns = []
+    blocks = []
+    for copy in code.blocks:
+        new = BasicBlock(labels[copy.label])
+        for op, operands in copy.instructions:
+            op, operands = rename(op, operands)
+            if op is Op.RET:
+                returns.extend([new.label, operands[0]])
+                op, operands = Op.BRANCH, (after.label,)
+            new.instructions.append((op, operands))
+        blocks.append(new)
+
+    # The result of the call
+    if len(returns) == 2:
+        result = {target: returns[1]}
+    else:
+        result = { }
+        phi = Op['PHI' + lookup_type(callee.return_type).char]
+        after.instructions.append((phi, (*returns, target)))
+    after.instructions.extend(rest)
+
+    # The blocks that came from block now come from after
+    for succ in block.succs:
+        for m, (op, operands) in enumerate(succ.instructions):
+            if op not in _phis:
+                break
+            succ.instructions[m] = (op, tuple([after.label if operand == block.label and kind == 'v'
+                                               else operand for kind, operand in
+                                               zip(operand_kinds(op, len(operands)), operands)]))
+
+    index = cfg.blocks.index(block) + 1
+    cfg.blocks[index:index] = [*blocks, after]
+    if result:
+        for other in cfg.blocks:
+            for m, (op, operands) in enumerate(other.instructions):
+                kinds = operand_kinds(op, len(operands))
+                if any(kind == 'r' and operand in result for kind, operand in zip(kinds, operands)):
+                    other.instructions[m] = (op, tuple([result.get(operand, operand) if kind == 'r'
+                                                        else operand for kind, operand in
+                                                        zip(kinds, operands)]))
+    cfg.update()
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.inline filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    inlined = []
+    inline_calls(functions, inlined=inlined)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    for caller, callee in inlined:
+        print(f'{callee} inlined into {caller}')
+
+if __name__ == '__main__':
+    main()
@@ -11,9 +11,26 @@ To run a program use::
 
     bash % python3 -m gone.interp someprogram.g
 
+With -O, the code is optimized first (see optimize.py).
+
 '''
+import operator
 import sys
-        
+
+from .checker import Slot, GLOBAL
+from .ircode import Op, operand_kinds
+
+# Comparison operators of the CMP instructions
+_compare = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+}
+
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+
+# Returned by run_RET() to stop running a function
+_RETURN = -1
+
 class Interpreter(object):
     '''
     Runs an interpreter on the SSA intermediate code generated for
@@ -34,18 +51,139 @@ class Interpreter(object):
              self.run_MOVI(2, 'R2')
              self.run_ADDI('R1','R2','R3')
              self.run_PRINTI('R3')
+
+    execute() runs a whole program, the list of functions made by
+    GenerateCode: first the module initialization code __init, then
+    main() if there is one.  Each call gets its own registers and local
+    variables.  The methods for branches return the position of the
+    instruction to continue at.
+
+    The code of a function is prepared once, from the blocks of its
+    control-flow graph (see cfg.py): the method for each opcode is
+    looked up, and the registers of the function are numbered from 0
+    so that they can be kept in a list.
+
+    Variables are kept in dicts by name, or, for code generated with
+    slots (see ircode.py), in the lists globals and frame by slot
+    index.  An instruction on a slot is run by run_opcode_global() or
+    run_opcode_local(), which take the index of the slot.
+
+    The PHI instructions of code in SSA form (see ssa.py) are not run
+    themselves.  Instead, the branch into their block copies the values
+    for that edge into the targets of the PHIs (run_BRANCH_phi() and
+    run_CBRANCH_phi()), as does run_MOVES() at the end of a block that
+    falls through to them.
     '''
     def __init__(self):
-        # Variable storage
+        # Variable storage by name: globals, and those of the running function
         self.vars = { }
+        self.locals = { }
+
+        # Variable storage by slot: globals, and the frame of the running function
+        self.globals = [ ]
+        self.frame = [ ]
 
         # Registers
-        self.registers = { }
+        self.registers = [ ]
+
+        self.functions = { }
+        self._code = { }
+        self.labels = { }
+        self.result = None
+
+    def execute(self, functions):
+        self.functions = {function.name: function for function in functions}
+        self._code = { }
+        self.call('__init')
+        if 'main' in self.functions:
+            return self.call('main')
+
+    def call(self, name, args=()):
+        '''
+        Run the function name with the argument values args and return
+        its result
+        '''
+        function = self.functions[name]
+        if name not in self._code:
+            self._code[name] = self._prepare(function)
+        code, labels, registers = self._code[name]
+
+        saved = (self.locals, self.frame, self.registers, self.labels, self.result)
+        self.locals = dict(zip(function.param_names, args))
+        self.frame = [None] * function.frame_size
+        self.frame[:len(args)] = args
+        self.registers = [None] * registers
+        self.labels = labels
+        self.result = None
+        try:
+            pc = 0
+            end = len(code)
+            while pc < end:
+                method, args = code[pc]
+                pc += 1
+                jump = method(*args)
+                if jump is not None:
+                    if jump == _RETURN:
+                        break
+                    pc = jump
+            return self.result
+        finally:
+            self.locals, self.frame, self.registers, self.labels, self.result = saved
+
+    def _prepare(self, function):
+        '''
+        Look up the method for each instruction of function once and
+        number its registers.  The code is laid out from the blocks of its
+        control-flow graph, leaving out the LABEL instructions, and labels
+        map to the position of the first instruction of their block.
+        PHI instructions are left out too, and the branches into their
+        blocks copy the values of the edge.
+        '''
+        code = []
+        labels = { }
+        registers = { }
+
+        def moves(pred, block):
+            # The targets of the PHIs of block and the registers that they
+            # take when entered from pred
+            targets, sources = [], []
+            for op, operands in block.instructions:
+                if op not in _phis:
+                    break
+                incoming = operands[operands.index(pred.label) + 1]
+                targets.append(registers.setdefault(operands[-1], len(registers)))
+                sources.append(registers.setdefault(incoming, len(registers)))
+            return targets, sources
+
+        cfg = function.cfg()
+        blocks = cfg.blocks
+        for position, block in enumerate(blocks):
+            labels[block.label] = len(code)
+            for op, operands in block.instructions:
+                if op in _phis:
+                    continue
+                name = op.name
+                args = list(operands)
+                for n, (kind, arg) in enumerate(zip(operand_kinds(op, len(args)), args)):
+                    if kind == 'r':
+                        args[n] = registers.setdefault(arg, len(registers))
+                    elif arg.__class__ is Slot:
+                        name += '_global' if arg.scope == GLOBAL else '_local'
+                        args[n] = arg.index
+                if op is Op.BRANCH or op is Op.CBRANCH:
+                    edges = [moves(block, cfg.labels[label])
+                             for label in (operands[1:] if op is Op.CBRANCH else operands)]
+                    if any(targets for targets, sources in edges):
+                        name += '_phi'
+                        for targets, sources in edges:
+                            args += [targets, sources]
+                code.append((getattr(self, f'run_{name}'), args))
+            if block.terminator is None and position + 1 < len(blocks):
+                targets, sources = moves(block, blocks[position + 1])
+                if targets:
+                    code.append((self.run_MOVES, [targets, sources]))
+        return code, labels, len(registers)
 
-    def execute(self, code):
-        for inst, *args in code:
-            getattr(self, f'run_{inst}')(*args)
-        
     # Interpreter opcodes
     def run_MOVI(self, value, target):
         self.registers[target] = value
@@ -70,6 +208,32 @@ class Interpreter(object):
     def run_DIVF(self, left, right, target):
         self.registers[target] = self.registers[left] / self.registers[right]
 
+    def run_CMPI(self, op, left, right, target):
+        self.registers[target] = int(_compare[op](self.registers[left], self.registers[right]))
+    run_CMPF = run_CMPI
+    run_CMPB = run_CMPI
+
+    def run_AND(self, left, right, target):
+        self.registers[target] = self.registers[left] & self.registers[right]
+
+    def run_OR(self, left, right, target):
+        self.registers[target] = self.registers[left] | self.registers[right]
+
+    def run_XOR(self, left, right, target):
+        self.registers[target] = self.registers[left] ^ self.registers[right]
+
+    def run_ITOF(self, source, target):
+        self.registers[target] = float(self.registers[source])
+
+    def run_FTOI(self, source, target):
+        self.registers[target] = int(self.registers[source])
+
+    def run_BTOI(self, source, target):
+        self.registers[target] = self.registers[source]
+
+    def run_ITOB(self, source, target):
+        self.registers[target] = self.registers[source] & 0xff
+
     def run_PRINTI(self, value):
         print(self.registers[value])
     run_PRINTF = run_PRINTI
@@ -86,16 +250,112 @@ class Interpreter(object):
 
     run_VARB = run_VARI
 
+    def run_ALLOCI(self, name):
+        self.locals[name] = 0
+
+    def run_ALLOCF(self, name):
+        self.locals[name] = 0.0
+
+    run_ALLOCB = run_ALLOCI
+
     def run_LOADI(self, name, target):
-        self.registers[target] = self.vars[name]
+        if name in self.locals:
+            self.registers[target] = self.locals[name]
+        else:
+            self.registers[target] = self.vars[name]
     run_LOADF = run_LOADI
     run_LOADB = run_LOADI
 
     def run_STOREI(self, target, name):
-        self.vars[name] = self.registers[target]
+        if name in self.locals:
+            self.locals[name] = self.registers[target]
+        else:
+            self.vars[name] = self.registers[target]
     run_STOREF = run_STOREI
     run_STOREB = run_STOREI
 
+    # Variables by slot.  _prepare() passes the index of the slot.
+    def run_VARI_global(self, index):
+        self._declare(index, 0)
+
+    def run_VARF_global(self, index):
+        self._declare(index, 0.0)
+
+    run_VARB_global = run_VARI_global
+
+    def run_ALLOCI_local(self, index):
+        self.frame[index] = 0
+
+    def run_ALLOCF_local(self, index):
+        self.frame[index] = 0.0
+
+    run_ALLOCB_local = run_ALLOCI_local
+
+    def run_LOADI_global(self, index, target):
+        self.registers[target] = self.globals[index]
+    run_LOADF_global = run_LOADI_global
+    run_LOADB_global = run_LOADI_global
+
+    def run_LOADI_local(self, index, target):
+        self.registers[target] = self.frame[index]
+    run_LOADF_local = run_LOADI_local
+    run_LOADB_local = run_LOADI_local
+
+    def run_STOREI_global(self, target, index):
+        self.globals[index] = self.registers[target]
+    run_STOREF_global = run_STOREI_global
+    run_STOREB_global = run_STOREI_global
+
+    def run_STOREI_local(self, target, index):
+        self.frame[index] = self.registers[target]
+    run_STOREF_local = run_STOREI_local
+    run_STOREB_local = run_STOREI_local
+
+    def _declare(self, index, value):
+        if index >= len(self.globals):
+            self.globals.extend([None] * (index + 1 - len(self.globals)))
+        self.globals[index] = value
+
+    # Control flow
+    def run_LABEL(self, name):
+        pass
+
+    def run_BRANCH(self, label):
+        return self.labels[label]
+
+    def run_CBRANCH(self, test, label1, label2):
+        return self.labels[label1 if self.registers[test] else label2]
+
+    # Branches into blocks with PHI instructions, with the registers to
+    # copy for each edge
+    def run_MOVES(self, targets, sources):
+        registers = self.registers
+        values = [registers[source] for source in sources]
+        for target, value in zip(targets, values):
+            registers[target] = value
+
+    def run_BRANCH_phi(self, label, targets, sources):
+        self.run_MOVES(targets, sources)
+        return self.labels[label]
+
+    def run_CBRANCH_phi(self, test, label1, label2, targets1, sources1, targets2, sources2):
+        # Often only one of the labels has PHIs
+        if self.registers[test]:
+            if targets1:
+                self.run_MOVES(targets1, sources1)
+            return self.labels[label1]
+        if targets2:
+            self.run_MOVES(targets2, sources2)
+        return self.labels[label2]
+
+    def run_CALL(self, name, *args):
+        *args, target = args
+        self.registers[target] = self.call(name, [self.registers[arg] for arg in args])
+
+    def run_RET(self, source):
+        self.result = self.registers[source]
+        return _RETURN
+
 # ----------------------------------------------------------------------
 #                       DO NOT MODIFY ANYTHING BELOW       
 # ----------------------------------------------------------------------
@@ -105,24 +365,19 @@ def main():
     from .ircode import compile_ircode
     from .errors import errors_reported
 
-    if len(sys.argv) != 2:
-        sys.stderr.write('Usage: python3 -m gone.interp filename\n')
+    args = sys.argv[1:]
+    optimize = '-O' in args
+    if optimize:
+        args.remove('-O')
+    if len(args) != 1:
+        sys.stderr.write('Usage: python3 -m gone.interp [-O] filename\n')
         raise SystemExit(1)
 
-    source = open(sys.argv[1]).read()
-    code = compile_ircode(source)
+    with open(args[0]) as source:
+        code = compile_ircode(source, slots=True, optimize=optimize)
     if not errors_reported():
         interpreter = Interpreter()
         interpreter.execute(code)
 
 if __name__ == '__main__':
     main()
-
-
-
-
-
-
-        
-        
-        
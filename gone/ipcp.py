@@ -0,0 +1,207 @@
+# gone/ipcp.py
+'''
+Interprocedural constant propagation
+====================================
+propagate_constants() (see constprop.py) folds the constants of each
+function by itself, so the parameters of a function are unknown to it
+even where every call passes a constant:
+
+     const threshhold = 1000;
+     ...
+     if in_mandelbrot(x,y,threshhold) {
+
+specialize_calls() looks at the calls of the whole program.  A call
+with arguments that are constants, registers set by a MOV (as
+constprop leaves the constants and the folded expressions), goes to a
+specialized copy of the function, or clone, instead:
+
+  * The clone is named after the function and a number, such as
+    in_mandelbrot.1, and doesn't have the parameters that were given
+    constants.  Its LOADs of them become MOVs of the constants (or, if
+    the function stores the parameter, the variable is set to the
+    constant on entry).  The other parameters keep the first slots of
+    the frame.
+
+  * Calls with the same constants for the same parameters share a
+    clone.  The calls in the clones are specialized too.
+
+  * The clones of a program add at most budget instructions to it
+    (optimize() uses BUDGET).  A call that would go over it is left
+    as it is.
+
+constprop then folds the constants into the clones.  A function whose
+calls all went to clones is dropped from the program, and so is a clone
+that is no longer called, unless a function that is kept can still call
+it.  Other functions are kept, whether called or not.  Only code with
+variables by Slot is changed (see ircode.py).
+
+To see the code of a program after the pass and the number of
+instructions it removed, run:
+
+     bash % python3 -m gone.ipcp someprogram.g
+'''
+
+from .checker import Slot, LOCAL
+from .constprop import propagate_constants
+from .ircode import Function, Op, registers
+from .typesys import lookup_type
+
+# Default number of instructions that clones may add to a program
+BUDGET = 200
+
+_moves = {Op.MOVI, Op.MOVF, Op.MOVB}
+_loads = {Op.LOADI: Op.MOVI, Op.LOADF: Op.MOVF, Op.LOADB: Op.MOVB}
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_variables = _stores | {op for op in Op if op.name[:-1] in ('LOAD', 'VAR', 'ALLOC')}
+
+# The functions run from outside the program
+_roots = ('__init', 'main')
+
+def specialize_calls(functions, budget=BUDGET):
+    '''
+    Make the calls of the program functions (the list of Functions made
+    by GenerateCode) with constant arguments go to specialized clones,
+    and drop the functions and clones that this leaves uncalled, changing
+    the list and the code.  Return the number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        for op, operands in function.instructions():
+            if op in _variables and (operands[1] if op in _stores else operands[0]).__class__ is not Slot:
+                return 0
+
+    top = 0
+    for function in functions:
+        for op, operands in function.instructions():
+            reads, target = registers(op, operands)
+            top = max(top, -1 if target is None else target, *reads)
+    registers_made = iter(range(top + 1, 2**31))
+
+    by_name = {function.name: function for function in functions}
+    clones = { }
+    redirected = set()
+    work = list(functions)
+    while work:
+        function = work.pop(0)
+        cfg = function.cfg()
+        values = { }
+        for block in cfg.blocks:
+            for op, operands in block.instructions:
+                if op in _moves:
+                    values[operands[1]] = (op, operands[0])
+        changed = False
+        for block in cfg.blocks:
+            for n, (op, operands) in enumerate(block.instructions):
+                if op is not Op.CALL or operands[0] not in by_name or operands[0] in _roots:
+                    continue
+                name, *args, target = operands
+                callee = by_name[name]
+                constants = tuple((index, *values[arg]) for index, arg in enumerate(args)
+                                  if arg in values)
+                if not constants:
+                    continue
+                key = (name, tuple((index, op, repr(value)) for index, op, value in constants))
+                if key not in clones:
+                    if len(callee) > budget:
+                        continue
+                    budget -= len(callee)
+                    clone = _clone(callee, f'{name}.{len(clones) + 1}', constants, registers_made)
+                    clones[key] = clone
+                    functions.append(clone)
+                    by_name[clone.name] = clone
+                    work.append(clone)
+                known = {index for index, *constant in constants}
+                args = [arg for index, arg in enumerate(args) if index not in known]
+                block.instructions[n] = (Op.CALL, (clones[key].name, *args, target))
+                redirected.add(name)
+                changed = True
+        if changed:
+            cfg.function(function)
+
+    # Drop the clones, and the functions with calls that went to clones,
+    # that the other functions can no longer call
+    calls = {function.name: {operands[0] for op, operands in function.instructions() if op is Op.CALL}
+             for function in functions}
+    droppable = redirected | {clone.name for clone in clones.values()}
+    reachable = set()
+    work = [name for name in calls if name not in droppable]
+    while work:
+        name = work.pop()
+        if name not in reachable:
+            reachable.add(name)
+            work.extend(callee for callee in calls[name] if callee in calls)
+    functions[:] = [function for function in functions if function.name in reachable]
+
+    if clones:
+        propagate_constants(functions)
+    return before - sum(len(function) for function in functions)
+
+def _clone(function, name, constants, registers_made):
+    '''
+    Return a copy of the Function function named name, without the
+    parameters given constants, a tuple of (index, MOV op, value)
+    '''
+    known = {index: (op, value) for index, op, value in constants}
+    params = [index for index in range(len(function.param_names)) if index not in known]
+    clone = Function(name, function.return_type,
+                     [function.param_names[index] for index in params],
+                     [function.param_types[index] for index in params])
+    clone.frame_size = max(function.frame_size, len(function.param_names))
+
+    # The parameters kept come first in the frame, then those given
+    # constants
+    slots = {index: new for new, index in enumerate([*params, *known])}
+    code = list(function.instructions())
+    stored = {operands[1].index for op, operands in code
+              if op in _stores and operands[1].scope == LOCAL}
+
+    def slot(variable):
+        if variable.scope == LOCAL and variable.index in slots:
+            return Slot(LOCAL, slots[variable.index], variable.name)
+        return variable
+
+    start = []
+    for index, (op, value) in known.items():
+        if index in stored:
+            variable = Slot(LOCAL, slots[index], function.param_names[index])
+            char = lookup_type(function.param_types[index]).char
+            register = next(registers_made)
+            start += [(Op['ALLOC' + char], (variable,)), (op, (value, register)),
+                      (Op['STORE' + char], (register, variable))]
+    for op, operands in start:
+        clone.emit(op, *operands)
+    for op, operands in code:
+        if op in _loads and operands[0].scope == LOCAL and operands[0].index in known:
+            index = operands[0].index
+            if index not in stored:
+                op, operands = known[index][0], (known[index][1], operands[1])
+        if op in _variables:
+            operands = tuple([slot(operand) if operand.__class__ is Slot else operand
+                              for operand in operands])
+        clone.emit(op, *operands)
+    return clone
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.ipcp filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    removed = specialize_calls(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    print(f'{removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
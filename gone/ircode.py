@@ -94,6 +94,56 @@ There are also some control flow instructions
     CALL   name, arg0, arg1, ... argN, target    ; Call a function name(arg0, ... argn) -> target
     RET    r1                    ; Return a result from a function
 
+GenerateCode uses PHII for the value of && and ||, whose right operand
+is only evaluated if the left one doesn't decide the result.  The
+mem2reg pass (see ssa.py), which keeps the local variables of a
+function in registers, makes the others:
+
+    PHII   label1, r1, label2, r2, ..., target ; target = r1 if control came from the block label1, r2 if from label2, ...
+    PHIF   label1, r1, label2, r2, ..., target ; Same for floats
+    PHIB   label1, r1, label2, r2, ..., target ; Same for bytes
+
+The PHI instructions of a block come first in it, and they all take
+their values at once, as control enters the block.  The entry block of
+a function, which has no label, is called 'entry'.
+
+Variables by slot
+=================
+The checker gives every variable a Slot (see checker.py): a numbered
+place among the global variables or in the frame of a function.  With
+GenerateCode(slots=True), the VAR, ALLOC, LOAD and STORE instructions
+name variables by their Slot instead of by name, so that later stages
+can keep variables in arrays:
+
+    LOADI  Slot(scope=1, index=0, name='n'), target
+
+The arguments of a function take the first slots of its frame, and
+Function.frame_size is the number of slots in the frame.
+
+Packed instructions
+===================
+A Function does not keep its instructions as tuples.  Each instruction
+is an opcode from the enum Op plus a list of operands, stored in
+array-backed columns:
+
+    ops[n]        the opcode of instruction n
+    starts[n]     where its operands start in operands (the operands of
+                  instruction n are operands[starts[n]:starts[n + 1]])
+    operands      the operands: registers by number, other operands
+                  (numbers, names, labels, Slots and the operators of
+                  the CMP instructions) as positions in values, where
+                  equal values are stored once
+
+Which operands are registers is fixed by the opcode (see operand_kinds()).
+Registers are numbered, and R3 is register 3.  Stages that run or
+translate the code use Function.instructions(), which gives each
+instruction as an (Op, operands) pair with registers as numbers.  The
+tuple form shown in this file is a view, Function.body, which decodes
+instructions as they are read; it is what the tests and main() use.
+Assigning a list of tuples to body or appending a tuple to a Function
+encodes them.  Function.cfg() gives the control-flow graph of the code
+(see cfg.py).
+
 Single Static Assignment
 ========================
 On a real CPU, there are a limited number of CPU registers.
@@ -119,15 +169,111 @@ The files Tests/irtest0-5.g contain some input text along with
 sample output. Work through each file to complete the project.
 '''
 
+import enum
+import re
+from array import array
+from collections.abc import Sequence
+
 from . import ast
+from .typesys import all_types, INT, FLOAT, CHAR
+
+# The kinds of the operands of each instruction: r for a register, v
+# for any other value.  A kind, or a group of kinds in parentheses,
+# followed by * is repeated any number of times.
+_formats = { }
+for _name, _format in [('MOV', 'vr'), ('VAR', 'v'), ('ALLOC', 'v'), ('LOAD', 'vr'),
+                       ('STORE', 'rv'), ('CMP', 'vrrr'), ('PRINT', 'r')]:
+    for _char in 'IFB':
+        _formats[_name + _char] = _format
+for _name in ('ADD', 'SUB', 'MUL', 'DIV'):
+    for _char in 'IF':
+        _formats[_name + _char] = 'rrr'
+_formats.update({
+    'AND': 'rrr', 'OR': 'rrr', 'XOR': 'rrr',
+    'ITOF': 'rr', 'FTOI': 'rr', 'BTOI': 'rr', 'ITOB': 'rr',
+    'LABEL': 'v', 'BRANCH': 'v', 'CBRANCH': 'rvv', 'CALL': 'vr*', 'RET': 'r',
+    'PHII': '(vr)*r', 'PHIF': '(vr)*r', 'PHIB': '(vr)*r',
+})
+del _name, _format, _char
+
+# Opcodes of the instructions
+Op = enum.IntEnum('Op', list(_formats), start=0)
+
+def _split_format(format):
+    '''
+    Split a format with a repeated part into (the kinds before it, the
+    repeated kinds, the kinds after it)
+    '''
+    match = re.fullmatch(r'(\w*?)(?:(\w)|\((\w+)\))\*(\w*)', format)
+    prefix, kind, group, suffix = match.groups()
+    return prefix, kind or group, suffix
+
+# Opcodes by number, and for each the kinds of its operands, or None if
+# their number varies, in which case _repeats gives the split format
+_ops = list(Op)
+_op_formats = [None if '*' in _formats[op.name] else _formats[op.name] for op in Op]
+_repeats = [_split_format(_formats[op.name]) if '*' in _formats[op.name] else None for op in Op]
+
+# Instructions whose last register operand is the register they set
+_results = frozenset(op for op in Op if op.name[:-1] not in ('VAR', 'ALLOC', 'STORE', 'PRINT')
+                     and op.name not in ('LABEL', 'BRANCH', 'CBRANCH', 'RET'))
+
+def operand_kinds(op, count):
+    '''
+    Return the kinds of the count operands of an instruction op as a
+    string of 'r' (register) and 'v' (value)
+    '''
+    format = _op_formats[op]
+    if format is None:
+        prefix, repeated, suffix = _repeats[op]
+        times = (count - len(prefix) - len(suffix)) // len(repeated)
+        return prefix + repeated * times + suffix
+    return format
+
+def registers(op, operands):
+    '''
+    Return the registers read by the instruction op with operands, and
+    the register that it sets (None if it sets none)
+    '''
+    kinds = operand_kinds(op, len(operands))
+    if op in _results:
+        return [operand for kind, operand in zip(kinds[:-1], operands) if kind == 'r'], operands[-1]
+    return [operand for kind, operand in zip(kinds, operands) if kind == 'r'], None
+
+def register_name(register):
+    '''
+    Return the name of register number register in the tuple form
+    '''
+    return f'R{register}'
+
+def as_tuple(op, operands):
+    '''
+    Return the instruction op with operands (registers as numbers) in
+    the tuple form
+    '''
+    kinds = operand_kinds(op, len(operands))
+    return (op.name, *[register_name(operand) if kind == 'r' else operand
+                       for kind, operand in zip(kinds, operands)])
 
 class Function:
+    '''
+    The code of a function, as packed instructions (see above)
+    '''
     def __init__(self, name, return_type='void', param_names=None, param_types=None):
         self.name = name
         self.return_type = return_type
         self.param_names = param_names or []
         self.param_types = param_types or []
-        self.body = []
+        self.frame_size = 0
+        self.ops = array('B')
+        self.starts = array('i', [0])
+        self.operands = array('i')
+        self.values = []
+        self._interned = { }
+        self._cfg = None
+
+    def __len__(self):
+        return len(self.ops)
 
     def __iter__(self):
         return iter(self.body)
@@ -135,30 +281,171 @@ class Function:
     def __eq__(self, other):
         return self.body == other
 
+    @property
+    def body(self):
+        return Instructions(self)
+
+    @body.setter
+    def body(self, instructions):
+        instructions = list(instructions)
+        self.clear()
+        for inst in instructions:
+            self.append(inst)
+
+    def clear(self):
+        '''
+        Remove all instructions
+        '''
+        del self.ops[:], self.operands[:], self.values[:]
+        self.starts = array('i', [0])
+        self._interned.clear()
+        self._cfg = None
+
+    def emit(self, op, *operands):
+        '''
+        Add the instruction op, whose operands are given with registers
+        as numbers
+        '''
+        self._cfg = None
+        self.ops.append(op)
+        kinds = operand_kinds(op, len(operands))
+        for kind, operand in zip(kinds, operands):
+            self.operands.append(operand if kind == 'r' else self.intern(operand))
+        self.starts.append(len(self.operands))
+
     def append(self, inst):
-        self.body.append(inst)
+        '''
+        Add the instruction inst in the tuple form
+        '''
+        op = Op[inst[0]]
+        kinds = operand_kinds(op, len(inst) - 1)
+        self.emit(op, *[int(operand[1:]) if kind == 'r' else operand
+                        for kind, operand in zip(kinds, inst[1:])])
+
+    def intern(self, value):
+        '''
+        Return the position of value in values, adding it if needed
+        '''
+        # Told apart by type as well, as 1 == 1.0, and 0.0 from -0.0
+        if value.__class__ is str:
+            key = value
+        elif value.__class__ is float and value == 0.0:
+            key = (float, str(value))
+        else:
+            key = (value.__class__, value)
+        try:
+            return self._interned[key]
+        except KeyError:
+            position = self._interned[key] = len(self.values)
+            self.values.append(value)
+            return position
+
+    def cfg(self):
+        '''
+        Return the control-flow graph of the function (see cfg.py), made
+        the first time it is asked for
+        '''
+        if self._cfg is None:
+            from .cfg import CFG
+            self._cfg = CFG(self)
+        return self._cfg
+
+    def instruction(self, n):
+        '''
+        Return instruction n as (op, operands), with registers as numbers
+        '''
+        op = _ops[self.ops[n]]
+        operands = self.operands[self.starts[n]:self.starts[n + 1]]
+        values = self.values
+        return op, tuple([operand if kind == 'r' else values[operand]
+                          for kind, operand in zip(operand_kinds(op, len(operands)), operands)])
+
+    def instructions(self):
+        '''
+        Generate the instructions as (op, operands), with registers as
+        numbers
+        '''
+        starts, operands, values = self.starts, self.operands, self.values
+        start = 0
+        for n, op in enumerate(self.ops, 1):
+            op = _ops[op]
+            end = starts[n]
+            kinds = _op_formats[op]
+            if kinds is None:
+                kinds = operand_kinds(op, end - start)
+            yield op, tuple([operand if kind == 'r' else values[operand]
+                             for kind, operand in zip(kinds, operands[start:end])])
+            start = end
+
+class Instructions(Sequence):
+    '''
+    The instructions of a Function in the tuple form, decoded as read
+    '''
+    def __init__(self, function):
+        self.function = function
+
+    def __len__(self):
+        return len(self.function)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[n] for n in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('instruction index out of range')
+        return as_tuple(*self.function.instruction(index))
+
+    def __eq__(self, other):
+        if isinstance(other, (Instructions, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
 
 class GenerateCode(ast.NodeVisitor):
     '''
     Node visitor class that creates 3-address encoded instruction sequences.
+    Like the checker, it yields the children of a node to visit them, so
+    the depth of the tree is not limited by Python's recursion limit.
+    Variables are named by their Slot if slots is true.
     '''
-    def __init__(self):
+    def __init__(self, slots=False):
+        self.slots = slots
         self.register_count = 0
         self.label_count = 0
         self.code = Function('__init')
         self.functions = [self.code]
+        # The label of the block that code is added to
+        self.block = 'entry'
 
     def new_register(self):
          '''
          Creates a new temporary register
          '''
          self.register_count += 1
-         return f'R{self.register_count}'
+         return self.register_count
 
     def new_label(self):
         self.label_count += 1
         return f'B{self.label_count}'
 
+    def _label(self, label):
+        '''
+        Start the block label
+        '''
+        self.code.emit(Op.LABEL, label)
+        self.block = label
+
+    def _end_block(self, op, *operands):
+        '''
+        Emit the BRANCH, CBRANCH or RET ending the current block.  Code
+        after it, until the next label, is in a block without one.
+        '''
+        self.code.emit(op, *operands)
+        self.block = None
+
     # You must implement visit_Nodename methods for all of the other
     # AST nodes.  In your code, you will need to make instructions
     # and append them to the self.code list.
@@ -179,177 +466,233 @@ class GenerateCode(ast.NodeVisitor):
         self._literal(node)
 
     def visit_BinOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        if node.op in _and_or:
+            yield from self._short_circuit(node)
+            return
+        yield node.left
+        yield node.right
         target = self.new_register()
-        code = _build_instruction_name(node.op, node.left.type)
-        inst = (*code, node.left.register, node.right.register, target)
-        self.code.append(inst)
+        code = _instructions[node.op][node.left.type.code]
+        self.code.emit(*code, node.left.register, node.right.register, target)
         node.register = target
 
+    def _short_circuit(self, node):
+        '''
+        The value of a && b or a || b, only evaluating b if a doesn't
+        decide it.  A PHII at the end takes a or b, depending on where
+        control comes from.
+        '''
+        if self.block is None:
+            # Code after a return, break or continue gets a block of its
+            # own, so that the PHII has a block to come from
+            self._label(self.new_label())
+        right_branch = self.new_label()
+        exit_branch = self.new_label()
+        yield node.left
+        left_block = self.block
+        if node.op == '&&':
+            self._end_block(Op.CBRANCH, node.left.register, right_branch, exit_branch)
+        else:
+            self._end_block(Op.CBRANCH, node.left.register, exit_branch, right_branch)
+        self._label(right_branch)
+        yield node.right
+        right_block = self.block
+        self._end_block(Op.BRANCH, exit_branch)
+        self._label(exit_branch)
+        target = self.new_register()
+        self.code.emit(Op.PHII, left_block, node.left.register, right_block, node.right.register, target)
+        node.register = target
+
+    def _branch(self, node, true_branch, false_branch):
+        '''
+        Evaluate the condition node and branch to true_branch if it holds,
+        false_branch if not.  &&, || and ! become branches themselves.
+        '''
+        op = getattr(node, 'op', None)
+        if op == '&&' or op == '||':
+            right_branch = self.new_label()
+            if op == '&&':
+                yield from self._branch(node.left, right_branch, false_branch)
+            else:
+                yield from self._branch(node.left, true_branch, right_branch)
+            self._label(right_branch)
+            yield from self._branch(node.right, true_branch, false_branch)
+        elif op == '!':
+            yield from self._branch(node.value, false_branch, true_branch)
+        else:
+            yield node
+            self._end_block(Op.CBRANCH, node.register, true_branch, false_branch)
+
     def visit_UnaryOp(self, node):
-        self.visit(node.value)
+        yield node.value
         if node.op == '-':
             # put zero on stack
             zero_target = self.new_register()
-            zero_code = 'MOV' + _type_char(node.type)
-            zero_inst = (zero_code, 0 if node.type == 'int' else 0.0, zero_target)
-            self.code.append(zero_inst)
+            zero_code = _moves[node.type.code]
+            self.code.emit(zero_code, 0 if node.type is INT else 0.0, zero_target)
             # do subtraction
             target = self.new_register()
-            code = _build_instruction_name(node.op, node.type)
-            inst = (*code, zero_target, node.value.register, target)
-            self.code.append(inst)
+            code = _instructions[node.op][node.type.code]
+            self.code.emit(*code, zero_target, node.value.register, target)
         elif node.op == '!':
             one_target = self.new_register()
-            self.code.append(('MOVI', 1, one_target))
+            self.code.emit(Op.MOVI, 1, one_target)
             target = self.new_register()
-            self.code.append(('SUBI', one_target, node.value.register, target))
+            self.code.emit(Op.SUBI, one_target, node.value.register, target)
         else:
             # do addition
             target = node.value.register
         node.register = target
 
     def visit_PrintStatement(self, node):
-        self.visit(node.value)
-        code = 'PRINT' + _type_char(node.value.type)
-        inst = (code, node.value.register)
-        self.code.append(inst)
+        yield node.value
+        self.code.emit(_prints[node.value.type.code], node.value.register)
 
     def visit_IfStatement(self, node):
         then_branch = self.new_label()
         else_branch = self.new_label()
         exit_branch = self.new_label()
-        self.visit(node.condition)
-        self.code.append(('CBRANCH', node.condition.register, then_branch, else_branch))
-        self.code.append(('LABEL', then_branch))
-        self.visit(node.then_block)
-        self.code.append(('BRANCH', exit_branch))
-        self.code.append(('LABEL', else_branch))
-        self.visit(node.else_block)
-        self.code.append(('BRANCH', exit_branch))
-        self.code.append(('LABEL', exit_branch))
+        yield from self._branch(node.condition, then_branch, else_branch)
+        self._label(then_branch)
+        yield node.then_block
+        self._end_block(Op.BRANCH, exit_branch)
+        self._label(else_branch)
+        yield node.else_block
+        self._end_block(Op.BRANCH, exit_branch)
+        self._label(exit_branch)
 
     def visit_WhileStatement(self, node):
         cond_branch = self.new_label()
         loop_branch = self.new_label()
         exit_branch = self.new_label()
-        self.code.append(('BRANCH', cond_branch))
-        self.code.append(('LABEL', cond_branch))
-        self.visit(node.condition)
-        self.code.append(('CBRANCH', node.condition.register, loop_branch, exit_branch))
-        self.code.append(('LABEL', loop_branch))
+        self._end_block(Op.BRANCH, cond_branch)
+        self._label(cond_branch)
+        yield from self._branch(node.condition, loop_branch, exit_branch)
+        self._label(loop_branch)
         for statement in node.loop_block:
-            self.visit(statement)
+            yield statement
             if getattr(statement, 'name', None) == 'break':
-                self.code.append(('BRANCH', exit_branch))
+                self._end_block(Op.BRANCH, exit_branch)
             if getattr(statement, 'name', None) == 'continue':
-                self.code.append(('BRANCH', cond_branch))
-        self.code.append(('BRANCH', cond_branch))
-        self.code.append(('LABEL', exit_branch))
+                self._end_block(Op.BRANCH, cond_branch)
+        self._end_block(Op.BRANCH, cond_branch)
+        self._label(exit_branch)
 
     def visit_ForStatement(self, node):
-        self.visit(node.init)
+        yield node.init
         cond_branch = self.new_label()
         loop_branch = self.new_label()
         exit_branch = self.new_label()
-        self.code.append(('BRANCH', cond_branch))
-        self.code.append(('LABEL', cond_branch))
-        self.visit(node.cond)
-        self.code.append(('CBRANCH', node.cond.register, loop_branch, exit_branch))
-        self.code.append(('LABEL', loop_branch))
+        self._end_block(Op.BRANCH, cond_branch)
+        self._label(cond_branch)
+        yield from self._branch(node.cond, loop_branch, exit_branch)
+        self._label(loop_branch)
         for statement in node.body:
-            self.visit(statement)
+            yield statement
             if getattr(statement, 'name', None) == 'break':
-                self.code.append(('BRANCH', exit_branch))
+                self._end_block(Op.BRANCH, exit_branch)
             if getattr(statement, 'name', None) == 'continue':
-                self.code.append(('BRANCH', cond_branch))
-        self.visit(node.step)
-        self.code.append(('BRANCH', cond_branch))
-        self.code.append(('LABEL', exit_branch))
+                self._end_block(Op.BRANCH, cond_branch)
+        yield node.step
+        self._end_block(Op.BRANCH, cond_branch)
+        self._label(exit_branch)
 
     def visit_FuncDeclaration(self, node):
         module_code = self.code
         param_names = [arg.name for arg in node.arguments]
         param_types = [arg.type for arg in node.arguments]
+        module_block = self.block
         self.code = Function(node.name, node.datatype.type, param_names, param_types)
-        self.visit(node.body)
+        self.code.frame_size = len(param_names)
+        self.block = 'entry'
+        yield node.body
         self.functions.append(self.code)
         self.code = module_code
+        self.block = module_block
 
     def visit_FunctionCall(self, node):
-        self.visit(node.arguments)
+        yield node.arguments
         target = self.new_register()
         registers = [arg.register for arg in node.arguments]
-        self.code.append(('CALL', node.name.name, *registers, target))
+        self.code.emit(Op.CALL, node.name.name, *registers, target)
         node.register = target
 
     def visit_ReturnStatement(self, node):
-        self.visit(node.value)
-        self.code.append(('RET', node.value.register))
+        yield node.value
+        self._end_block(Op.RET, node.value.register)
 
     def visit_ConstDeclaration(self, node):
-        self.visit(node.value)
+        yield node.value
         self._declare(node)
         self._store(node)
 
     def visit_VarDeclaration(self, node):
-        self.visit(node.value)
+        yield node.value
         self._declare(node)
         if node.value is not None:
             self._store(node)
 
     def visit_Assignment(self, node):
-        self.visit(node.value)
+        yield node.value
         self._store(node)
 
     def visit_ReadLocation(self, node):
         target = self.new_register()
-        code = 'LOAD' + _type_char(node.type)
-        inst = (code, node.location.name, target)
-        self.code.append(inst)
+        self.code.emit(_loads[node.type.code], self._variable(node.location), target)
         node.register = target
 
     def _literal(self, node):
         target = self.new_register()
-        code = 'MOV' + _type_char(node.type)
-        if node.type in {'int', 'float'}:
+        code = _moves[node.type.code]
+        if node.type is INT or node.type is FLOAT:
             value = node.value
-        elif node.type == 'char':
+        elif node.type is CHAR:
             value = ord(node.value)
         else:
             value = 1 if node.value else 0
-        self.code.append((code, value, target))
+        self.code.emit(code, value, target)
         node.register = target
 
     def _declare(self, node):
-        code = 'ALLOC' if node.scope == 'local' else 'VAR'
-        self.code.append((code + _type_char(node.type), node.name.name))
+        code = _allocs if node.scope == 'local' else _vars
+        self.code.emit(code[node.type.code], self._variable(node.name))
+        if node.scope == 'local':
+            self.code.frame_size = max(self.code.frame_size, node.slot.index + 1)
 
     def _store(self, node):
-        code = 'STORE' + _type_char(node.value.type)
-        inst = (code, node.value.register, node.name.name)
-        self.code.append(inst)
-
-def _type_char(type_name):
-    if type_name in {'int', 'float'}:
-        return type_name[0].upper()
-    elif type_name == 'char':
-        return 'B'
-    return 'I'
-
-def _build_instruction_name(op_name, type_name):
-    op_table = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV'}
-    and_or = {'&&': 'AND', '||': 'OR'}
-    rel_table = {op: 'CMP' for op in ('<', '>', '<=', '>=', '==', '!=')}
-    if op_name in op_table:
-        return (op_table[op_name] + _type_char(type_name),)
-    elif op_name in rel_table:
-        return (rel_table[op_name] + _type_char(type_name), op_name)
-    elif op_name in and_or:
-        return (and_or[op_name],)
+        self.code.emit(_stores[node.value.type.code], node.value.register, self._variable(node.name))
+
+    def _variable(self, location):
+        '''
+        The operand naming the variable at location
+        '''
+        return location.slot if self.slots else location.name
+
+_op_table = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV'}
+_and_or = {'&&': 'AND', '||': 'OR'}
+
+_rel_table = {op: 'CMP' for op in ('<', '>', '<=', '>=', '==', '!=')}
+
+def _build_instruction_name(op_name, type):
+    if op_name in _op_table:
+        return (Op.__members__.get(_op_table[op_name] + type.char),)
+    elif op_name in _rel_table:
+        return (Op.__members__.get(_rel_table[op_name] + type.char), op_name)
+    elif op_name in _and_or:
+        return (Op[_and_or[op_name]],)
     else:
-        raise RuntimeError(f'Unknown operation {op}')
+        raise RuntimeError(f'Unknown operation {op_name}')
+
+# The opcode (and operator operand) for each operator and type of
+# operands, as _instructions[op][type.code]
+_instructions = {op: [_build_instruction_name(op, type) for type in all_types]
+                 for op in (*_op_table, *_rel_table, *_and_or)}
+
+# The opcode of the MOV, PRINT, LOAD, STORE, VAR and ALLOC instructions
+# on each type, by type.code
+_moves, _prints, _loads, _stores, _vars, _allocs = (
+    [Op[name + type.char] for type in all_types]
+    for name in ('MOV', 'PRINT', 'LOAD', 'STORE', 'VAR', 'ALLOC'))
 
 
 # ----------------------------------------------------------------------
@@ -358,21 +701,32 @@ def _build_instruction_name(op_name, type_name):
 # Note: Some changes will be required in later projects.
 # ----------------------------------------------------------------------
 
-def compile_ircode(source):
+def compile_ircode(source, slots=False, optimize=False):
     '''
-    Generate intermediate code from source.
+    Generate intermediate code from source (text or an open file).
+    Variables are named by their Slot if slots is true, and the code is
+    improved by the passes of optimize.py if optimize is true.  The errors
+    found are passed on to the current Diagnostics (see errors.py) when
+    done.
     '''
     from .parser import parse
     from .checker import check_program
-    from .errors import errors_reported
+    from .errors import Diagnostics, report
 
-    ast = parse(source)
-    check_program(ast)
+    # Decide on the errors of this compilation alone, as others may be
+    # reporting to the same Diagnostics at the same time
+    with Diagnostics() as diagnostics:
+        ast = parse(source)
+        check_program(ast)
+    report(diagnostics.diagnostics)
 
     # If no errors occurred, generate code
-    if not errors_reported():
-        gen = GenerateCode()
+    if not diagnostics.errors_reported():
+        gen = GenerateCode(slots)
         gen.visit(ast)
+        if optimize:
+            from .optimize import optimize as run_passes
+            run_passes(gen.functions)
         return gen.functions
     else:
         return []
@@ -384,8 +738,8 @@ def main():
         sys.stderr.write("Usage: python3 -m gone.ircode filename\n")
         raise SystemExit(1)
 
-    source = open(sys.argv[1]).read()
-    functions = compile_ircode(source)
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source)
 
     for function in functions:
         print('FUNCTION:', function.name)
@@ -0,0 +1,228 @@
+# gone/licm.py
+'''
+Loop-invariant code motion
+==========================
+GenerateCode puts the whole condition and body of a while or for loop
+inside the loop, so code whose value is the same on every iteration is
+run again each time.  In Tests/mandel.g,
+
+     while x < xmax {
+         ...
+     }
+
+loads the constant xmax on every iteration, as it would compute
+(xmax - xmin)/width if it were written in the loop.  hoist_invariants()
+moves such instructions out of the natural loops of each function (see
+cfg.py), into the loop's preheader, a block that runs once before the
+loop is entered:
+
+  * Each loop is given a preheader: the only predecessor of its header
+    outside the loop, which leads only to the header.  If there is none
+    (as after dce.py bypasses an empty block), a new block is made, and
+    the PHIs of the header take the value from it, through PHIs in the
+    preheader when the loop is entered from more than one block.
+
+  * An instruction is invariant if it only sets a register, can't stop
+    the program (so no FTOI, and no division unless it divides by a
+    known non-zero constant), and reads only registers set outside the
+    loop or by other invariant instructions.  As each register is only
+    assigned once, moving the instruction up to the preheader, which
+    dominates the loop, gives it the same value everywhere that it is
+    used.  Invariant instructions are hoisted even from blocks that
+    don't run on every iteration: they are only run once more, at most.
+
+  * A LOAD is invariant if the variable is not set in the loop and, if
+    the loop calls a function, it is a local variable by Slot or a
+    global that no function but __init stores, like a const.
+
+Loops are done innermost first, so that code hoisted into the
+preheader of an inner loop, which is in the outer loop, can be hoisted
+again.  The pass moves code rather than removing it: the number that it
+returns is 0, or negative when it makes preheaders.  To see the code of
+a program after the pass, run:
+
+     bash % python3 -m gone.licm someprogram.g
+'''
+
+from .cfg import BasicBlock
+from .checker import Slot, LOCAL
+from .ircode import Op, registers
+
+_moves = {Op.MOVI, Op.MOVF, Op.MOVB}
+_loads = {Op.LOADI, Op.LOADF, Op.LOADB}
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+_divisions = {Op.DIVI, Op.DIVF}
+
+# Instructions that set a variable
+_sets = _stores | {Op.VARI, Op.VARF, Op.VARB, Op.ALLOCI, Op.ALLOCF, Op.ALLOCB}
+
+# Instructions on registers that set a register and do nothing else.
+# FTOI is left out: converting an infinite float stops the interpreter.
+_pure = frozenset(op for op in Op if op.name[:-1] in ('MOV', 'ADD', 'SUB', 'MUL', 'DIV', 'CMP')
+                  or op.name in ('AND', 'OR', 'XOR', 'ITOF', 'BTOI', 'ITOB'))
+
+def hoist_invariants(functions):
+    '''
+    Move the loop-invariant instructions of the program functions (the
+    list of Functions made by GenerateCode) out of their loops, changing
+    their code.  Return the number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    # The variables that a call may store
+    clobbered = set()
+    for function in functions:
+        if function.name != '__init':
+            for op, operands in function.instructions():
+                if op in _sets:
+                    variable = _variable(op, operands)
+                    if not _local(variable):
+                        clobbered.add(variable)
+    for function in functions:
+        cfg = function.cfg()
+        if _hoist(cfg, clobbered):
+            cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def _variable(op, operands):
+    return operands[1] if op in _stores else operands[0]
+
+def _local(variable):
+    return variable.__class__ is Slot and variable.scope == LOCAL
+
+def _hoist(cfg, clobbered):
+    '''
+    Hoist the invariant instructions of the loops of the graph cfg.
+    Return False if it has no loops.
+    '''
+    cfg.remove_unreachable()
+    if not cfg.loops:
+        return False
+    for header in [loop.header for loop in cfg.loops]:
+        if header is not cfg.entry:
+            _make_preheader(cfg, header)
+
+    values = { }
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            if op in _moves:
+                values[operands[1]] = operands[0]
+
+    for loop in cfg.loops:
+        if loop.header is cfg.entry:
+            continue
+        preheader, = [pred for pred in loop.header.preds if pred not in loop]
+        defined = set()
+        stored = set()
+        calls = False
+        for block in loop.blocks:
+            for op, operands in block.instructions:
+                target = registers(op, operands)[1]
+                if target is not None:
+                    defined.add(target)
+                if op in _sets:
+                    stored.add(_variable(op, operands))
+                elif op is Op.CALL:
+                    calls = True
+
+        def invariant(op, operands):
+            if op in _loads:
+                variable = operands[0]
+                return (variable not in stored
+                        and (not calls or _local(variable) or variable not in clobbered))
+            if op in _divisions and values.get(operands[1], 0) == 0:
+                return False
+            return op in _pure and not set(registers(op, operands)[0]) & defined
+
+        # Hoist until no more instructions become invariant
+        hoisted = []
+        changed = True
+        while changed:
+            changed = False
+            for block in loop.blocks:
+                code = []
+                for op, operands in block.instructions:
+                    if invariant(op, operands):
+                        hoisted.append((op, operands))
+                        defined.discard(operands[-1])
+                        changed = True
+                    else:
+                        code.append((op, operands))
+                block.instructions = code
+        if hoisted:
+            n = len(preheader.instructions) - (preheader.terminator is not None)
+            preheader.instructions[n:n] = hoisted
+    return True
+
+def _make_preheader(cfg, header):
+    '''
+    Make sure that the loop of header has a preheader
+    '''
+    loop, = [loop for loop in cfg.loops if loop.header is header]
+    outside = [pred for pred in header.preds if pred not in loop]
+    if len(outside) == 1 and outside[0].succs == [header]:
+        return
+
+    numbers = [int(label[1:]) for label in cfg.labels if label[1:].isdigit()]
+    preheader = BasicBlock(f'B{max(numbers, default=0) + 1}')
+    n = cfg.blocks.index(header)
+    previous = cfg.blocks[n - 1]
+    if previous in loop and previous.terminator is None:
+        previous.instructions.append((Op.BRANCH, (header.label,)))
+    for pred in outside:
+        terminator = pred.terminator
+        if terminator is not None and terminator[0] in (Op.BRANCH, Op.CBRANCH):
+            operands = tuple([preheader.label if operand == header.label else operand
+                              for operand in terminator[1]])
+            pred.instructions[-1] = (terminator[0], operands)
+
+    # The PHIs of the header take the values from outside the loop from
+    # the preheader
+    labels = {pred.label for pred in outside}
+    top = 0
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            reads, target = registers(op, operands)
+            top = max(top, -1 if target is None else target, *reads)
+    for m, (op, operands) in enumerate(header.instructions):
+        if op not in _phis:
+            break
+        pairs = list(zip(operands[:-1:2], operands[1:-1:2]))
+        entering = [pair for pair in pairs if pair[0] in labels]
+        staying = [pair for pair in pairs if pair[0] not in labels]
+        if len(entering) == 1:
+            register = entering[0][1]
+        else:
+            top += 1
+            register = top
+            preheader.instructions.append(
+                (op, (*[operand for pair in entering for operand in pair], register)))
+        header.instructions[m] = (op, (*[operand for pair in staying for operand in pair],
+                                       preheader.label, register, operands[-1]))
+    preheader.instructions.append((Op.BRANCH, (header.label,)))
+    cfg.blocks.insert(n, preheader)
+    cfg.update()
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.licm filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    hoist_invariants(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,10 @@ from llvmlite.ir import (
     GlobalVariable, FunctionType)
 from collections import ChainMap
 
+from .checker import Slot
+from .ircode import Op, register_name
+from .tailcall import tail_call
+
 # Declare the LLVM type objects that you want to use for the low-level
 # in our intermediate code.  Basically, you're going to need to
 # declare the integer, float, and char types here.  These correspond
@@ -80,6 +84,13 @@ class GenerateLLVM(object):
         self.globals = {}
         self.vars = ChainMap(self.globals)
 
+        # Lists that hold the global variables and the variables of the
+        # current function by slot index, for code generated with slots
+        # (see ircode.py)
+        self.global_slots = []
+        self.frame = []
+        self.storage = [self.global_slots, self.frame]
+
         # Dictionary that holds all of the temporary registers created in
         # the intermediate code.
 
@@ -115,14 +126,18 @@ class GenerateLLVM(object):
                      'byte': byte_type,
                      'bool': int_type,
                      'void': void_type}
+        # register the functions first, as a function may call one that
+        # comes after it (see ipcp.py)
         for function in functions:
-            # register function
             name = function.name if function.name != 'main' else '_gone_main'
             return_type = type_dict[function.return_type]
             param_types = [type_dict[t] for t in function.param_types]
-            function_type = FunctionType(return_type, param_types)
-            self.function = Function(self.module, function_type, name=name)
-            self.globals[name] = self.function
+            self.globals[name] = Function(self.module, FunctionType(return_type, param_types), name=name)
+
+        for function in functions:
+            name = function.name if function.name != 'main' else '_gone_main'
+            param_types = [type_dict[t] for t in function.param_types]
+            self.function = self.globals[name]
             self.blocks = {}
             self.block = self.function.append_basic_block('entry')
             self.blocks['entry'] = self.block
@@ -130,48 +145,69 @@ class GenerateLLVM(object):
 
             # local scope
             self.vars = self.vars.new_child()
+            self.frame = [None] * max(function.frame_size, len(param_types))
+            self.storage = [self.global_slots, self.frame]
             self.temps = {}
             for n, (param_name, param_type) in enumerate(zip(function.param_names, param_types)):
                 var = self.builder.alloca(param_type, name=param_name)
                 var.initializer = Constant(param_type, 0)
                 self.vars[param_name] = var
+                self.frame[n] = var
                 self.builder.store(self.function.args[n], self.vars[param_name])
 
-            # alloc return var / block
-            if function.return_type != 'void':
-                self.vars['return'] = self.builder.alloca(return_type, name='return')
-            self.return_block = self.function.append_basic_block('return')
-
             # generate instructions
             self.generate_code(function)
 
+            # Each RET returns right away (see emit_RET), so only code
+            # falling off the end is left: the end of __init or a void
+            # function, or one that the checker lets through without a
             # return
             if not self.block.is_terminated:
-                self.builder.branch(self.return_block)
-
-            self.builder.position_at_end(self.return_block)
-            if function.return_type != 'void':
-                self.builder.ret(self.builder.load(self.vars['return'], 'return'))
-            else:
-                self.builder.ret_void()
+                if function.return_type != 'void':
+                    self.builder.unreachable()
+                else:
+                    self.builder.ret_void()
             self.vars = self.vars.parents
 
     def generate_code(self, ircode):
-        # Given a sequence of SSA intermediate code tuples, generate LLVM
-        # instructions using the current builder (self.builder).  Each
-        # opcode tuple (opcode, args) is dispatched to a method of the
-        # form self.emit_opcode(args)
-        for instr in ircode:
-            if instr[0] == 'LABEL':
-                self.blocks[instr[1]] = self.function.append_basic_block(instr[1])
-
-        for opcode, *args in ircode:
-            if opcode == 'CALL':
-                self.emit_CALL(*args[:-1], target=args[-1])
-            elif hasattr(self, 'emit_'+opcode):
-                getattr(self, 'emit_'+opcode)(*args)
-            else:
-                print('Warning: No emit_'+opcode+'() method')
+        # Given the intermediate code of a function (see ircode.py),
+        # generate LLVM instructions using the current builder
+        # (self.builder).  There is an LLVM block for each labelled
+        # block of its control-flow graph (see cfg.py).  Each instruction
+        # (opcode, args) is dispatched to a method of the form
+        # self.emit_opcode(args), or self.emit_opcode_slot(args) for the
+        # instructions on variables by slot.  Registers are passed by
+        # number.  The values of a PHI instruction are added once all
+        # the blocks are done, as they may come from later blocks.
+        cfg = ircode.cfg()
+        self.phis = []
+        for block in cfg.blocks[1:]:
+            if block.label is not None:
+                self.blocks[block.label] = self.function.append_basic_block(block.label)
+
+        for block in cfg.blocks:
+            if block is not cfg.entry and block.label is not None:
+                self.emit_LABEL(block.label)
+            elif block is not cfg.entry:
+                # Code after a return, break or continue that has no
+                # label can't be reached, but needs an LLVM block of its
+                # own all the same
+                self.block = self.function.append_basic_block()
+                self.builder.position_at_end(self.block)
+            for n, (op, args) in enumerate(block.instructions):
+                slot = any(arg.__class__ is Slot for arg in args)
+                method = _emitters[slot][op]
+                if op is Op.CALL:
+                    self.emit_CALL(*args[:-1], target=args[-1],
+                                   tail=tail_call(block.instructions, n))
+                elif method is not None:
+                    method(self, *args)
+                else:
+                    print('Warning: No emit_'+op.name+('_slot' if slot else '')+'() method')
+
+        for phi, incoming in self.phis:
+            for label, source in zip(incoming[::2], incoming[1::2]):
+                phi.add_incoming(self.temps[source], self.blocks[label])
 
     # ----------------------------------------------------------------------
     # Opcode implementation.   You must implement the opcodes.  A few
@@ -209,13 +245,13 @@ class GenerateLLVM(object):
     # value from a global variable and store in a temporary. Store
     # goes in the opposite direction.
     def emit_LOADI(self, name, target):
-        self.temps[target] = self.builder.load(self.vars[name], target)
+        self.temps[target] = self.builder.load(self.vars[name], register_name(target))
 
     def emit_LOADF(self, name, target):
-        self.temps[target] = self.builder.load(self.vars[name], target)
+        self.temps[target] = self.builder.load(self.vars[name], register_name(target))
 
     def emit_LOADB(self, name, target):
-        self.temps[target] = self.builder.load(self.vars[name], target)
+        self.temps[target] = self.builder.load(self.vars[name], register_name(target))
 
     def emit_STOREI(self, source, target):
         self.builder.store(self.temps[source], self.vars[target])
@@ -228,56 +264,75 @@ class GenerateLLVM(object):
 
     # Binary + operator
     def emit_ADDI(self, left, right, target):
-        self.temps[target] = self.builder.add(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.add(self.temps[left], self.temps[right], register_name(target))
 
     def emit_ADDF(self, left, right, target):
-        self.temps[target] = self.builder.fadd(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.fadd(self.temps[left], self.temps[right], register_name(target))
 
     # Binary - operator
     def emit_SUBI(self, left, right, target):
-        self.temps[target] = self.builder.sub(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.sub(self.temps[left], self.temps[right], register_name(target))
 
     def emit_SUBF(self, left, right, target):
-        self.temps[target] = self.builder.fsub(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.fsub(self.temps[left], self.temps[right], register_name(target))
 
     # Binary * operator
     def emit_MULI(self, left, right, target):
-        self.temps[target] = self.builder.mul(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.mul(self.temps[left], self.temps[right], register_name(target))
 
     def emit_MULF(self, left, right, target):
-        self.temps[target] = self.builder.fmul(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.fmul(self.temps[left], self.temps[right], register_name(target))
 
     # Binary / operator
     def emit_DIVI(self, left, right, target):
-        self.temps[target] = self.builder.sdiv(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.sdiv(self.temps[left], self.temps[right], register_name(target))
 
     def emit_DIVF(self, left, right, target):
-        self.temps[target] = self.builder.fdiv(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.fdiv(self.temps[left], self.temps[right], register_name(target))
 
     def emit_CMPI(self, op, left, right, target):
         tmp = self.builder.icmp_signed(op, self.temps[left], self.temps[right], 'tmp')
-        self.temps[target] = self.builder.zext(tmp, int_type, target)
+        self.temps[target] = self.builder.zext(tmp, int_type, register_name(target))
 
     def emit_CMPF(self, op, left, right, target):
         tmp = self.builder.fcmp_ordered(op, self.temps[left], self.temps[right], 'tmp')
-        self.temps[target] = self.builder.zext(tmp, int_type, target)
+        self.temps[target] = self.builder.zext(tmp, int_type, register_name(target))
 
     def emit_CMPB(self, op, left, right, target):
         tmp = self.builder.icmp_signed(op, self.temps[left], self.temps[right], 'tmp')
-        self.temps[target] = self.builder.zext(tmp, int_type, target)
+        self.temps[target] = self.builder.zext(tmp, int_type, register_name(target))
 
     # Logical ops
     def emit_AND(self, left, right, target):
-        self.temps[target] = self.builder.and_(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.and_(self.temps[left], self.temps[right], register_name(target))
 
     def emit_OR(self, left, right, target):
-        self.temps[target] = self.builder.or_(self.temps[left], self.temps[right], target)
+        self.temps[target] = self.builder.or_(self.temps[left], self.temps[right], register_name(target))
 
     # control flow
     def emit_LABEL(self, label):
+        # Code that falls through into the block (see dce.py)
+        if not self.block.is_terminated:
+            self.builder.branch(self.blocks[label])
         self.block = self.blocks[label]
         self.builder.position_at_end(self.blocks[label])
 
+    # PHI instructions of code in SSA form (see ssa.py)
+    def emit_PHII(self, *args):
+        self._phi(int_type, args)
+
+    def emit_PHIF(self, *args):
+        self._phi(float_type, args)
+
+    def emit_PHIB(self, *args):
+        self._phi(byte_type, args)
+
+    def _phi(self, type, args):
+        *incoming, target = args
+        phi = self.builder.phi(type, name=register_name(target))
+        self.temps[target] = phi
+        self.phis.append((phi, incoming))
+
     def emit_BRANCH(self, label):
         if not self.block.is_terminated:
             self.builder.branch(self.blocks[label])
@@ -302,14 +357,61 @@ class GenerateLLVM(object):
         var.initializer = Constant(byte_type, 0)
         self.vars[name] = var
 
+    # Variables by slot.  The storage is made as for variables by name and
+    # entered in self.global_slots or self.frame as well.
+    def emit_VARI_slot(self, slot):
+        self.emit_VARI(slot.name)
+        self._set_slot(slot, self.globals[slot.name])
+
+    def emit_VARF_slot(self, slot):
+        self.emit_VARF(slot.name)
+        self._set_slot(slot, self.globals[slot.name])
+
+    def emit_VARB_slot(self, slot):
+        self.emit_VARB(slot.name)
+        self._set_slot(slot, self.globals[slot.name])
+
+    def emit_ALLOCI_slot(self, slot):
+        self.emit_ALLOCI(slot.name)
+        self._set_slot(slot, self.vars[slot.name])
+
+    def emit_ALLOCF_slot(self, slot):
+        self.emit_ALLOCF(slot.name)
+        self._set_slot(slot, self.vars[slot.name])
+
+    def emit_ALLOCB_slot(self, slot):
+        self.emit_ALLOCB(slot.name)
+        self._set_slot(slot, self.vars[slot.name])
+
+    def emit_LOADI_slot(self, slot, target):
+        self.temps[target] = self.builder.load(self.storage[slot.scope][slot.index], register_name(target))
+
+    emit_LOADF_slot = emit_LOADI_slot
+    emit_LOADB_slot = emit_LOADI_slot
+
+    def emit_STOREI_slot(self, source, slot):
+        self.builder.store(self.temps[source], self.storage[slot.scope][slot.index])
+
+    emit_STOREF_slot = emit_STOREI_slot
+    emit_STOREB_slot = emit_STOREI_slot
+
+    def _set_slot(self, slot, var):
+        storage = self.storage[slot.scope]
+        if slot.index >= len(storage):
+            storage.extend([None] * (slot.index + 1 - len(storage)))
+        storage[slot.index] = var
+
     def emit_RET(self, source):
-        self.builder.store(self.temps[source], self.vars['return'])
-        self.builder.branch(self.return_block)
+        # Returning here keeps a call just before it in tail position
+        self.builder.ret(self.temps[source])
 
-    def emit_CALL(self, func_name, *args, target):
+    def emit_CALL(self, func_name, *args, target, tail=False):
+        # A call whose result is returned right away is marked tail (see
+        # tailcall.py): Gone has no pointers, so the callee never uses
+        # the caller's frame
         func = self.vars[func_name]
         args = [self.temps[arg] for arg in args]
-        self.temps[target] = self.builder.call(func, args)
+        self.temps[target] = self.builder.call(func, args, tail=tail)
 
     # Print statements
     def emit_PRINTI(self, source):
@@ -321,16 +423,23 @@ class GenerateLLVM(object):
     def emit_PRINTB(self, source):
         self.builder.call(self.runtime['_print_byte'], [self.temps[source]])
 
+# The emit method for each opcode (None where there is none), for
+# instructions on variables by name and on variables by slot, as
+# _emitters[slot][op]
+_emitters = [[getattr(GenerateLLVM, f'emit_{op.name}{suffix}', None) for op in Op]
+             for suffix in ('', '_slot')]
+
 #######################################################################
 #                      TESTING/MAIN PROGRAM
 #######################################################################
 
-def compile_llvm(source):
+def compile_llvm(source, optimize=False):
     from .ircode import compile_ircode
 
-    # Compile intermediate code 
+    # Compile intermediate code, optimized by the passes of optimize.py
+    # if optimize is true
     # !!! This needs to be changed in Project 7/8
-    functions = compile_ircode(source)
+    functions = compile_ircode(source, slots=True, optimize=optimize)
 
     # Make the low-level code generator
     generator = GenerateLLVM()
@@ -342,12 +451,16 @@ def compile_llvm(source):
 def main():
     import sys
 
-    if len(sys.argv) != 2:
-        sys.stderr.write("Usage: python3 -m gone.llvmgen filename\n")
+    args = sys.argv[1:]
+    optimize = '-O' in args
+    if optimize:
+        args.remove('-O')
+    if len(args) != 1:
+        sys.stderr.write("Usage: python3 -m gone.llvmgen [-O] filename\n")
         raise SystemExit(1)
 
-    source = open(sys.argv[1]).read()
-    llvm_code = compile_llvm(source)
+    with open(args[0]) as source:
+        llvm_code = compile_llvm(source, optimize)
     print(llvm_code)
 
 if __name__ == '__main__':
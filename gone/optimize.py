@@ -0,0 +1,81 @@
+# gone/optimize.py
+'''
+Optimization passes
+===================
+The passes in PASSES improve the intermediate code made by GenerateCode
+(see ircode.py).  Each one is a function taking the list of Functions
+of a program, changing their code in place and returning the number of
+instructions that it removed.  optimize() runs them in order:
+
+     functions = compile_ircode(source, slots=True)
+     stats = optimize(functions)
+
+and returns a dict with the number for each pass.  compile_ircode(source,
+slots=True, optimize=True) does the same, and the interpreter and LLVM
+generator take a -O option for it:
+
+     bash % python3 -m gone.interp -O someprogram.g
+
+To see the code of a program after all passes and the numbers, run:
+
+     bash % python3 -m gone.optimize someprogram.g
+'''
+
+from .constprop import propagate_constants
+from .dce import eliminate_dead_code
+from .gvn import number_values
+from .inline import inline_calls
+from .ipcp import specialize_calls
+from .licm import hoist_invariants
+from .ssa import promote_locals
+from .tailcall import eliminate_tail_calls
+
+# The passes, by name, in the order they are run
+PASSES = [
+    ('tailcall', eliminate_tail_calls),
+    ('inline', inline_calls),
+    ('mem2reg', promote_locals),
+    ('constprop', propagate_constants),
+    ('ipcp', specialize_calls),
+    ('gvn', number_values),
+    ('licm', hoist_invariants),
+    ('dce', eliminate_dead_code),
+]
+
+def optimize(functions, passes=None):
+    '''
+    Run the passes named in passes (all of PASSES if None) on the list of
+    Functions functions.  Return a dict mapping the name of each pass to
+    the number of instructions it removed.
+    '''
+    stats = { }
+    for name, run in PASSES:
+        if passes is None or name in passes:
+            stats[name] = stats.get(name, 0) + run(functions)
+    return stats
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.optimize filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    stats = optimize(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    for name, removed in stats.items():
+        print(f'{name}: {removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
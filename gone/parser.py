@@ -70,6 +70,16 @@ from .errors import error
 # Import the lexer class.  It's token list is needed to validate and
 # build the parser object.
 from .tokenizer import GoneLexer
+from .scanner import GoneScanner, TokenBuffer
+
+# ----------------------------------------------------------------------
+# The LALR tables built by SLY are cached in a file between runs.
+# See parsetables.py
+from . import parsetables
+
+# ----------------------------------------------------------------------
+# A hand-written parser for the same grammar.  See descent.py
+from .descent import GoneDescentParser
 
 # ----------------------------------------------------------------------
 # Get the AST nodes.  
@@ -80,6 +90,13 @@ class GoneParser(Parser):
     # Same token set as defined in the lexer
     tokens = GoneLexer.tokens
 
+    # File that the parsing tables are cached in (None to always build them)
+    tablefile = parsetables.default_tablefile('GoneParser')
+
+    @classmethod
+    def _build(cls, definitions):
+        parsetables.build(cls, definitions)
+
     # ----------------------------------------------------------------------
     # Operator precedence table.   Operators must follow the same 
     # precedence rules as in Python.  Instructions to be given in the project.
@@ -350,13 +367,45 @@ class GoneParser(Parser):
 #                     DO NOT MODIFY ANYTHING BELOW HERE
 # ----------------------------------------------------------------------
 
-def parse(source):
+# Lexer backends that parse() can tokenize the source with.  Both produce
+# the same token stream; the scanner is the faster of the two.
+lexers = {
+    'sly': GoneLexer,
+    'scanner': GoneScanner,
+}
+
+# Parsers that parse() can use.  Both build the same AST; the hand-written
+# one (see descent.py) is the faster of the two.
+parsers = {
+    'sly': GoneParser,
+    'descent': GoneDescentParser,
+}
+
+def parse(source, lexer=None, parser='sly', validate=False):
     '''
     Parse source code into an AST. Return the top of the AST tree.
+    lexer and parser name one of the backends in lexers and parsers
+    respectively.  source may also be a TokenBuffer made by
+    GoneScanner.scan(), which is parsed directly, or an open file.  A
+    file is read a chunk at a time by the scanner, the default lexer for
+    files (the default for text is 'sly'); other lexers read all of it
+    first.  The parsers are trusted to build well-formed trees, so the
+    types of node fields are only checked when validate is true.
     '''
-    lexer = GoneLexer()
-    parser = GoneParser()
-    ast = parser.parse(lexer.tokenize(source))
+    stream = hasattr(source, 'read')
+    if lexer is None:
+        lexer = 'scanner' if stream else 'sly'
+    if isinstance(source, TokenBuffer):
+        tokens = iter(source)
+    elif stream and lexer == 'scanner':
+        tokens = GoneScanner().tokenize_stream(source)
+    else:
+        tokens = lexers[lexer]().tokenize(source.read() if stream else source)
+    if validate:
+        ast = parsers[parser]().parse(tokens)
+    else:
+        with unchecked():
+            ast = parsers[parser]().parse(tokens)
     return ast
 
 def main():
@@ -370,7 +419,8 @@ def main():
         raise SystemExit(1)
 
     # Parse and create the AST
-    ast = parse(open(sys.argv[1]).read())
+    with open(sys.argv[1]) as source:
+        ast = parse(source)
 
     # Output the resulting parse tree structure
     for depth, node in flatten(ast):
@@ -54,8 +54,8 @@ def main():
         sys.stderr.write("Usage: python3 -m gone.run filename\n")
         raise SystemExit(1)
 
-    source = open(sys.argv[1]).read()
-    llvm_code = compile_llvm(source)
+    with open(sys.argv[1]) as source:
+        llvm_code = compile_llvm(source)
     if not errors_reported():
         run(llvm_code)
 
@@ -0,0 +1,360 @@
+# gone/scanner.py
+'''
+Hand-written scanner
+====================
+GoneLexer (see tokenizer.py) is built on SLY, which is convenient while
+the token set is still changing but pays for its generality on every
+token: a Token object is filled in by the generic driver loop, handler
+methods are looked up and called through dictionaries, and the ID rule
+rebuilds its keyword set each time it fires.  On large generated sources
+lexing becomes a noticeable share of the total compile time.
+
+GoneScanner is a drop-in alternative.  The token rules are listed in
+exactly the same order as the rules in GoneLexer, so that the same
+alternative wins at every position, and are precompiled into one master
+pattern per starting character: at any position only the rules that can
+begin with the character found there are tried.  The driver loop then
+dispatches on the name of the group that matched.  The scanner produces
+the same token stream (type, value, lineno and index) and reports the
+same error messages as GoneLexer:
+
+     lineno: Illegal character 'c'
+     lineno: Unterminated character "'c"
+     lineno: Unterminated comment '/* ...'
+
+To select it when parsing, use parse(source, lexer='scanner') from
+gone/parser.py.  To compare the speed of the two lexers, run:
+
+     bash % python3 -m gone.bench lex
+
+For large inputs, GoneScanner.scan() stores the whole token stream in a
+compact TokenBuffer instead: integer type codes and start/end offsets in
+arrays, with values and line numbers only worked out when asked for.
+parse() accepts a TokenBuffer in place of the source text.  Memory use
+of the two forms is compared by:
+
+     bash % python3 -m gone.bench tokens
+
+GoneScanner.tokenize_stream() lexes an open file without reading all of
+it first.  Memory use is bounded by the chunk size (plus the longest
+line or block comment), not by the size of the file.  parse() uses it
+for file objects, and the command line programs pass it open files:
+
+     bash % python3 -m gone.bench stream
+'''
+
+import re
+from array import array
+from bisect import bisect_left
+from itertools import repeat
+
+from sly.lex import Token
+
+from .errors import error
+
+# ----------------------------------------------------------------------
+# Token rules, in priority order.  These mirror the definitions in
+# GoneLexer one for one.  The first entry stands in for SLY's "ignore"
+# characters, which are always skipped before any rule is tried.
+# Lower-case names are patterns that never produce a token.
+#
+# Each rule also lists the characters that a match can start with.  The
+# scanner uses these to try only the rules that can possibly match at a
+# given position, which is where most of its speed comes from.
+
+_digits = '0123456789'
+_letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+
+_rules = [
+    ('ignore',               ' \t\r', r'[ \t\r]+'),
+    ('line_comment',         '/',    r'//.*?\n'),
+    ('block_comment',        '/',    r'/\*[\s\S]*?\*/'),
+    ('unterminated_comment', '/',    r'/\*[\s\S]*'),
+    ('newlines',             '\n',   r'\n+'),
+    ('LE',         '<',  r'<='),
+    ('GE',         '>',  r'>='),
+    ('LT',         '<',  r'<'),
+    ('GT',         '>',  r'>'),
+    ('EQ',         '=',  r'=='),
+    ('NE',         '!',  r'!='),
+    ('AND',        '&',  r'&&'),
+    ('OR',         '|',  r'\|\|'),
+    ('NOT',        '!',  r'\!'),
+    ('INCR',       '+',  r'\+\+'),
+    ('DECR',       '-',  r'--'),
+    ('AUG_PLUS',   '+',  r'\+='),
+    ('AUG_MINUS',  '-',  r'-='),
+    ('AUG_TIMES',  '*',  r'\*='),
+    ('AUG_DIVIDE', '/',  r'/='),
+    ('PLUS',       '+',  r'\+'),
+    ('MINUS',      '-',  r'-'),
+    ('TIMES',      '*',  r'\*'),
+    ('DIVIDE',     '/',  r'/'),
+    ('ASSIGN',     '=',  r'='),
+    ('LPAREN',     '(',  r'\('),
+    ('RPAREN',     ')',  r'\)'),
+    ('LCBRACE',    '{',  r'\{'),
+    ('RCBRACE',    '}',  r'\}'),
+    ('SEMI',       ';',  r';'),
+    ('COMMA',      ',',  r','),
+    ('FLOAT',      _digits + '.', r'(\d+\.?\d*[Ee][+-]?\d+)|(\d+\.\d*)|(\d*\.\d+)'),
+    ('INTEGER',    _digits,       r'\b(\d+|(0[a-z][\da-z]+))\b'),
+    ('CHAR',       "'",  r"'\\[n\\']'|'\\x[0-9a-f]{2}'|'.'"),
+    ('unterminated_char', "'", r"\'."),
+    ('ID',         _letters, r'\b[a-zA-Z_][a-zA-Z_0-9]*\b'),
+]
+
+def _master_pattern(rules):
+    return re.compile('|'.join(f'(?P<{name}>{pattern})' for name, _, pattern in rules))
+
+def _build_dispatch(rules):
+    '''
+    Make a table mapping a first character to a pattern combining, in
+    priority order, all of the rules that can start with it.
+    '''
+    dispatch = {}
+    for char in sorted({char for _, first, _ in rules for char in first}):
+        dispatch[char] = _master_pattern([rule for rule in rules if char in rule[1]]).match
+    return dispatch
+
+_dispatch = _build_dispatch(_rules)
+
+# All rules together.  Used for characters outside of the table above
+# (\d also matches non-ASCII digits, for example).
+_master = _master_pattern(_rules).match
+
+# Names of the rules that produce tokens
+_token_rules = frozenset(name for name, _, _ in _rules if name.isupper())
+
+# Reserved words are matched by the ID rule and then retyped
+keywords = {
+    'const': 'CONST', 'var': 'VAR', 'print': 'PRINT', 'true': 'TRUE',
+    'false': 'FALSE', 'if': 'IF', 'else': 'ELSE', 'while': 'WHILE',
+    'func': 'FUNC', 'return': 'RETURN', 'for': 'FOR', 'break': 'BREAK',
+    'continue': 'CONTINUE',
+}
+
+# Integer codes for the token types, as stored in a TokenBuffer
+token_types = sorted(_token_rules | set(keywords.values()))
+token_codes = {name: code for code, name in enumerate(token_types)}
+
+# Number of characters read at a time by GoneScanner.tokenize_stream()
+CHUNK_SIZE = 65536
+
+class GoneScanner(object):
+    '''
+    Table-driven scanner producing the same tokens as GoneLexer.
+    '''
+    def tokenize(self, text, lineno=1, index=0):
+        '''
+        Generate the tokens in text.  lineno and index give the position
+        at which scanning starts, as for GoneLexer.tokenize().
+        '''
+        return self._tokens(self._matches(text, lineno, index))
+
+    def tokenize_stream(self, stream, chunk_size=CHUNK_SIZE):
+        '''
+        Generate the tokens of the text read from stream, an object with a
+        read(size) method returning strings such as an open text file.
+        (A memory-mapped file can be wrapped in codecs.getreader().)  The
+        text is read chunk_size characters at a time and only the part
+        that has not been scanned yet is held in memory.
+        '''
+        return self._tokens(self._matches('', 1, 0, stream, chunk_size))
+
+    def scan(self, text):
+        '''
+        Scan all of text into a TokenBuffer.
+        '''
+        buffer = TokenBuffer(text)
+        types = buffer.types
+        starts = buffer.starts
+        ends = buffer.ends
+        codes = token_codes
+        for m in self._matches(text, 1, 0):
+            kind = m.lastgroup
+            types.append(codes[keywords.get(m.group(), kind) if kind == 'ID' else kind])
+            starts.append(m.start())
+            ends.append(m.end())
+        return buffer
+
+    def _tokens(self, matches):
+        for m in matches:
+            tok = Token()
+            tok.value = value = m.group()
+            kind = m.lastgroup
+            tok.type = keywords.get(value, kind) if kind == 'ID' else kind
+            tok.lineno = self.lineno
+            tok.index = self.offset + m.start()
+            tok.end = self.offset + m.end()
+            yield tok
+
+    def _matches(self, text, lineno, index, stream=None, chunk_size=None):
+        '''
+        Generate the match objects of all tokens in text, reporting errors
+        along the way.  self.lineno is the line of the latest match, and
+        self.offset the position of text in the whole input.
+
+        When reading from a stream, text is a window onto the input that
+        is refilled whenever a match might depend on characters that have
+        not been read yet.  That is the case unless the window holds the
+        rest of the current line (only comments and newlines can span
+        lines) and the match stops short of the end of the window.  One
+        character before the current position is kept across refills for
+        the benefit of the \\b anchors in the INTEGER and ID patterns.
+        '''
+        dispatch = _dispatch
+        master = _master
+        token_rules = _token_rules
+        self.offset = 0
+        length = len(text)
+        eof = stream is None
+        newline = -1
+        refill = False
+        while True:
+            if not eof:
+                if newline < index:
+                    newline = text.find('\n', index)
+                if refill or newline < 0 or index >= length:
+                    chunk = stream.read(chunk_size)
+                    keep = max(index - 1, 0)
+                    text = text[keep:] + chunk
+                    self.offset += keep
+                    index -= keep
+                    length = len(text)
+                    newline = -1
+                    refill = False
+                    eof = not chunk
+                    continue
+            if index >= length:
+                break
+
+            m = dispatch.get(text[index], master)(text, index)
+            if m is None:
+                error(lineno, f'Illegal character {text[index]!r}')
+                index += 1
+                continue
+
+            end = m.end()
+            if end == length and not eof:
+                refill = True
+                continue
+
+            kind = m.lastgroup
+            if kind in token_rules:
+                self.lineno = lineno
+                yield m
+            elif kind == 'newlines':
+                lineno += end - index
+            elif kind == 'line_comment':
+                lineno += 1
+            elif kind == 'block_comment':
+                lineno += text.count('\n', index, end)
+            elif kind == 'unterminated_comment':
+                error(lineno, f'Unterminated comment {m.group()!r}')
+                lineno += 1
+            elif kind == 'unterminated_char':
+                error(lineno, f'Unterminated character {m.group()!r}')
+            index = end
+
+        self.lineno = lineno
+        self.index = self.offset + index
+
+class TokenBuffer(object):
+    '''
+    A compact, struct-of-arrays token stream.  Token i has the type
+    token_types[types[i]] and spans text[starts[i]:ends[i]].  Values and
+    line numbers are only worked out when asked for; line numbers come
+    from a table of the offsets of all newlines in the text, which is
+    built the first time it is needed.
+
+    Iterating over a buffer produces BufferedToken objects, which have
+    the same attributes as the tokens of GoneLexer and can be handed to
+    GoneParser.parse() directly.
+    '''
+    def __init__(self, text):
+        self.text = text
+        self.types = array('B')
+        self.starts = array('l')
+        self.ends = array('l')
+        self._newlines = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, n):
+        if not -len(self.types) <= n < len(self.types):
+            raise IndexError('token index out of range')
+        return BufferedToken(self, n % len(self.types))
+
+    def __iter__(self):
+        return map(BufferedToken, repeat(self), range(len(self.types)))
+
+    def type(self, n):
+        return token_types[self.types[n]]
+
+    def value(self, n):
+        return self.text[self.starts[n]:self.ends[n]]
+
+    def lineno(self, n):
+        return self.lineno_at(self.starts[n])
+
+    def lineno_at(self, index):
+        '''
+        Return the line number of the character at offset index.
+        '''
+        if self._newlines is None:
+            self._newlines = array('l', (m.start() for m in re.finditer('\n', self.text)))
+        return bisect_left(self._newlines, index) + 1
+
+class BufferedToken(object):
+    '''
+    View of a single token in a TokenBuffer.  The line number is looked
+    up the first time it is asked for and then remembered.
+    '''
+    __slots__ = ('buffer', 'n', 'type', '_lineno')
+
+    def __init__(self, buffer, n):
+        self.buffer = buffer
+        self.n = n
+        self.type = token_types[buffer.types[n]]
+        self._lineno = None
+
+    @property
+    def value(self):
+        return self.buffer.value(self.n)
+
+    @property
+    def lineno(self):
+        if self._lineno is None:
+            self._lineno = self.buffer.lineno(self.n)
+        return self._lineno
+
+    @property
+    def index(self):
+        return self.buffer.starts[self.n]
+
+    @property
+    def end(self):
+        return self.buffer.ends[self.n]
+
+    def __repr__(self):
+        return f'Token(type={self.type!r}, value={self.value!r}, lineno={self.lineno}, index={self.index}, end={self.end})'
+
+def main():
+    '''
+    Main program. For debugging purposes.
+    '''
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.stderr.write("Usage: python3 -m gone.scanner filename\n")
+        raise SystemExit(1)
+
+    scanner = GoneScanner()
+    with open(sys.argv[1]) as source:
+        for tok in scanner.tokenize_stream(source):
+            print(tok)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# gone/ssa.py
+'''
+Promotion of local variables to registers
+=========================================
+GenerateCode keeps every variable in memory: a local variable is made
+by an ALLOC, and each use of it is a LOAD and each assignment a STORE,
+so a loop such as
+
+     while n > 0 {
+         total = total + n;
+         n = n - 1;
+     }
+
+goes to memory for every use of total and n on every iteration.
+Registers are only assigned once, and so can't hold a variable that
+changes.  promote_locals() (the mem2reg pass) turns the code of each
+function into true SSA form, where they can:
+
+  * Each STORE to a local variable becomes the register that was
+    stored, and each LOAD the register holding the value at that point
+    of the code.  An ALLOC becomes a MOV of 0 (or 0.0), the value that a
+    variable starts with.
+
+  * Where control flow joins and the variable can hold the values of
+    different registers on the way in, a PHI instruction (see ircode.py)
+    picks the register for the edge that was taken, into a new register
+    that holds the variable from there on.
+
+  * A parameter is loaded once, at the start of the function.
+
+This is the algorithm of Cytron et al. ("Efficiently Computing Static
+Single Assignment Form and the Control Dependence Graph"): PHIs for a
+variable go in the iterated dominance frontier of the blocks that store
+it (see cfg.py), but only in the blocks where the variable is live, and
+the variables are then renamed in a walk of the dominator tree.
+
+Gone has no pointers, so no local variable escapes and all of them are
+promoted.  Only variables named by Slot (code from GenerateCode(slots=
+True), as used by the interpreter and the LLVM generator) are changed:
+a variable named by name can't be told apart from a global of the same
+name that it shadows only after its declaration.  Global variables are
+left in memory, as any call may use them.
+
+To see the code of a program in SSA form, run:
+
+     bash % python3 -m gone.ssa someprogram.g
+'''
+
+from .checker import Slot, LOCAL
+from .ircode import Op, operand_kinds, registers
+
+_loads = {Op.LOADI, Op.LOADF, Op.LOADB}
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_allocs = {Op.ALLOCI, Op.ALLOCF, Op.ALLOCB}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+
+# By the type letter of the instructions on a variable
+_load_ops = {'I': Op.LOADI, 'F': Op.LOADF, 'B': Op.LOADB}
+_move_ops = {'I': Op.MOVI, 'F': Op.MOVF, 'B': Op.MOVB}
+_phi_ops = {'I': Op.PHII, 'F': Op.PHIF, 'B': Op.PHIB}
+_zeros = {'I': 0, 'F': 0.0, 'B': 0}
+
+# The instructions made for ALLOCs, parameters and reads before a store
+_made = {Op.MOVI, Op.MOVF, Op.MOVB, Op.LOADI, Op.LOADF, Op.LOADB}
+
+def promote_locals(functions):
+    '''
+    Put the code of the program functions (the list of Functions made by
+    GenerateCode) in SSA form, promoting their local variables to
+    registers.  Return the number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        cfg = function.cfg()
+        if _promote(cfg):
+            cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def _variable(op, operands):
+    '''
+    Return the local variable of a LOAD, STORE or ALLOC, or None
+    '''
+    if op in _loads or op in _allocs:
+        variable = operands[0]
+    elif op in _stores:
+        variable = operands[1]
+    else:
+        return None
+    if variable.__class__ is Slot and variable.scope == LOCAL:
+        return variable
+    return None
+
+def _promote(cfg):
+    '''
+    Promote the local variables of the graph cfg.  Return False if it
+    has none.
+    '''
+    cfg.remove_unreachable()
+
+    # The variables with the type letter of their instructions, and the
+    # blocks that set them
+    types = { }
+    defs = { }
+    top = -1
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            reads, target = registers(op, operands)
+            top = max(top, -1 if target is None else target, *reads)
+            variable = _variable(op, operands)
+            if variable is not None:
+                types[variable] = op.name[-1]
+                if op not in _loads:
+                    defs.setdefault(variable, set()).add(block)
+    if not types:
+        return False
+    params = sorted((variable for variable in types if variable.index < len(cfg.param_names)),
+                    key=lambda variable: variable.index)
+    for variable in params:
+        defs.setdefault(variable, set()).add(cfg.entry)
+
+    registers_made = iter(range(top + 1, 2**31))
+
+    # Place the PHIs: phis[block] is a list of [variable, incoming
+    # labels and registers, target]
+    live = _live_in(cfg, types)
+    frontiers = cfg.frontiers
+    phis = {block: [] for block in cfg.blocks}
+    for variable, blocks in defs.items():
+        placed = set()
+        work = list(blocks)
+        while work:
+            for block in frontiers[work.pop()]:
+                if block not in placed and block in live[variable]:
+                    placed.add(block)
+                    phis[block].append([variable, [], next(registers_made)])
+                    if block not in blocks:
+                        work.append(block)
+
+    # Rename, walking the dominator tree.  stacks[variable] holds the
+    # registers with the values of the variable in the blocks that
+    # dominate the current one, replace maps the targets of the LOADs
+    # to the registers with their value.
+    stacks = {variable: [] for variable in types}
+    replace = { }
+    start = []
+    for variable in params:
+        register = next(registers_made)
+        start.append((_load_ops[types[variable]], (variable, register)))
+        stacks[variable].append(register)
+
+    def current(variable):
+        if not stacks[variable]:
+            # Read before any store: the variable is still 0
+            register = next(registers_made)
+            start.append((_move_ops[types[variable]], (_zeros[types[variable]], register)))
+            stacks[variable].append(register)
+        return stacks[variable][-1]
+
+    work = [cfg.entry]
+    while work:
+        block = work.pop()
+        if block.__class__ is list:
+            # Leaving the subtree of a block
+            for variable in block:
+                stacks[variable].pop()
+            continue
+        pushed = []
+        for variable, incoming, target in phis[block]:
+            stacks[variable].append(target)
+            pushed.append(variable)
+        code = []
+        for op, operands in block.instructions:
+            variable = _variable(op, operands)
+            if variable is None:
+                if replace and op not in _phis:
+                    kinds = operand_kinds(op, len(operands))
+                    operands = tuple([replace.get(operand, operand) if kind == 'r' else operand
+                                      for kind, operand in zip(kinds, operands)])
+                code.append((op, operands))
+            elif op in _loads:
+                replace[operands[1]] = current(variable)
+            elif op in _stores:
+                stacks[variable].append(replace.get(operands[0], operands[0]))
+                pushed.append(variable)
+            else:
+                register = next(registers_made)
+                code.append((_move_ops[types[variable]], (_zeros[types[variable]], register)))
+                stacks[variable].append(register)
+                pushed.append(variable)
+        block.instructions = code
+        for succ in block.succs:
+            for variable, incoming, target in phis[succ]:
+                incoming += [block.label, current(variable)]
+        work.append(pushed)
+        work.extend(reversed(cfg.children[block]))
+
+    # The PHIs of the code (for && and ||) take registers from blocks that
+    # may come later in the walk
+    for block in cfg.blocks:
+        for n, (op, operands) in enumerate(block.instructions):
+            if op not in _phis:
+                break
+            block.instructions[n] = (op, tuple([replace.get(operand, operand) if kind == 'r' else operand
+                                                for kind, operand in zip(operand_kinds(op, len(operands)), operands)]))
+        block.instructions[:0] = [(_phi_ops[types[variable]], (*incoming, target))
+                                  for variable, incoming, target in phis[block]]
+    cfg.entry.instructions[:0] = start
+    _remove_unused(cfg, top)
+    cfg.frame_size = len(cfg.param_names)
+    cfg.update()
+    return True
+
+def _live_in(cfg, types):
+    '''
+    Return a dict mapping each variable to the set of blocks at whose
+    start it is live: where a LOAD can see the value that it had on
+    the way in
+    '''
+    exposed = {variable: set() for variable in types}
+    kills = {block: set() for block in cfg.blocks}
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            variable = _variable(op, operands)
+            if variable is None:
+                continue
+            if op in _loads:
+                if variable not in kills[block]:
+                    exposed[variable].add(block)
+            else:
+                kills[block].add(variable)
+
+    live = { }
+    for variable, blocks in exposed.items():
+        live[variable] = set(blocks)
+        work = list(blocks)
+        while work:
+            for pred in work.pop().preds:
+                if pred not in live[variable] and variable not in kills[pred]:
+                    live[variable].add(pred)
+                    work.append(pred)
+    return live
+
+def _remove_unused(cfg, top):
+    '''
+    Remove the MOVs and LOADs made by the pass (those with a target
+    above the register top) whose targets are not used
+    '''
+    used = set()
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            used.update(registers(op, operands)[0])
+    for block in cfg.blocks:
+        block.instructions = [(op, operands) for op, operands in block.instructions
+                              if op not in _made or operands[-1] <= top or operands[-1] in used]
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.ssa filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    promote_locals(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+
+if __name__ == '__main__':
+    main()
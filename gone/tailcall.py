@@ -0,0 +1,133 @@
+# gone/tailcall.py
+'''
+Tail-call elimination
+=====================
+A function that ends by returning the result of a call to itself,
+
+     func sum(n int, acc int) int {
+         if n == 0 { return acc; }
+         return sum(n - 1, acc + n);
+     }
+
+makes a new frame for each call, although it has nothing left to do
+with its own.  The interpreter runs out of Python stack after a few
+hundred calls, and compiled code uses a frame per call.
+eliminate_tail_calls() turns these calls into a loop, in the
+control-flow graph of each function (see cfg.py):
+
+  * A CALL of the function itself followed by a RET of its result
+    becomes STOREs of the arguments into the parameters, by Slot, and a
+    BRANCH back to the start of the function.
+
+  * The start of the function can't be the entry block, which can't be
+    branched to in LLVM, so the code of the entry moves to a new block
+    that the entry falls through to.
+
+The code of the function then runs again with the new parameter
+values, and mem2reg (see ssa.py) turns the parameters into PHIs of the
+loop.  Only code with variables by Slot is changed (see ircode.py).
+Other calls followed by a RET of their result are marked tail in the
+LLVM code (see llvmgen.py), for LLVM to do the same.
+
+To see the code of a program after the pass and the number of
+instructions it removed, run:
+
+     bash % python3 -m gone.tailcall someprogram.g
+'''
+
+from .cfg import BasicBlock
+from .checker import Slot, LOCAL
+from .ircode import Op, operand_kinds
+from .typesys import lookup_type
+
+_stores = {Op.STOREI, Op.STOREF, Op.STOREB}
+_variables = _stores | {op for op in Op if op.name[:-1] in ('LOAD', 'VAR', 'ALLOC')}
+_phis = {Op.PHII, Op.PHIF, Op.PHIB}
+
+def eliminate_tail_calls(functions):
+    '''
+    Replace the calls of the program functions (the list of Functions
+    made by GenerateCode) to themselves that are followed by a return
+    of their result with branches, changing their code.  Return the
+    number of instructions removed.
+    '''
+    before = sum(len(function) for function in functions)
+    for function in functions:
+        cfg = function.cfg()
+        if _eliminate(cfg):
+            cfg.function(function)
+    return before - sum(len(function) for function in functions)
+
+def tail_call(code, n):
+    '''
+    Return True if instruction n of code, a list of (op, operands)
+    pairs, is a CALL followed by a RET of its result
+    '''
+    op, operands = code[n]
+    return (op is Op.CALL and n + 1 < len(code)
+            and code[n + 1][0] is Op.RET and code[n + 1][1] == operands[-1:])
+
+def _eliminate(cfg):
+    '''
+    Turn the self tail calls of the graph cfg into branches.  Return
+    False if it has none.
+    '''
+    cfg.remove_unreachable()
+    sites = [block for block in cfg.blocks
+             if len(block.instructions) >= 2 and tail_call(block.instructions, len(block.instructions) - 2)
+             and block.instructions[-2][1][0] == cfg.name]
+    if not sites:
+        return False
+    for block in cfg.blocks:
+        for op, operands in block.instructions:
+            if op in _variables and (operands[1] if op in _stores else operands[0]).__class__ is not Slot:
+                return False
+
+    # The code of the entry moves to a new block
+    numbers = [int(label[1:]) for label in cfg.labels if label[1:].isdigit()]
+    start = BasicBlock(f'B{max(numbers, default=0) + 1}')
+    start.instructions = cfg.entry.instructions
+    cfg.entry.instructions = []
+    for succ in cfg.entry.succs:
+        for m, (op, operands) in enumerate(succ.instructions):
+            if op not in _phis:
+                break
+            kinds = operand_kinds(op, len(operands))
+            succ.instructions[m] = (op, tuple([start.label if kind == 'v' and operand == 'entry'
+                                               else operand for kind, operand in zip(kinds, operands)]))
+    cfg.blocks.insert(1, start)
+
+    for block in sites:
+        _, *args, target = block.instructions[-2][1]
+        code = block.instructions[:-2]
+        for index, (name, type, arg) in enumerate(zip(cfg.param_names, cfg.param_types, args)):
+            code.append((Op['STORE' + lookup_type(type).char], (arg, Slot(LOCAL, index, name))))
+        code.append((Op.BRANCH, (start.label,)))
+        block.instructions = code
+    cfg.update()
+    return True
+
+def main():
+    '''
+    Main program. Used for testing.
+    '''
+    import sys
+    from .ircode import compile_ircode
+
+    if len(sys.argv) != 2:
+        sys.stderr.write('Usage: python3 -m gone.tailcall filename\n')
+        raise SystemExit(1)
+
+    with open(sys.argv[1]) as source:
+        functions = compile_ircode(source, slots=True)
+
+    removed = eliminate_tail_calls(functions)
+    for function in functions:
+        print('FUNCTION:', function.name)
+        for code in function:
+            print('\t', code)
+        print('='*80)
+    print(f'{removed} instructions removed')
+
+if __name__ == '__main__':
+    main()
@@ -16,61 +16,128 @@ as simple strings.  Make tables that represent the capabilities
 of different types. Make some utility functions that check operators.
 KEEP IT SIMPLE. REPEAT. SIMPLE.
 
+Types are represented by GoneType objects, one per type.  A GoneType
+is a string, equal to the name of the type, so types print and compare
+as names do.  It also has a small integer code, which indexes the
+tables of operator results below, and the suffix char of the IR
+instructions on values of the type (see ircode.py).  Code that makes
+types from names should use the objects in builtin_types (or ERROR),
+which can be compared with "is".
 '''
 
-# List of builtin types.  These will get added to the symbol table
-builtin_types = [ 'int', 'float', 'char', 'bool', 'void' ]
+class GoneType(str):
+    '''
+    A type of Gone, identified by its name.  There is only one object
+    for each type.
+    '''
+    def __reduce__(self):
+        return (lookup_type, (str(self),))
+
+# All types by name, in order of their codes
+_types = { }
+
+def _define(name, char):
+    ty = GoneType(name)
+    ty.code = len(_types)
+    ty.char = char
+    _types[name] = ty
+    return ty
+
+INT   = _define('int', 'I')
+FLOAT = _define('float', 'F')
+CHAR  = _define('char', 'B')
+BOOL  = _define('bool', 'I')
+VOID  = _define('void', 'I')
+
+# The type of an expression that is in error
+ERROR = _define('error', 'I')
+
+# All types, in order of their codes
+all_types = tuple(_types.values())
+
+# Builtin types by name.  These will get added to the symbol table
+builtin_types = {name: ty for name, ty in _types.items() if ty is not ERROR}
 
 # Dict mapping all valid binary operations to a result type
 _supported_binops = {
-    ('int', '+', 'int')  : 'int',
-    ('int', '-', 'int')  : 'int',
-    ('int', '*', 'int')  : 'int',
-    ('int', '/', 'int')  : 'int',
-    ('int', '<', 'int')  : 'bool',
-    ('int', '>', 'int')  : 'bool',
-    ('int', '<=', 'int') : 'bool',
-    ('int', '>=', 'int') : 'bool',
-    ('int', '==', 'int') : 'bool',
-    ('int', '!=', 'int') : 'bool',
-    ('float', '+', 'float')  : 'float',
-    ('float', '-', 'float')  : 'float',
-    ('float', '*', 'float')  : 'float',
-    ('float', '/', 'float')  : 'float',
-    ('float', '<', 'float')  : 'bool',
-    ('float', '>', 'float')  : 'bool',
-    ('float', '<=', 'float') : 'bool',
-    ('float', '>=', 'float') : 'bool',
-    ('float', '==', 'float') : 'bool',
-    ('float', '!=', 'float') : 'bool',
-    ('bool', '&&', 'bool') : 'bool',
-    ('bool', '||', 'bool') : 'bool',
-    ('char', '==', 'char') : 'bool',
-    ('char', '!=', 'char') : 'bool',
-    ('char', '<', 'char')  : 'bool',
-    ('char', '>', 'char')  : 'bool',
-    ('char', '<=', 'char')  : 'bool',
-    ('char', '>=', 'char')  : 'bool',
+    (INT, '+', INT)  : INT,
+    (INT, '-', INT)  : INT,
+    (INT, '*', INT)  : INT,
+    (INT, '/', INT)  : INT,
+    (INT, '<', INT)  : BOOL,
+    (INT, '>', INT)  : BOOL,
+    (INT, '<=', INT) : BOOL,
+    (INT, '>=', INT) : BOOL,
+    (INT, '==', INT) : BOOL,
+    (INT, '!=', INT) : BOOL,
+    (FLOAT, '+', FLOAT)  : FLOAT,
+    (FLOAT, '-', FLOAT)  : FLOAT,
+    (FLOAT, '*', FLOAT)  : FLOAT,
+    (FLOAT, '/', FLOAT)  : FLOAT,
+    (FLOAT, '<', FLOAT)  : BOOL,
+    (FLOAT, '>', FLOAT)  : BOOL,
+    (FLOAT, '<=', FLOAT) : BOOL,
+    (FLOAT, '>=', FLOAT) : BOOL,
+    (FLOAT, '==', FLOAT) : BOOL,
+    (FLOAT, '!=', FLOAT) : BOOL,
+    (BOOL, '&&', BOOL) : BOOL,
+    (BOOL, '||', BOOL) : BOOL,
+    (CHAR, '==', CHAR) : BOOL,
+    (CHAR, '!=', CHAR) : BOOL,
+    (CHAR, '<', CHAR)  : BOOL,
+    (CHAR, '>', CHAR)  : BOOL,
+    (CHAR, '<=', CHAR)  : BOOL,
+    (CHAR, '>=', CHAR)  : BOOL,
     }
 
 # Dict mapping all valid unary operations to result type
 _supported_unaryops = {
-    ('+', 'int')   : 'int',
-    ('+', 'float') : 'float',
-    ('-', 'int')   : 'int',
-    ('-', 'float') : 'float',
-    ('!', 'bool')  : 'bool',
+    ('+', INT)   : INT,
+    ('+', FLOAT) : FLOAT,
+    ('-', INT)   : INT,
+    ('-', FLOAT) : FLOAT,
+    ('!', BOOL)  : BOOL,
     }
-    
+
+def _dense_tables():
+    binops = { }
+    for (left, op, right), result in _supported_binops.items():
+        table = binops.setdefault(op, [[ERROR] * len(_types) for _ in _types])
+        table[left.code][right.code] = result
+    unaryops = { }
+    for (op, operand), result in _supported_unaryops.items():
+        unaryops.setdefault(op, [ERROR] * len(_types))[operand.code] = result
+    return binops, unaryops
+
+# The same as dense tables: _binops[op][left.code][right.code] and
+# _unaryops[op][operand.code] are the result types
+_binops, _unaryops = _dense_tables()
+
+def lookup_type(name):
+    '''
+    Return the GoneType named name (which may also be a GoneType)
+    '''
+    return _types[name]
+
 def check_binop(left_type, op, right_type):
     ''' 
     Check the validity of a binary operator. 
     '''
-    return _supported_binops.get((left_type, op, right_type), 'error')
+    try:
+        return _binops[op][left_type.code][right_type.code]
+    except KeyError:
+        return ERROR
+    except AttributeError:
+        # Types given by name
+        return check_binop(_types.get(left_type, ERROR), op, _types.get(right_type, ERROR))
 
 def check_unaryop(op, type):
     '''
     Check the validity of a unary operator. 
     '''
-    return _supported_unaryops.get((op, type), 'error')
-
+    try:
+        return _unaryops[op][type.code]
+    except KeyError:
+        return ERROR
+    except AttributeError:
+        return check_unaryop(op, _types.get(type, ERROR))
@@ -0,0 +1,114 @@
+import io
+import contextlib
+import glob
+import os.path
+from unittest import TestCase
+from gone.arena import ASTArena, NodeView, parse as parse_arena
+from gone.ast import *
+from gone.bench import synthesize
+from gone.checker import check_program
+from gone.ircode import GenerateCode
+from gone.parser import parse
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def dump(ast):
+    return [(depth, repr(node), getattr(node, 'lineno', None)) for depth, node in flatten(ast)]
+
+def check(ast):
+    with contextlib.redirect_stderr(io.StringIO()) as stderr:
+        check_program(ast)
+    return stderr.getvalue()
+
+class TestArena(TestCase):
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with open(filename) as f:
+                source = f.read()
+            with self.subTest(filename=os.path.basename(filename)):
+                try:
+                    with contextlib.redirect_stderr(io.StringIO()):
+                        ast = parse(source, lexer='scanner', parser='descent')
+                except ValueError:
+                    continue
+                if ast is None:
+                    continue
+                arena = ASTArena.from_ast(ast)
+                self.assertEqual(dump(ast), dump(arena.ast))
+                errors = check(ast)
+                self.assertEqual(errors, check(arena.ast))
+                if not errors:
+                    gen, arena_gen = GenerateCode(), GenerateCode()
+                    gen.visit(ast)
+                    arena_gen.visit(arena.ast)
+                    self.assertEqual(gen.code.body, arena_gen.code.body)
+
+    def test_parse(self):
+        source = synthesize(200)
+        arena = parse_arena(source)
+        self.assertEqual(dump(parse(source)), dump(arena.ast))
+        self.assertEqual(dump(arena.ast), dump(parse_arena(io.StringIO(source)).ast))
+
+    def test_parse_syntax_error(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            arena = parse_arena('print 1;\nprint 2 +;\nprint 3;')
+        self.assertIn("2: Syntax error in input at token ';'", stderr.getvalue())
+        self.assertEqual([1, 3], [node.value.value for node in arena.ast])
+
+    def test_views(self):
+        arena = parse_arena('var x int = 1;\nfunc f(a int) int { return a + x; }\nprint f(2);')
+        self.assertEqual('', check(arena.ast))
+        decl, func, stmt = arena.ast
+        self.assertIsInstance(decl, NodeView)
+        self.assertIs(decl._ast_class, VarDeclaration)
+        self.assertEqual((decl.lineno, decl.type, decl.scope), (1, 'int', 'global'))
+        self.assertEqual((func.name, func.type, func.callable), ('f', 'int', True))
+        self.assertEqual(func.arguments[0].scope, 'local')
+        self.assertEqual(stmt.value.name.usage, 'read')
+        self.assertEqual(stmt.value, arena.ast[2].value)
+        self.assertEqual(repr(decl), 'VarDeclaration(name=SimpleLocation, datatype=SimpleType, value=IntegerLiteral)')
+        self.assertIsNone(getattr(decl.name, 'register', None))
+        with self.assertRaises(AttributeError):
+            decl.name.unknown = 1
+        with self.assertRaises(AttributeError):
+            decl.value = None
+        del decl.type
+        self.assertFalse(hasattr(decl, 'type'))
+
+    def test_literal_values(self):
+        arena = parse_arena('print 1; print 1.0; print true; print 1;')
+        values = [node.value.value for node in arena.ast]
+        self.assertEqual([int, float, bool, int], [type(value) for value in values])
+        self.assertEqual(3, len(arena.values))
+
+    def test_check_again(self):
+        # The symbols of f are set again in place, not added to values
+        arena = parse_arena('var x int = 1;\nfunc f(a int) int { return a + x; }\nprint f(2);')
+        self.assertEqual('', check(arena.ast))
+        size = len(arena.values)
+        self.assertEqual('', check(arena.ast))
+        self.assertEqual(size, len(arena.values))
+        func = arena.ast[1]
+        self.assertEqual(['a'], list(func.symbols))
+        self.assertEqual(func.arguments[0], func.symbols['a'])
+
+    def test_visitor_dispatch(self):
+        class Counter(NodeVisitor):
+            def __init__(self):
+                self.literals = 0
+            def visit_IntegerLiteral(self, node):
+                self.literals += 1
+
+        counter = Counter()
+        counter.visit(parse_arena('print 1 + 2 * x;\nvar y int = 3;').ast)
+        self.assertEqual(3, counter.literals)
+
+    def test_deep_tree(self):
+        depth = 100000
+        arena = parse_arena('var x int;\nprint x' + ' + 1' * depth + ';')
+        self.assertEqual(3 + 1 + 2 + 2 * depth, len(arena))
+        self.assertEqual('', check(arena.ast))
+        gen = GenerateCode()
+        gen.visit(arena.ast)
+        # VARI, LOADI, a MOVI and an ADDI per level, PRINTI
+        self.assertEqual(2 + 2 * depth + 1, len(gen.code.body))
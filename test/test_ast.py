@@ -0,0 +1,183 @@
+import io
+import contextlib
+import pickle
+import threading
+from unittest import TestCase
+from gone.ast import *
+from gone.checker import check_program
+from gone.ircode import GenerateCode, register_name
+from gone.parser import parse
+
+class TestAST(TestCase):
+    def test_no_dict(self):
+        for cls in AST._nodes.values():
+            with self.subTest(cls=cls.__name__):
+                self.assertNotIn('__dict__', dir(cls))
+                for name in cls._fields:
+                    self.assertIn(name, dir(cls))
+
+    def test_annotations(self):
+        ast = parse("var x int = 1;\nfunc f(a int) int { return a + x; }\nprint f(2);")
+        with contextlib.redirect_stderr(io.StringIO()):
+            check_program(ast)
+        decl, func, stmt = ast
+        self.assertEqual((decl.lineno, decl.type, decl.scope), (1, 'int', 'global'))
+        self.assertEqual((func.type, func.callable, func.arguments[0].scope), ('int', True, 'local'))
+        self.assertEqual(stmt.value.type, 'int')
+        self.assertEqual(stmt.value.name.usage, 'read')
+        self.assertIsNone(getattr(stmt.value, 'register', None))
+        with self.assertRaises(AttributeError):
+            stmt.value.unknown = 1
+
+    def test_validation(self):
+        with self.assertRaises(TypeError):
+            BinOp('+', IntegerLiteral(1), 2)
+        with self.assertRaises(TypeError):
+            IfStatement(BoolLiteral(True), [IntegerLiteral(1)], [])
+        with self.assertRaises(TypeError):
+            UnaryOp('-')
+
+    def test_unchecked(self):
+        with unchecked():
+            node = BinOp('+', IntegerLiteral(1), 2, lineno=3)
+            # The number of arguments is still checked
+            with self.assertRaises(TypeError):
+                UnaryOp('-')
+        self.assertEqual((node.right, node.lineno), (2, 3))
+        with self.assertRaises(TypeError):
+            BinOp('+', IntegerLiteral(1), 2)
+
+    def test_unchecked_thread_local(self):
+        errors = []
+        def build():
+            try:
+                BinOp('+', IntegerLiteral(1), 2)
+            except TypeError as e:
+                errors.append(e)
+        with unchecked():
+            thread = threading.Thread(target=build)
+            thread.start()
+            thread.join()
+        self.assertEqual(1, len(errors))
+
+    def test_parse_validate(self):
+        source = "print 1 + 2 * -x;"
+        self.assertEqual([repr(node) for _, node in flatten(parse(source))],
+                         [repr(node) for _, node in flatten(parse(source, validate=True))])
+
+    def test_pickle(self):
+        node = BinOp('+', IntegerLiteral(1, lineno=1), IntegerLiteral(2), lineno=1)
+        node.type = 'int'
+        copy = pickle.loads(pickle.dumps(node))
+        self.assertEqual((copy.op, copy.left.value, copy.left.lineno, copy.type),
+                         ('+', 1, 1, 'int'))
+        self.assertFalse(hasattr(copy.right, 'lineno'))
+
+class TestNodeVisitor(TestCase):
+    def test_dispatch(self):
+        class Counter(NodeVisitor):
+            def __init__(self):
+                self.literals = 0
+                self.nodes = 0
+            def visit_IntegerLiteral(self, node):
+                self.literals += 1
+            def generic_visit(self, node):
+                self.nodes += 1
+                NodeVisitor.generic_visit(self, node)
+
+        class SubCounter(Counter):
+            def visit_IntegerLiteral(self, node):
+                self.literals += 10
+
+        ast = parse("print 1 + 2 * x;\nvar y int = 3;")
+        counter = Counter()
+        counter.visit(ast)
+        self.assertEqual((3, 8), (counter.literals, counter.nodes))
+        self.assertIs(Counter._dispatch[IntegerLiteral], Counter.visit_IntegerLiteral)
+        self.assertIs(Counter._dispatch[BinOp], Counter.generic_visit)
+        self.assertNotIn(BinOp, NodeVisitor._dispatch)
+
+        counter = SubCounter()
+        counter.visit(ast)
+        self.assertEqual((30, 8), (counter.literals, counter.nodes))
+
+    def test_generic_visit(self):
+        class Literals(NodeVisitor):
+            def __init__(self):
+                self.values = []
+            def visit_IntegerLiteral(self, node):
+                self.values.append(node.value)
+
+        class Super(Literals):
+            def generic_visit(self, node):
+                super().generic_visit(node)
+
+        class Generator(Literals):
+            def generic_visit(self, node):
+                yield from NodeVisitor.generic_children(self, node)
+
+        ast = parse("print 1 + 2 * x;\nvar y int = 3;")
+        for visitor in (Literals(), Super(), Generator()):
+            with self.subTest(visitor=visitor.__class__.__name__):
+                visitor.visit(ast)
+                self.assertEqual([1, 2, 3], visitor.values)
+        visitor = Literals()
+        visitor.generic_visit(ast[0])
+        self.assertEqual([1, 2], visitor.values)
+        self.assertIs(Literals._dispatch[BinOp], Literals.generic_children)
+
+    def test_new_node_class(self):
+        class Pair(Expression):
+            left  : Expression
+            right : Expression
+
+        class Visitor(NodeVisitor):
+            def __init__(self):
+                self.visited = []
+            def visit_IntegerLiteral(self, node):
+                self.visited.append(node.value)
+
+        visitor = Visitor()
+        visitor.visit([Pair(IntegerLiteral(1), IntegerLiteral(2)), None, 'x'])
+        self.assertEqual([1, 2], visitor.visited)
+        del AST._nodes['Pair']
+
+    def test_pre_and_post_order(self):
+        class Tracer(NodeVisitor):
+            def __init__(self):
+                self.events = []
+            def visit_BinOp(self, node):
+                self.events.append(('enter', node.op))
+                yield node.left
+                self.events.append(('between', node.op))
+                yield node.right
+                self.events.append(('leave', node.op))
+            def visit_IntegerLiteral(self, node):
+                self.events.append(('literal', node.value))
+
+        tracer = Tracer()
+        tracer.visit(parse("print 1 - 2 * 3;"))
+        self.assertEqual([('enter', '-'), ('literal', 1), ('between', '-'),
+                          ('enter', '*'), ('literal', 2), ('between', '*'),
+                          ('literal', 3), ('leave', '*'), ('leave', '-')],
+                         tracer.events)
+
+    def test_deep_tree(self):
+        depth = 100000
+        with unchecked():
+            expr = ReadLocation(SimpleLocation('x', lineno=2), lineno=2)
+            for n in range(depth):
+                expr = BinOp('+', expr, IntegerLiteral(n, lineno=2), lineno=2)
+            ast = [VarDeclaration(SimpleLocation('x', lineno=1), SimpleType('int', lineno=1),
+                                  None, lineno=1),
+                   PrintStatement(UnaryOp('-', expr, lineno=2), lineno=2)]
+        self.assertEqual(3 + 3 + 2 * depth + 1, len(flatten(ast)))
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            check_program(ast)
+        self.assertEqual('', stderr.getvalue())
+        self.assertEqual('int', expr.type)
+        gen = GenerateCode()
+        gen.visit(ast)
+        self.assertEqual(('PRINTI', register_name(ast[1].value.register)), gen.code.body[-1])
+        # VARI, LOADI, a MOVI and an ADDI per level, MOVI and SUBI, PRINTI
+        self.assertEqual(2 + 2 * depth + 3, len(gen.code.body))
@@ -0,0 +1,107 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.cfg import CFG
+from gone.ircode import Function, Op, compile_ircode
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source)
+
+def labels(blocks):
+    return [block.label for block in blocks]
+
+class TestCFG(TestCase):
+    def test_blocks(self):
+        init, = compile("var x int = 1;\n"
+                        "if x < 2 { print 1; } else { print 2; }\n"
+                        "print 3;\n")
+        cfg = init.cfg()
+        self.assertIs(cfg, init.cfg())
+        self.assertEqual(['entry', 'B1', 'B2', 'B3'], labels(cfg.blocks))
+        entry, then, other, exit = cfg.blocks
+        self.assertEqual(Op.CBRANCH, entry.terminator[0])
+        self.assertEqual([then, other], entry.succs)
+        self.assertEqual([then, other], exit.preds)
+        self.assertEqual([], exit.succs)
+        self.assertIsNone(exit.terminator)
+        self.assertEqual([(Op.MOVI, (1, 5)), (Op.PRINTI, (5,)), (Op.BRANCH, ('B3',))],
+                         then.instructions)
+        self.assertEqual({entry: None, then: entry, other: entry, exit: entry}, cfg.idom)
+        self.assertEqual([then, other, exit], cfg.children[entry])
+        self.assertTrue(cfg.dominates(entry, exit))
+        self.assertFalse(cfg.dominates(then, exit))
+        self.assertEqual([], cfg.loops)
+
+    def test_loops(self):
+        with open(os.path.join(_tests, 'nestedwhile.g')) as f:
+            init, = compile(f.read())
+        cfg = init.cfg()
+        inner, outer = cfg.loops
+        self.assertEqual(('B4', ['B4', 'B5']), (inner.header.label, labels(inner.blocks)))
+        self.assertEqual(('B1', ['B1', 'B2', 'B4', 'B5', 'B6']),
+                         (outer.header.label, labels(outer.blocks)))
+        self.assertEqual(['B6'], labels(outer.latches))
+        self.assertEqual(['B6'], labels(inner.exits))
+        self.assertEqual(['B3'], labels(outer.exits))
+        self.assertIn(cfg.labels['B5'], inner)
+        self.assertNotIn(cfg.labels['B2'], inner)
+
+    def test_frontiers(self):
+        with open(os.path.join(_tests, 'nestedwhile.g')) as f:
+            init, = compile(f.read())
+        cfg = init.cfg()
+        frontiers = {block.label: sorted(labels(frontier)) for block, frontier in cfg.frontiers.items()}
+        self.assertEqual({'entry': [], 'B1': ['B1'], 'B2': ['B1'], 'B3': [],
+                          'B4': ['B1', 'B4'], 'B5': ['B4'], 'B6': ['B1']}, frontiers)
+
+    def test_unreachable(self):
+        init, = compile("var x int = 0;\n"
+                        "while x < 10 { x = x + 1; break; }\n")
+        cfg = init.cfg()
+        self.assertEqual(['entry', 'B1', 'B2', None, 'B3'], labels(cfg.blocks))
+        dead = cfg.blocks[3]
+        self.assertEqual(([], [cfg.labels['B1']]), (dead.preds, dead.succs))
+        self.assertNotIn(dead, cfg.idom)
+        self.assertNotIn(dead, cfg.reverse_postorder())
+        # The back edge is only there in dead code
+        self.assertEqual([], cfg.loops)
+
+    def test_round_trip(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with open(filename) as f:
+                functions = compile(f.read())
+            for function in functions:
+                with self.subTest(filename=os.path.basename(filename), function=function.name):
+                    copy = CFG(function).function()
+                    self.assertEqual(function.body, copy.body)
+                    self.assertEqual((function.name, function.frame_size),
+                                     (copy.name, copy.frame_size))
+
+    def test_update(self):
+        function = Function('f')
+        for inst in [('MOVI', 1, 'R1'),
+                     ('LABEL', 'B1'),
+                     ('CBRANCH', 'R1', 'B2', 'B3'),
+                     ('LABEL', 'B2'),
+                     ('BRANCH', 'B1'),
+                     ('LABEL', 'B3'),
+                     ('RET', 'R1')]:
+            function.append(inst)
+        cfg = function.cfg()
+        entry, head, body, exit = cfg.blocks
+        self.assertEqual([head], entry.succs)
+        self.assertEqual([entry, body], head.preds)
+        self.assertEqual([head], [loop.header for loop in cfg.loops])
+        # Make the loop branch straight to the exit
+        body.instructions[-1] = (Op.BRANCH, ('B3',))
+        cfg.update()
+        self.assertEqual([], cfg.loops)
+        self.assertEqual([head, body], exit.preds)
+        self.assertIs(head, cfg.idom[exit])
+        function.emit(Op.PRINTI, 1)
+        self.assertIsNot(cfg, function.cfg())
@@ -1,6 +1,8 @@
 from unittest import TestCase
 from unittest.mock import patch
-from gone.checker import CheckProgramVisitor
+from gone.ast import flatten
+from gone.checker import CheckProgramVisitor, check_program
+from gone.errors import collect_errors, errors_reported
 from gone.parser import parse
 
 class TestChecker(TestCase):
@@ -360,6 +362,116 @@ class TestChecker(TestCase):
         expected_output = [('2: TypeError: for-statement condition is not a boolean',)]
         self.assertEqual(expected_output, self.captured_output)
 
+    def test_slots(self):
+        from gone.checker import Slot, GLOBAL, LOCAL
+        source = ("var x int;\n"
+                  "const y = 2;\n"
+                  "func foo(a int, b int) int {\n"
+                  "    var x int = a;\n"
+                  "    if a > b { var x int = b; x = 1; }\n"
+                  "    return x + y;\n"
+                  "}\n"
+                  "while x < 3 { var z int = x; x = z + 1; }\n")
+        ast = parse(source)
+        self.checker.visit(ast)
+        self.assertEqual([], self.captured_output)
+        x, y, foo, loop = ast
+        self.assertEqual(Slot(GLOBAL, 0, 'x'), x.slot)
+        self.assertEqual(Slot(GLOBAL, 1, 'y'), y.slot)
+        self.assertEqual([Slot(LOCAL, 0, 'a'), Slot(LOCAL, 1, 'b')],
+                         [arg.slot for arg in foo.arguments])
+        local_x, if_statement, ret = foo.body
+        self.assertEqual(Slot(LOCAL, 2, 'x'), local_x.slot)
+        self.assertEqual(Slot(LOCAL, 3, 'x'), if_statement.then_block[0].slot)
+        self.assertEqual(Slot(LOCAL, 3, 'x'), if_statement.then_block[1].name.slot)
+        self.assertEqual(Slot(LOCAL, 2, 'x'), ret.value.left.location.slot)
+        self.assertEqual(Slot(GLOBAL, 1, 'y'), ret.value.right.location.slot)
+        # Blocks outside of functions have slots in the frame of __init
+        self.assertEqual(Slot(LOCAL, 0, 'z'), loop.loop_block[0].slot)
+        self.assertEqual(Slot(GLOBAL, 0, 'x'), loop.loop_block[1].name.slot)
+
+    def test_symbol_table(self):
+        from gone.checker import SymbolTable
+        class Node:
+            pass
+        outer, inner, other = Node(), Node(), Node()
+        symbols = SymbolTable()
+        symbols['x'] = outer
+        symbols.enter_scope()
+        self.assertFalse(symbols.declared_here('x'))
+        symbols['x'] = inner
+        symbols['y'] = other
+        self.assertTrue(symbols.declared_here('x'))
+        self.assertIs(inner, symbols['x'])
+        self.assertEqual({'x': inner, 'y': other}, symbols.leave_scope())
+        self.assertIs(outer, symbols['x'])
+        self.assertNotIn('y', symbols)
+        self.assertEqual(('global', 'local'), (outer.scope, inner.scope))
+
+    def test_deeply_nested_scopes(self):
+        depth = 2000
+        source = ("var x int = 0;\n"
+                  + "if x < 1 {\n var x int = 1;\n" * depth
+                  + "x = 2;\n" + "}\n" * depth
+                  + "x = 3;\n")
+        ast = parse(source)
+        self.checker.visit(ast)
+        self.assertEqual([], self.captured_output)
+        self.assertEqual(1, len(self.checker.symbols.log))
+        self.assertEqual(ast[0].slot, ast[-1].name.slot)
+
+    def test_parallel(self):
+        source = ("var x int = 1;\n"
+                  "func f(a int) int { var b float = a; return a + x; }\n"
+                  "print y;\n"
+                  "func g() float { return f(2) + 1.0; }\n"
+                  "const c = 'c';\n"
+                  "func h(a char) char { if a == c { return a; } return z; }\n"
+                  "print h(c);\n")
+        def annotations(ast):
+            return [(repr(node), getattr(node, 'type', None), getattr(node, 'slot', None),
+                     sorted(getattr(node, 'symbols', {})))
+                    for _, node in flatten(ast)]
+
+        sequential = parse(source)
+        check_program(sequential)
+        expected = list(self.captured_output)
+        self.assertIn(('3: NameError: symbol "y" undefined.',), expected)
+        del self.captured_output[:]
+        parallel = parse(source)
+        check_program(parallel, processes=2)
+        self.assertEqual(expected, self.captured_output)
+        self.assertEqual(annotations(sequential), annotations(parallel))
+        func = parallel[1]
+        self.assertIs(func.arguments[0], func.symbols['a'])
+        self.assertIs(func.body[0], func.symbols['b'])
+
+    def test_annotations_order(self):
+        from gone import checker
+        from gone.ast import FuncDeclaration
+
+        # The symbols of a function go back on symbols, wherever it is
+        # among the attributes
+        ast = parse("func f(a int) int { var b int = a; return b; }\n")
+        check_program(ast)
+        names = checker._attributes_of(FuncDeclaration)
+        with patch.dict(checker._attribute_names, {FuncDeclaration: ('symbols', *names[:-1])}):
+            copy = parse("func f(a int) int { var b int = a; return b; }\n")
+            checker._annotate(copy, checker._annotations(ast))
+        func = copy[0]
+        self.assertEqual(ast[0].type, func.type)
+        self.assertIs(func.arguments[0], func.symbols['a'])
+        self.assertIs(func.body[0], func.symbols['b'])
+
+    def test_collect_errors(self):
+        before = errors_reported()
+        with collect_errors() as errors:
+            self.check_program("print y;\nx = 1;")
+        self.assertEqual([(1, 'NameError: symbol "y" undefined.', None),
+                          (2, 'NameError: symbol "x" undefined.', None)], errors)
+        self.assertEqual([], self.captured_output)
+        self.assertEqual(before, errors_reported())
+
     def mock_print(self, *args, **kwargs):
         self.captured_output.append(args)
 
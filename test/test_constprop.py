@@ -0,0 +1,134 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.constprop import propagate_constants
+from gone.interp import Interpreter
+from gone.ircode import compile_ircode
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=False):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+class TestConstProp(TestCase):
+    def test_fold(self):
+        init, = functions = compile('print (3 + 4*5 - 6) / 7;\nprint 1.5 * 2.0 < 4.0;')
+        self.assertEqual(12, propagate_constants(functions))
+        self.assertEqual([('MOVI', 2, 'R9'), ('PRINTI', 'R9'),
+                          ('MOVI', 1, 'R14'), ('PRINTI', 'R14')], init.body)
+
+    def test_integer_division(self):
+        # -7 / 2 would be -(7 / 2)
+        for expr, folded in [('7 / 2', True), ('(0 - 7) / (0 - 2)', True), ('(0 - 8) / 2', True),
+                             ('(0 - 7) / 2', False), ('7 / (0 - 2)', False), ('7 / 0', False)]:
+            with self.subTest(expr=expr):
+                init, = functions = compile(f'print {expr};')
+                propagate_constants(functions)
+                self.assertEqual(not folded, 'DIVI' in ops(init))
+
+    def test_not_folded(self):
+        for expr in ('2147483647 + 1', '-2147483647 - 2', '65536 * 65536',
+                     '1.0 / 0.0', '1.0e308 * 10.0'):
+            with self.subTest(expr=expr):
+                init, = functions = compile(f'print {expr};')
+                propagate_constants(functions)
+                self.assertEqual(2, len(ops(init)) - ops(init).count('MOVI') - ops(init).count('MOVF'))
+
+    def test_globals(self):
+        source = ('const k = 10;\n'
+                  'var v int = 2;\n'
+                  'var w int = 3;\n'
+                  'func f(x int) int { w = x; return k * v + w; }\n'
+                  'func main() int { print f(k); return 0; }\n')
+        for slots in (False, True):
+            with self.subTest(slots=slots):
+                functions = compile(source, slots)
+                expected = run(functions)
+                propagate_constants(functions)
+                init, f, main = functions
+                # k and v are constants, w is not
+                self.assertEqual(['LOADI', 'STOREI', 'MOVI', 'LOADI', 'ADDI', 'RET'], ops(f))
+                self.assertEqual(('MOVI', 20, 'R7'), f.body[2])
+                self.assertEqual(('MOVI', 10, 'R10'), main.body[0])
+                self.assertEqual(expected, run(functions))
+
+    def test_assigned_later(self):
+        from gone.optimize import optimize
+
+        # h is stored once, but after a call of f() that loads it
+        source = ('var h int;\n'
+                  'func f(n int) int { if n > 0 { return f(n-1)+h; } return h; }\n'
+                  'print f(0);\n'
+                  'h = 5;\n'
+                  'print f(0);\n')
+        for slots in (False, True):
+            with self.subTest(slots=slots):
+                functions = compile(source, slots)
+                self.assertEqual('0\n5\n', run(functions))
+                propagate_constants(functions)
+                self.assertEqual('0\n5\n', run(functions))
+                optimize(functions)
+                self.assertEqual('0\n5\n', run(functions))
+
+    def test_store_forwarding(self):
+        source = ('func f() int {\n'
+                  '    var a int = 4;\n'
+                  '    var b int = a * 2;\n'
+                  '    print b;\n'
+                  '    return a + b;\n'
+                  '}\n')
+        init, f = functions = compile(source, slots=True)
+        propagate_constants(functions)
+        self.assertEqual(['MOVI', 'ALLOCI', 'STOREI', 'MOVI', 'ALLOCI', 'STOREI',
+                          'MOVI', 'PRINTI', 'MOVI', 'RET'],
+                         ops(f))
+        self.assertEqual(12, f.body[-2][1])
+
+    def test_branches(self):
+        source = ('const debug = false;\n'
+                  'var x int = 1;\n'
+                  'if debug { print 1; } else { print 2; }\n'
+                  'while 1 > 2 { x = x + 1; }\n'
+                  'print x;\n')
+        init, = functions = compile(source)
+        expected = run(functions)
+        propagate_constants(functions)
+        self.assertNotIn('CBRANCH', ops(init))
+        self.assertNotIn('ADDI', ops(init))
+        self.assertEqual(expected, run(functions))
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            for slots in (False, True):
+                functions = compile(source, slots)
+                if not functions:
+                    continue
+                with self.subTest(filename=os.path.basename(filename), slots=slots):
+                    expected = run(functions)
+                    self.assertGreaterEqual(propagate_constants(functions), 0)
+                    self.assertEqual(expected, run(functions))
+
+    def test_optimize(self):
+        from gone.optimize import PASSES, optimize
+        functions = compile('print 2 * 3;')
+        stats = optimize(functions)
+        self.assertEqual([name for name, run in PASSES], list(stats))
+        self.assertEqual(2, stats['constprop'])
+        with contextlib.redirect_stderr(io.StringIO()):
+            optimized = compile_ircode('print 2 * 3;', optimize=True)
+        self.assertEqual([('MOVI', 6, 'R3'), ('PRINTI', 'R3')], optimized[0].body)
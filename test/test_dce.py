@@ -0,0 +1,86 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.dce import eliminate_dead_code
+from gone.interp import Interpreter
+from gone.ircode import Function, compile_ircode
+from gone.optimize import optimize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=False):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+class TestDCE(TestCase):
+    def test_unused(self):
+        function = Function('f', 'int')
+        function.body = [('MOVI', 1, 'R1'), ('MOVI', 2, 'R2'), ('ADDI', 'R1', 'R2', 'R3'),
+                         ('MOVI', 0, 'R4'), ('DIVI', 'R1', 'R4', 'R5'),
+                         ('MOVI', 3, 'R6'), ('DIVI', 'R1', 'R6', 'R7'),
+                         ('CALL', 'g', 'R1', 'R8'), ('RET', 'R2')]
+        self.assertEqual(3, eliminate_dead_code([function]))
+        # The division by zero and the call stay
+        self.assertEqual([('MOVI', 1, 'R1'), ('MOVI', 2, 'R2'), ('MOVI', 0, 'R4'),
+                          ('DIVI', 'R1', 'R4', 'R5'), ('CALL', 'g', 'R1', 'R8'), ('RET', 'R2')],
+                         function.body)
+
+    def test_branches(self):
+        init, = functions = compile('var x int = 1;\n'
+                                    'if x > 0 { print 1; } else { print 2; }\n'
+                                    'while x < 3 { x = x + 1; break; print 3; }\n'
+                                    'print x;\n')
+        expected = run(functions)
+        eliminate_dead_code(functions)
+        self.assertEqual(expected, run(functions))
+        # The else-part falls through, the loop no longer goes back, and
+        # print 3 is gone
+        self.assertEqual(['MOVI', 'VARI', 'STOREI', 'LOADI', 'MOVI', 'CMPI', 'CBRANCH',
+                          'LABEL', 'MOVI', 'PRINTI', 'BRANCH',
+                          'LABEL', 'MOVI', 'PRINTI',
+                          'LABEL', 'LOADI', 'MOVI', 'CMPI', 'CBRANCH',
+                          'LABEL', 'LOADI', 'MOVI', 'ADDI', 'STOREI',
+                          'LABEL', 'LOADI', 'PRINTI'], ops(init))
+        self.assertEqual(1, ops(init).count('BRANCH'))
+
+    def test_phis(self):
+        functions = compile('func f(a int) int {\n'
+                            '    var x int = 1;\n'
+                            '    if a > 2 { x = 3; }\n'
+                            '    return x;\n'
+                            '}\n'
+                            'print f(1);\nprint f(5);\n', slots=True)
+        stats = optimize(functions, ['mem2reg', 'dce'])
+        self.assertGreater(stats['dce'], 0)
+        init, f = functions
+        self.assertEqual('1\n3\n', run(functions))
+        phi, = [inst for inst in f.body if inst[0] == 'PHII']
+        self.assertEqual(['B1', 'entry'], sorted(phi[1:-1:2]))
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            for slots in (False, True):
+                functions = compile(source, slots)
+                if not functions:
+                    continue
+                with self.subTest(filename=os.path.basename(filename), slots=slots):
+                    expected = run(functions)
+                    self.assertGreaterEqual(eliminate_dead_code(functions), 0)
+                    self.assertEqual(expected, run(functions))
+                    if slots:
+                        optimize(functions)
+                        self.assertEqual(expected, run(functions))
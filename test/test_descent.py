@@ -0,0 +1,74 @@
+import glob
+import os.path
+from unittest import TestCase
+from unittest.mock import patch
+from gone.parser import parse
+from gone.ast import flatten
+from gone.bench import kernel
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+class TestDescentParser(TestCase):
+    def setUp(self):
+        self.captured_output = []
+        self.patcher = patch('builtins.print', self.mock_print)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def result(self, source, parser):
+        del self.captured_output[:]
+        ast = parse(source, lexer='scanner', parser=parser)
+        if ast is not None:
+            ast = [(depth, repr(node), getattr(node, 'lineno', None))
+                   for depth, node in flatten(ast)]
+        return ast, list(self.captured_output)
+
+    def assertSameResult(self, source):
+        self.assertEqual(self.result(source, 'sly'), self.result(source, 'descent'))
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with self.subTest(filename=os.path.basename(filename)):
+                with open(filename) as f:
+                    self.assertSameResult(f.read())
+
+    def test_expressions(self):
+        for expr in ('a + b * c - d / e',
+                     '-a * b + -c',
+                     'a * -b + c',
+                     '!a && b || !(c < d) && e != f',
+                     '+a - -b',
+                     '(a + (b\n * c)) \n- (d)',
+                     'f(, a, g(b + 1), h())',
+                     'a <= b == c',
+                     'a < b < c',
+                     '1.5e3 + \'x\' + true - false'):
+            with self.subTest(expr=expr):
+                self.assertSameResult(f'print {expr};')
+
+    def test_statements(self):
+        for source in ('',
+                       'x += 1; y -= 2; z *= 3; w /= 4; i++; j--;',
+                       'func f(, a int, b float) int { return; }',
+                       'for (var i int = 0; i < 10; i = i + 1;) { break; }',
+                       'for i = 0; i < 10; i++; { continue; }',
+                       'if a { } else { if b { print 1; } }\nwhile x { }'):
+            with self.subTest(source=source):
+                self.assertSameResult(source)
+
+    def test_syntax_errors(self):
+        for source in ('print 1 +;',
+                       'x = 1 var y int = 2; print y;',
+                       'x = 1 2 3 4; print 5; print 6 6;',
+                       '} print 1;',
+                       'print (1;',
+                       'print 1; if x {',
+                       'print 0o17 1;'):
+            with self.subTest(source=source):
+                self.assertSameResult(source)
+
+    def test_kernel(self):
+        self.assertSameResult(kernel(20))
+
+    def mock_print(self, *args, **kwargs):
+        self.captured_output.append(args)
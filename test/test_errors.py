@@ -0,0 +1,68 @@
+import io
+import contextlib
+import concurrent.futures
+from unittest import TestCase
+from gone.errors import *
+from gone.ircode import compile_ircode
+
+class TestDiagnostics(TestCase):
+    def test_default(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            before = errors_reported()
+            error(3, 'Some error')
+            error(4, 'Another error', filename='foo.g')
+            self.assertEqual(before + 2, errors_reported())
+        self.assertEqual('3: Some error\nfoo.g:4: Another error\n', stderr.getvalue())
+
+    def test_context(self):
+        before = errors_reported()
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            with Diagnostics() as outer:
+                error(1, 'outer')
+                with Diagnostics() as inner:
+                    error(2, 'inner')
+                    self.assertIs(inner, current_diagnostics())
+                    self.assertEqual(1, errors_reported())
+                error(3, 'outer again', 'foo.g')
+                self.assertEqual(2, errors_reported())
+        self.assertEqual('', stderr.getvalue())
+        self.assertEqual(before, errors_reported())
+        self.assertEqual([(1, 'outer', None), (3, 'outer again', 'foo.g')], outer.diagnostics)
+        self.assertEqual('foo.g:3: outer again', str(outer.diagnostics[1]))
+        self.assertEqual([Diagnostic(2, 'inner', None)], inner.diagnostics)
+        inner.clear_errors()
+        self.assertEqual(0, inner.errors_reported())
+
+    def test_echo(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            with Diagnostics(echo=True) as diagnostics:
+                error(1, 'printed')
+        self.assertEqual('1: printed\n', stderr.getvalue())
+        self.assertEqual(1, diagnostics.errors_reported())
+
+    def test_compile_in_threads(self):
+        good = 'var x int = 1;\nprint x + 2;\n'
+        bad = 'var x int = 1;\nprint x + 2.0;\nprint y;\n'
+        def compile(source):
+            with Diagnostics() as diagnostics:
+                functions = compile_ircode(source)
+            return functions, diagnostics.diagnostics
+
+        sources = [good, bad] * 20
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(compile, sources))
+        expected = {good: compile(good), bad: compile(bad)}
+        self.assertTrue(expected[good][0])
+        self.assertEqual([], expected[bad][0])
+        self.assertEqual([2, 3], [lineno for lineno, _, _ in expected[bad][1]])
+        for source, (functions, diagnostics) in zip(sources, results):
+            self.assertEqual([function.body for function in expected[source][0]],
+                             [function.body for function in functions])
+            self.assertEqual(expected[source][1], diagnostics)
+
+    def test_compile_reports_to_current(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            before = errors_reported()
+            self.assertEqual([], compile_ircode('print y;'))
+            self.assertEqual(before + 1, errors_reported())
+        self.assertEqual('1: NameError: symbol "y" undefined.\n', stderr.getvalue())
@@ -0,0 +1,121 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.gvn import number_values
+from gone.interp import Interpreter
+from gone.ircode import Function, compile_ircode
+from gone.optimize import optimize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=False):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+class TestGVN(TestCase):
+    def test_expressions(self):
+        function = Function('f', 'int')
+        function.body = [('MOVI', 2, 'R1'), ('MOVI', 3, 'R2'),
+                         ('ADDI', 'R1', 'R2', 'R3'), ('ADDI', 'R2', 'R1', 'R4'),
+                         ('SUBI', 'R1', 'R2', 'R5'), ('SUBI', 'R2', 'R1', 'R6'),
+                         ('CMPI', '<', 'R1', 'R2', 'R7'), ('CMPI', '>', 'R2', 'R1', 'R8'),
+                         ('MOVI', 2, 'R9'), ('MOVF', 2.0, 'R10'), ('MOVF', -0.0, 'R11'),
+                         ('MOVF', 0.0, 'R12'), ('MULI', 'R4', 'R9', 'R13'),
+                         ('CALL', 'g', 'R3', 'R5', 'R6', 'R7', 'R8', 'R10', 'R11', 'R12', 'R13', 'R14'),
+                         ('RET', 'R14')]
+        self.assertEqual(3, number_values([function]))
+        self.assertEqual([('MOVI', 2, 'R1'), ('MOVI', 3, 'R2'),
+                          ('ADDI', 'R1', 'R2', 'R3'),
+                          ('SUBI', 'R1', 'R2', 'R5'), ('SUBI', 'R2', 'R1', 'R6'),
+                          ('CMPI', '<', 'R1', 'R2', 'R7'),
+                          ('MOVF', 2.0, 'R10'), ('MOVF', -0.0, 'R11'),
+                          ('MOVF', 0.0, 'R12'), ('MULI', 'R3', 'R1', 'R13'),
+                          ('CALL', 'g', 'R3', 'R5', 'R6', 'R7', 'R7', 'R10', 'R11', 'R12', 'R13', 'R14'),
+                          ('RET', 'R14')], function.body)
+
+    def test_loads(self):
+        source = ('var x int = 3;\n'
+                  'func f() int { x = x + 1; return x; }\n'
+                  'func main() int {\n'
+                  '    print x * x;\n'
+                  '    print x * f();\n'
+                  '    print x;\n'
+                  '    x = 2;\n'
+                  '    print x;\n'
+                  '    return 0;\n'
+                  '}\n')
+        init, f, main = functions = compile(source)
+        expected = run(functions)
+        number_values(functions)
+        self.assertEqual(expected, run(functions))
+        # One LOADI before the call, one after, and the store gives the
+        # last value
+        self.assertEqual(2, ops(main).count('LOADI'))
+        self.assertEqual([('LOADI', 'x', 'R6'), ('MULI', 'R6', 'R6', 'R8')], main.body[:2])
+        self.assertEqual(('PRINTI', 'R13'), main.body[10])
+
+    def test_dominators(self):
+        source = ('func f(a int, b int) int {\n'
+                  '    var c int = a * b;\n'
+                  '    if a > b {\n'
+                  '        c = c + a * b + (a - b);\n'
+                  '    } else {\n'
+                  '        c = c - (a - b);\n'
+                  '    }\n'
+                  '    return c + (a - b);\n'
+                  '}\n'
+                  'func main() int { print f(3, 2); print f(2, 3); return 0; }\n')
+        init, f, main = functions = compile(source, slots=True)
+        expected = run(functions)
+        optimize(functions, ['mem2reg'])
+        number_values(functions)
+        self.assertEqual(expected, run(functions))
+        # a * b in the entry is reused in the then-part, but a - b is not
+        # shared by the then- and else-parts and the exit (the fourth SUBI
+        # is c - (a - b))
+        self.assertEqual(1, ops(f).count('MULI'))
+        self.assertEqual(4, ops(f).count('SUBI'))
+
+    def test_phis(self):
+        function = Function('f', 'int')
+        function.body = [('MOVI', 1, 'R1'), ('MOVI', 2, 'R2'),
+                         ('CBRANCH', 'R1', 'B1', 'B2'),
+                         ('LABEL', 'B1'), ('BRANCH', 'B2'),
+                         ('LABEL', 'B2'),
+                         ('PHII', 'entry', 'R1', 'B1', 'R2', 'R3'),
+                         ('PHII', 'entry', 'R1', 'B1', 'R2', 'R4'),
+                         ('PHII', 'entry', 'R2', 'B1', 'R2', 'R5'),
+                         ('ADDI', 'R3', 'R4', 'R6'), ('ADDI', 'R6', 'R5', 'R7'),
+                         ('RET', 'R7')]
+        self.assertEqual(2, number_values([function]))
+        self.assertEqual([('PHII', 'entry', 'R1', 'B1', 'R2', 'R3'),
+                          ('ADDI', 'R3', 'R3', 'R6'), ('ADDI', 'R6', 'R2', 'R7')],
+                         function.body[6:9])
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            for slots in (False, True):
+                functions = compile(source, slots)
+                if not functions:
+                    continue
+                with self.subTest(filename=os.path.basename(filename), slots=slots):
+                    expected = run(functions)
+                    self.assertGreaterEqual(number_values(functions), 0)
+                    self.assertEqual(expected, run(functions))
+                    if slots:
+                        optimize(functions)
+                        self.assertEqual(expected, run(functions))
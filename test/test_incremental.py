@@ -0,0 +1,78 @@
+import glob
+import os.path
+from unittest import TestCase
+from unittest.mock import patch
+from gone.incremental import IncrementalParser
+from gone.parser import parse
+from gone.ast import flatten
+from gone.bench import synthesize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+class TestIncremental(TestCase):
+    def setUp(self):
+        self.patcher = patch('builtins.print')
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def nodes(self, ast):
+        return [(depth, repr(node), getattr(node, 'lineno', None))
+                for depth, node in flatten(ast)]
+
+    def assertSameAST(self, parser):
+        self.assertEqual(self.nodes(parse(parser.source)), self.nodes(parser.ast))
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with self.subTest(filename=os.path.basename(filename)):
+                with open(filename) as f:
+                    self.assertSameAST(IncrementalParser(f.read()))
+
+    def test_edits(self):
+        with open(os.path.join(_tests, 'mandel.g')) as f:
+            source = f.read() + synthesize(100)
+        parser = IncrementalParser(source)
+
+        def at(text, offset=0):
+            return parser.source.index(text) + offset
+
+        # Each step is a list of (start, end, text) edits that leaves a
+        # valid program.  Edits are worked out against the source as it
+        # is when they are made.
+        steps = [
+            ('change a literal', [lambda: (at('2.5'), at('2.5', 3), '3.5')]),
+            ('add lines', [lambda: (at('func f0'), at('func f0'), '\n\n')]),
+            ('add a statement at the start', [lambda: (0, 0, 'var z int = 1;\n')]),
+            ('add a statement at the end',
+             [lambda: (len(parser.source), len(parser.source), 'print z;')]),
+            ('insert a function',
+             [lambda: (at('func f0'), at('func f0'), 'func g(a int) int {\n    return a;\n}\n')]),
+            ('comment out and back in',
+             [lambda: (at('var y float'), at('var y float'), '/*'),
+              lambda: (at('/* loop'), at('/* loop'), '*/')]),
+            ('finish an unfinished statement',
+             [lambda: (at('print z;', 7), len(parser.source), ''),
+              lambda: (len(parser.source), len(parser.source), ';')]),
+            ('add an else to an if',
+             [lambda: (at('return a;\n}', 11), at('return a;\n}', 11), '\nif z > 0 { print z; }'),
+              lambda: (at('print z; }', 10), at('print z; }', 10), ' else { print 0; }')]),
+            ('delete a function', [lambda: (at('func g'), at('func f0'), '')]),
+        ]
+        for name, edits in steps:
+            with self.subTest(name=name):
+                for edit in edits:
+                    parser.edit(*edit())
+                self.assertSameAST(parser)
+
+    def test_undo(self):
+        with open(os.path.join(_tests, 'nestedwhile.g')) as f:
+            source = f.read()
+        expected = self.nodes(parse(source))
+        parser = IncrementalParser(source)
+        for start in range(0, len(source), 7):
+            for text in ('{', '}', '/*', "'", '\n', 'else', 'var'):
+                with self.subTest(start=start, text=text):
+                    parser.edit(start, start, text)
+                    parser.edit(start, start + len(text), '')
+                    self.assertEqual(source, parser.source)
+                    self.assertEqual(expected, self.nodes(parser.ast))
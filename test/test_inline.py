@@ -0,0 +1,125 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.inline import inline_calls
+from gone.interp import Interpreter
+from gone.ircode import compile_ircode
+from gone.optimize import optimize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=True):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+_calls = ('var g int = 0;\n'
+          'func sq(a int) int {\n'
+          '    var b int = a * a;\n'
+          '    if b > 10 { return b - 1; }\n'
+          '    return b;\n'
+          '}\n'
+          'func bump(n int) int { g = g + n; print n; return 0; }\n'
+          'func main() int {\n'
+          '    var i int = 0;\n'
+          '    while i < 5 {\n'
+          '        print sq(i) + sq(2);\n'
+          '        g = g + bump(i);\n'
+          '        i = i + 1;\n'
+          '    }\n'
+          '    return g;\n'
+          '}\n')
+
+class TestInline(TestCase):
+    def test_inline(self):
+        init, sq, bump, main = functions = compile(_calls)
+        expected = run(functions)
+        inlined = []
+        self.assertLess(inline_calls(functions, inlined=inlined), 0)
+        self.assertEqual([('main', 'sq'), ('main', 'sq'), ('main', 'bump')], inlined)
+        self.assertEqual(expected, run(functions))
+        self.assertNotIn('CALL', ops(main))
+        # i, then a and b for each sq() and n for bump()
+        self.assertEqual(6, main.frame_size)
+        # sq() returns in two places
+        self.assertEqual(2, ops(main).count('PHII'))
+
+        optimize(functions)
+        self.assertEqual(expected, run(functions))
+        self.assertNotIn('ALLOCI', ops(main))
+
+    def test_heuristics(self):
+        source = ('func add(a int, b int) int { return a + b; }\n'
+                  'func main() int {\n'
+                  '    var i int = 0;\n'
+                  '    while i < 3 { i = add(i, 1); }\n'
+                  '    return add(i, 2);\n'
+                  '}\n')
+        functions = compile(source)
+        self.assertEqual(0, inline_calls(functions, size=0, loop_size=0))
+        inlined = []
+        init, add, main = functions = compile(source)
+        inline_calls(functions, size=0, loop_size=10, inlined=inlined)
+        self.assertEqual([('main', 'add')], inlined)
+        self.assertEqual(1, ops(main).count('CALL'))
+        self.assertEqual('', run(functions))
+
+    def test_recursive(self):
+        source = ('func even(n int) bool { if n == 0 { return true; } return odd(n - 1); }\n'
+                  'func odd(n int) bool { if n == 0 { return false; } return even(n - 1); }\n'
+                  'func fact(n int) int { if n < 2 { return 1; } return n * fact(n - 1); }\n'
+                  'func main() int { print even(7); print fact(5); return 0; }\n')
+        functions = compile(source)
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, inline_calls(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_short_circuit(self):
+        # PHIs in the callee and in the block after the call
+        source = ('func between(a int, lo int, hi int) bool { return lo <= a && a < hi; }\n'
+                  'func main() int {\n'
+                  '    var i int = 0;\n'
+                  '    while i < 6 {\n'
+                  '        print i > 0 && between(i, 2, 5);\n'
+                  '        i = i + 1;\n'
+                  '    }\n'
+                  '    return 0;\n'
+                  '}\n')
+        init, between, main = functions = compile(source)
+        expected = run(functions)
+        inline_calls(functions)
+        self.assertNotIn('CALL', ops(main))
+        self.assertEqual(expected, run(functions))
+        optimize(functions)
+        self.assertEqual(expected, run(functions))
+
+    def test_names(self):
+        functions = compile(_calls, slots=False)
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, inline_calls(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            functions = compile(source)
+            if not functions:
+                continue
+            with self.subTest(filename=os.path.basename(filename)):
+                expected = run(functions)
+                inline_calls(functions)
+                self.assertEqual(expected, run(functions))
+                optimize(functions)
+                self.assertEqual(expected, run(functions))
@@ -0,0 +1,101 @@
+import io
+import contextlib
+import glob
+import os.path
+from unittest import TestCase
+from gone.errors import clear_errors, errors_reported
+from gone.interp import Interpreter
+from gone.ircode import compile_ircode
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def run(source, slots):
+    clear_errors()
+    with contextlib.redirect_stderr(io.StringIO()):
+        functions = compile_ircode(source, slots)
+    if errors_reported():
+        return None
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+class TestInterpreter(TestCase):
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            # Takes seconds to interpret (see bench_interp in gone/bench.py)
+            if os.path.basename(filename) == 'mandel.g':
+                continue
+            with open(filename) as f:
+                source = f.read()
+            with self.subTest(filename=os.path.basename(filename)):
+                try:
+                    output = run(source, slots=True)
+                except ValueError:
+                    continue
+                if output is not None:
+                    self.assertEqual(run(source, slots=False), output)
+
+    def test_program(self):
+        source = ("var n int = 1;\n"
+                  "var value int = 1;\n"
+                  "while n < 6 {\n"
+                  "    value = value * n;\n"
+                  "    n = n + 1;\n"
+                  "}\n"
+                  "print value;\n"
+                  "print 'x';\n"
+                  "print 7.0 / 2.0;\n")
+        self.assertEqual('120\nx3.5\n', run(source, slots=True))
+
+    def test_functions(self):
+        source = ("func fib(n int) int {\n"
+                  "    if n > 1 { return fib(n - 1) + fib(n - 2); }\n"
+                  "    return 1;\n"
+                  "}\n"
+                  "func main() int {\n"
+                  "    var i int = 0;\n"
+                  "    while i < 6 { print fib(i); i = i + 1; }\n"
+                  "    return 0;\n"
+                  "}\n")
+        self.assertEqual('1\n1\n2\n3\n5\n8\n', run(source, slots=True))
+        self.assertEqual('1\n1\n2\n3\n5\n8\n', run(source, slots=False))
+
+    def test_shadowing(self):
+        source = ("var x int = 1;\n"
+                  "if x == 1 { var x int = 2; print x; }\n"
+                  "print x;\n"
+                  "func f(a int) int {\n"
+                  "    var y int = a;\n"
+                  "    if a > 0 { var y int = 10; print y; }\n"
+                  "    return y;\n"
+                  "}\n"
+                  "func main() int { print f(3); return 0; }\n")
+        self.assertEqual('2\n1\n10\n3\n', run(source, slots=True))
+
+    def test_short_circuit(self):
+        source = ("var calls int = 0;\n"
+                  "func check(n int) bool { calls = calls + 1; return n > 0; }\n"
+                  "func main() int {\n"
+                  "    var a bool = false && check(1);\n"
+                  "    var b bool = true || check(1);\n"
+                  "    var c bool = true && check(1) || check(2);\n"
+                  "    if false && check(1) || !(true || check(2)) { print 1; }\n"
+                  "    print a; print b; print c; print calls;\n"
+                  "    return 0;\n"
+                  "}\n")
+        for slots in (False, True):
+            with self.subTest(slots=slots):
+                self.assertEqual('0\n1\n1\n1\n', run(source, slots))
+
+    def test_short_circuit_after_jump(self):
+        # Code after a return or break is in a block of its own
+        source = ("func f(a bool) int { return 1; var x int = 2; var b bool = a && a; return 0; }\n"
+                  "func g(a bool) int {\n"
+                  "    var i int = 0;\n"
+                  "    while i < 3 { i = i + 1; break; print i; var b bool = a || a; }\n"
+                  "    return i;\n"
+                  "}\n"
+                  "func main() int { print f(true); print g(false); return 0; }\n")
+        for slots in (False, True):
+            with self.subTest(slots=slots):
+                self.assertEqual('1\n1\n', run(source, slots))
@@ -0,0 +1,160 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.checker import Slot, LOCAL
+from gone.interp import Interpreter
+from gone.ipcp import specialize_calls
+from gone.ircode import compile_ircode
+from gone.optimize import optimize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=True):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+def calls(function):
+    return [inst[1:] for inst in function.body if inst[0] == 'CALL']
+
+_scale = ('const k = 4;\n'
+          'func scale(x float, s float, n int) float {\n'
+          '    var r float = 0.0;\n'
+          '    while n > 0 {\n'
+          '        r = r + x * s;\n'
+          '        n = n - 1;\n'
+          '    }\n'
+          '    return r;\n'
+          '}\n'
+          'func unused(a int) int { return a + 1; }\n'
+          'func main() int {\n'
+          '    var y float = 0.0;\n'
+          '    while y < 3.0 {\n'
+          '        print scale(y, 2.0, k);\n'
+          '        print scale(1.5, 2.0, k);\n'
+          '        print scale(y, 2.0, k);\n'
+          '        print scale(1.5, -0.0, k);\n'
+          '        y = y + 1.0;\n'
+          '    }\n'
+          '    return 0;\n'
+          '}\n')
+
+class TestIPCP(TestCase):
+    def test_specialize(self):
+        functions = compile(_scale)
+        expected = run(functions)
+        optimize(functions, ['mem2reg', 'constprop'])
+        specialize_calls(functions)
+        self.assertEqual(expected, run(functions))
+        init, unused, main, *clones = functions
+        # scale() can no longer be called, and unused() never was
+        self.assertEqual(['__init', 'unused', 'main', 'scale.1', 'scale.2', 'scale.3'],
+                         [function.name for function in functions])
+        # The calls with the same constants share a clone, and -0.0 isn't 0.0
+        self.assertEqual(['scale.1', 'scale.2', 'scale.1', 'scale.3'],
+                         [call[0] for call in calls(main)])
+        self.assertEqual([1, 0, 1, 0], [len(call) - 2 for call in calls(main)])
+        self.assertEqual([['x'], [], []], [function.param_names for function in clones])
+        # Only x is loaded, and x * 2.0 is folded in scale.2
+        self.assertEqual([1, 0, 0], [ops(function).count('LOADF') for function in clones])
+        self.assertIn(('MOVF', 3.0), [inst[:2] for inst in clones[1].body])
+
+        optimize(functions)
+        self.assertEqual(expected, run(functions))
+
+    def test_stored(self):
+        source = ('func down(n int, step int) int {\n'
+                  '    while n > step { n = n - step; }\n'
+                  '    return n;\n'
+                  '}\n'
+                  'func main() int { print down(100, 7); return 0; }\n')
+        init, down, main = functions = compile(source)
+        expected = run(functions)
+        specialize_calls(functions)
+        self.assertEqual(expected, run(functions))
+        init, main, clone = functions
+        # n is stored by down(), so it is set on entry
+        n = Slot(LOCAL, 0, 'n')
+        self.assertEqual([('ALLOCI', n), ('MOVI', 100, 'R12'), ('STOREI', 'R12', n)], clone.body[:3])
+        self.assertEqual([], clone.param_names)
+        self.assertEqual(('MOVI', 7), [inst[:2] for inst in clone.body if inst[0] == 'MOVI'][1])
+
+    def test_budget(self):
+        functions = compile(_scale.replace('func unused(a int) int { return a + 1; }\n', ''))
+        optimize(functions, ['mem2reg', 'constprop'])
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, specialize_calls(functions, budget=0))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_recursive(self):
+        source = ('func fib(n int) int { if n < 2 { return n; } return fib(n - 1) + fib(n - 2); }\n'
+                  'func power(x int, n int) int { if n == 0 { return 1; } return x * power(x, n - 1); }\n'
+                  'func main() int { print fib(12); print power(3, 5); return 0; }\n')
+        init, fib, power, main = functions = compile(source)
+        expected = run(functions)
+        specialize_calls(functions)
+        self.assertEqual(expected, run(functions))
+        # fib.1 calls fib() with n - 1, and power.1 a clone for x = 3
+        # that calls itself
+        names = {function.name: function for function in functions}
+        self.assertEqual(['fib', 'fib'], [call[0] for call in calls(names['fib.1'])])
+        self.assertEqual(['power.3'], [call[0] for call in calls(names['power.2'])])
+        self.assertEqual(['power.3'], [call[0] for call in calls(names['power.3'])])
+        self.assertEqual(['n'], names['power.3'].param_names)
+        optimize(functions)
+        self.assertEqual(expected, run(functions))
+
+    def test_uncalled(self):
+        # Only the functions left uncalled by the pass are dropped
+        source = ('func count(n int) int { if n == 0 { return 0; } return count(n - 1) + 1; }\n'
+                  'func sq(n int) int { return n * n; }\n'
+                  'func twice(n int) int { return sq(2) + sq(2); }\n')
+        functions = compile(source)
+        specialize_calls(functions)
+        self.assertEqual(['__init', 'count', 'twice', 'sq.1'], [function.name for function in functions])
+
+    def test_names(self):
+        functions = compile(_scale, slots=False)
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, specialize_calls(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_llvm(self):
+        try:
+            from gone.llvmgen import compile_llvm
+        except ImportError:
+            self.skipTest('llvmlite is not installed')
+        source = ('func power(x int, n int) int { if n == 0 { return 1; } return x * power(x, n - 1); }\n'
+                  'func main() int { print power(3, 5); return 0; }\n')
+        with contextlib.redirect_stderr(io.StringIO()):
+            llvm_code = compile_llvm(source, optimize=True)
+        # main() calls the clone, which comes after it
+        self.assertIn('call i32 @"power.1"()', llvm_code)
+        self.assertLess(llvm_code.index('define i32 @"_gone_main"'),
+                        llvm_code.index('define i32 @"power.1"'))
+        self.assertNotIn('define i32 @"power"', llvm_code)
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            functions = compile(source)
+            if not functions:
+                continue
+            with self.subTest(filename=os.path.basename(filename)):
+                expected = run(functions)
+                specialize_calls(functions)
+                self.assertEqual(expected, run(functions))
+                optimize(functions)
+                self.assertEqual(expected, run(functions))
@@ -193,10 +193,14 @@ class TestIRCode(TestCase):
                   ('MOVF', 3.0, 'R4'),
                   ('MOVF', 6.0, 'R5'),
                   ('CMPF', '>', 'R4', 'R5', 'R6'),
+                  ('CBRANCH', 'R6', 'B2', 'B1'),
+                  ('LABEL', 'B1'),
                   ('MOVI', 5, 'R7'),
                   ('MOVI', 2, 'R8'),
                   ('CMPI', '>=', 'R7', 'R8', 'R9'),
-                  ('OR', 'R6', 'R9', 'R10'),
+                  ('BRANCH', 'B2'),
+                  ('LABEL', 'B2'),
+                  ('PHII', 'entry', 'R6', 'B1', 'R9', 'R10'),
                   ('PRINTI', 'R10')]
         self._test_code(source, output)
 
@@ -225,8 +229,12 @@ class TestIRCode(TestCase):
                   ('STOREI', 'R2', 'y'),
                   ('VARI', 'z'),
                   ('LOADI', 'x', 'R3'),
+                  ('CBRANCH', 'R3', 'B2', 'B1'),
+                  ('LABEL', 'B1'),
                   ('LOADI', 'y', 'R4'),
-                  ('OR', 'R3', 'R4', 'R5'),
+                  ('BRANCH', 'B2'),
+                  ('LABEL', 'B2'),
+                  ('PHII', 'entry', 'R3', 'B1', 'R4', 'R5'),
                   ('STOREI', 'R5', 'z')]
         self._test_code(source, output)
 
@@ -277,6 +285,31 @@ class TestIRCode(TestCase):
                   ('LABEL', 'B3')]
         self._test_code(source, output)
 
+    def test_short_circuit_conditions(self):
+        source = """
+                 var a bool;
+                 if !a && a || a {
+                     print 1;
+                 }
+                 """
+        output = [('VARI', 'a'),
+                  ('LOADI', 'a', 'R1'),
+                  ('CBRANCH', 'R1', 'B4', 'B5'),
+                  ('LABEL', 'B5'),
+                  ('LOADI', 'a', 'R2'),
+                  ('CBRANCH', 'R2', 'B1', 'B4'),
+                  ('LABEL', 'B4'),
+                  ('LOADI', 'a', 'R3'),
+                  ('CBRANCH', 'R3', 'B1', 'B2'),
+                  ('LABEL', 'B1'),
+                  ('MOVI', 1, 'R4'),
+                  ('PRINTI', 'R4'),
+                  ('BRANCH', 'B3'),
+                  ('LABEL', 'B2'),
+                  ('BRANCH', 'B3'),
+                  ('LABEL', 'B3')]
+        self._test_code(source, output)
+
     def test_while_statements(self):
         source = """
                  var a int = 10;
@@ -423,3 +456,63 @@ class TestIRCode(TestCase):
                            ('RET', 'R3')])]
         self._test_functions(source, output)
 
+    def test_slots(self):
+        from gone.checker import Slot, GLOBAL, LOCAL
+        source = """
+                 func foo(x int) int {
+                     var y int;
+                     return x + y;
+                 }
+                 const x = 5;
+                 """
+        clear_errors()
+        ast = parse(source)
+        check_program(ast)
+        visitor = GenerateCode(slots=True)
+        visitor.visit(ast)
+        init, foo = visitor.functions
+        self.assertEqual([('MOVI', 5, 'R4'),
+                          ('VARI', Slot(GLOBAL, 0, 'x')),
+                          ('STOREI', 'R4', Slot(GLOBAL, 0, 'x'))], init.body)
+        self.assertEqual([('ALLOCI', Slot(LOCAL, 1, 'y')),
+                          ('LOADI', Slot(LOCAL, 0, 'x'), 'R1'),
+                          ('LOADI', Slot(LOCAL, 1, 'y'), 'R2'),
+                          ('ADDI', 'R1', 'R2', 'R3'),
+                          ('RET', 'R3')], foo.body)
+        self.assertEqual((0, 2), (init.frame_size, foo.frame_size))
+
+    def test_packed(self):
+        from gone.ircode import Function, Op, operand_kinds
+        function = Function('f')
+        function.emit(Op.MOVI, 1, 1)
+        function.emit(Op.MOVF, 1.0, 2)
+        function.emit(Op.CMPI, '<', 1, 1, 3)
+        function.append(('CALL', 'g', 'R1', 'R3', 'R4'))
+        function.append(('CBRANCH', 'R4', 'B1', 'B2'))
+        expected = [('MOVI', 1, 'R1'),
+                    ('MOVF', 1.0, 'R2'),
+                    ('CMPI', '<', 'R1', 'R1', 'R3'),
+                    ('CALL', 'g', 'R1', 'R3', 'R4'),
+                    ('CBRANCH', 'R4', 'B1', 'B2')]
+        self.assertEqual(expected, function.body)
+        self.assertEqual(expected, list(function))
+        self.assertEqual(expected[1:3], function.body[1:3])
+        self.assertEqual(expected[-1], function.body[-1])
+        self.assertEqual((Op.CALL, ('g', 1, 3, 4)), function.instruction(3))
+        self.assertEqual('vrrr', operand_kinds(Op.CALL, 4))
+        self.assertEqual(5, len(function))
+        # 1 and 1.0 are kept apart
+        self.assertEqual([1, 1.0, '<', 'g', 'B1', 'B2'], function.values)
+        self.assertIs(float, type(function.body[1][1]))
+
+        function.body = expected[:2]
+        self.assertEqual(expected[:2], function.body)
+        self.assertEqual([1, 1.0], function.values)
+        with self.assertRaises(IndexError):
+            function.body[2]
+
+        # So are 0.0 and -0.0, and the PHI operands alternate
+        function.body = [('MOVF', -0.0, 'R1'), ('MOVF', 0.0, 'R2'),
+                         ('PHIF', 'entry', 'R1', 'B1', 'R2', 'R3')]
+        self.assertEqual('-0.0 0.0', ' '.join(str(inst[1]) for inst in function.body[:2]))
+        self.assertEqual('vrvrr', operand_kinds(Op.PHIF, 5))
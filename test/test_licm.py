@@ -0,0 +1,118 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.interp import Interpreter
+from gone.ircode import Function, compile_ircode
+from gone.licm import hoist_invariants
+from gone.optimize import optimize
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=False):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def loop_ops(function):
+    '''
+    The opcodes of the instructions in the loops of function
+    '''
+    cfg = function.cfg()
+    blocks = {block for loop in cfg.loops for block in loop.blocks}
+    return [op.name for block in cfg.blocks if block in blocks for op, operands in block.instructions]
+
+def loads(blocks):
+    '''
+    The names of the variables loaded in blocks
+    '''
+    return {getattr(operands[0], 'name', operands[0]) for block in blocks
+            for op, operands in block.instructions if op.name.startswith('LOAD')}
+
+class TestLICM(TestCase):
+    def test_nested(self):
+        with open(os.path.join(_tests, 'nestedwhile.g')) as f:
+            init, = functions = compile(f.read())
+        expected = run(functions)
+        hoist_invariants(functions)
+        self.assertEqual(expected, run(functions))
+        # print i in the inner loop loads i once per iteration of the
+        # outer loop, and the constants are set before both loops
+        cfg = init.cfg()
+        inner, outer = cfg.loops
+        self.assertEqual({'j'}, loads(inner.blocks))
+        self.assertEqual({'i', 'j'}, loads(outer.blocks))
+        self.assertNotIn('MOVI', loop_ops(init))
+        self.assertEqual(['MOVI', 'VARI', 'STOREI', 'MOVI', 'VARI', 'STOREI',
+                          'MOVI', 'MOVI', 'MOVI', 'MOVI', 'MOVI', 'BRANCH'],
+                         [inst[0] for inst in init.body[:12]])
+
+    def test_calls(self):
+        source = ('const k = 3;\n'
+                  'var g int = 0;\n'
+                  'func bump() int { g = g + 1; return g; }\n'
+                  'func main() int {\n'
+                  '    var i int = 0;\n'
+                  '    while i < 3 {\n'
+                  '        print bump() * k;\n'
+                  '        print g;\n'
+                  '        i = i + 1;\n'
+                  '    }\n'
+                  '    return 0;\n'
+                  '}\n')
+        for slots in (False, True):
+            with self.subTest(slots=slots):
+                init, bump, main = functions = compile(source, slots)
+                expected = run(functions)
+                if slots:
+                    optimize(functions, ['mem2reg'])
+                hoist_invariants(functions)
+                self.assertEqual(expected, run(functions))
+                # k is only stored by __init, but bump() stores g
+                loop, = main.cfg().loops
+                self.assertIn('g', loads(loop.blocks))
+                self.assertNotIn('k', loads(loop.blocks))
+
+    def test_preheader(self):
+        # A loop entered from two blocks, with a PHI in its header
+        function = Function('f', 'int')
+        function.body = [('MOVI', 1, 'R1'), ('MOVI', 2, 'R2'), ('MOVI', 10, 'R3'),
+                         ('MOVI', 100, 'R8'), ('CBRANCH', 'R1', 'B1', 'B2'),
+                         ('LABEL', 'B1'), ('MOVI', 5, 'R4'), ('BRANCH', 'B2'),
+                         ('LABEL', 'B2'),
+                         ('PHII', 'entry', 'R2', 'B1', 'R4', 'B2', 'R7', 'R5'),
+                         ('ADDI', 'R3', 'R3', 'R6'), ('ADDI', 'R5', 'R6', 'R7'),
+                         ('CMPI', '<', 'R7', 'R8', 'R9'), ('CBRANCH', 'R9', 'B2', 'B3'),
+                         ('LABEL', 'B3'), ('RET', 'R7')]
+        self.assertEqual(-3, hoist_invariants([function]))
+        self.assertEqual([('CBRANCH', 'R1', 'B1', 'B4'),
+                          ('LABEL', 'B1'), ('MOVI', 5, 'R4'), ('BRANCH', 'B4'),
+                          ('LABEL', 'B4'),
+                          ('PHII', 'entry', 'R2', 'B1', 'R4', 'R10'),
+                          ('ADDI', 'R3', 'R3', 'R6'), ('BRANCH', 'B2'),
+                          ('LABEL', 'B2'),
+                          ('PHII', 'B2', 'R7', 'B4', 'R10', 'R5'),
+                          ('ADDI', 'R5', 'R6', 'R7')], function.body[4:15])
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            for slots in (False, True):
+                functions = compile(source, slots)
+                if not functions:
+                    continue
+                with self.subTest(filename=os.path.basename(filename), slots=slots):
+                    expected = run(functions)
+                    hoist_invariants(functions)
+                    self.assertEqual(expected, run(functions))
+                    if slots:
+                        optimize(functions)
+                        self.assertEqual(expected, run(functions))
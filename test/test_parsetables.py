@@ -0,0 +1,85 @@
+import importlib.util
+import os.path
+import tempfile
+from unittest import TestCase, mock
+from sly import Parser
+from sly.yacc import LRTable
+from gone import parser, parsetables
+from gone.parser import GoneParser
+from gone.scanner import GoneScanner
+
+def make_parser(filename, operator='PLUS'):
+    '''
+    Return a small parser class for sums (or products) of integers that
+    caches its tables in filename
+    '''
+    class SumParser(Parser):
+        tokens = {'INTEGER', operator}
+        precedence = (('left', operator),)
+        tablefile = filename
+
+        @classmethod
+        def _build(cls, definitions):
+            parsetables.build(cls, definitions)
+
+        @_('expression ' + operator + ' expression')
+        def expression(self, p):
+            return (p[1], p.expression0, p.expression1)
+
+        @_('INTEGER')
+        def expression(self, p):
+            return int(p.INTEGER)
+
+    return SumParser
+
+class TestParseTables(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tablefile = os.path.join(self.tmpdir.name, 'sub', 'SumParser.lrtab')
+
+    def parse(self, parser, text):
+        return parser().parse(GoneScanner().tokenize(text))
+
+    def test_gone_parser_tables(self):
+        # Declare GoneParser again, without a table file, from a fresh copy
+        # of its module: building tables twice from one grammar doesn't
+        # give the same tables
+        spec = importlib.util.spec_from_file_location('gone._fresh_parser', parser.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.object(parsetables, 'default_tablefile', return_value=None):
+            spec.loader.exec_module(module)
+        tables = module.GoneParser._lrtable
+        self.assertIsInstance(tables, LRTable)
+        self.assertEqual(tables.lr_action, GoneParser._lrtable.lr_action)
+        self.assertEqual(tables.lr_goto, GoneParser._lrtable.lr_goto)
+        self.assertEqual(tables.defaulted_states, GoneParser._lrtable.defaulted_states)
+
+    def test_save_and_load(self):
+        built = make_parser(self.tablefile)
+        self.assertIsInstance(built._lrtable, LRTable)
+        self.assertTrue(os.path.exists(self.tablefile))
+        loaded = make_parser(self.tablefile)
+        self.assertIsInstance(loaded._lrtable, parsetables.CachedTables)
+        self.assertEqual(built._lrtable.lr_action, loaded._lrtable.lr_action)
+        self.assertEqual(('+', ('+', 1, 2), 3), self.parse(loaded, '1 + 2 + 3'))
+
+    def test_grammar_change(self):
+        make_parser(self.tablefile, 'PLUS')
+        changed = make_parser(self.tablefile, 'TIMES')
+        self.assertIsInstance(changed._lrtable, LRTable)
+        self.assertEqual(('*', 2, 3), self.parse(changed, '2 * 3'))
+        self.assertIsInstance(make_parser(self.tablefile, 'TIMES')._lrtable,
+                              parsetables.CachedTables)
+
+    def test_bad_file(self):
+        os.makedirs(os.path.dirname(self.tablefile))
+        with open(self.tablefile, 'wb') as f:
+            f.write(b'not a table file')
+        parser = make_parser(self.tablefile)
+        self.assertIsInstance(parser._lrtable, LRTable)
+        self.assertEqual(('+', 1, 2), self.parse(parser, '1 + 2'))
+
+    def test_no_file(self):
+        parser = make_parser(None)
+        self.assertEqual(('+', 1, 2), self.parse(parser, '1 + 2'))
@@ -0,0 +1,131 @@
+import codecs
+import glob
+import io
+import mmap
+import os.path
+from unittest import TestCase
+from unittest.mock import patch
+from gone.tokenizer import GoneLexer
+from gone.scanner import GoneScanner
+from gone.parser import parse
+from gone.ast import flatten
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+class TestScanner(TestCase):
+    def setUp(self):
+        self.captured_output = []
+        self.patcher = patch('builtins.print', self.mock_print)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def tokens(self, lexer, text):
+        del self.captured_output[:]
+        tokens = [(tok.type, tok.value, tok.lineno, tok.index)
+                  for tok in lexer.tokenize(text)]
+        return tokens, list(self.captured_output)
+
+    def assertSameTokens(self, text):
+        self.assertEqual(self.tokens(GoneLexer(), text),
+                         self.tokens(GoneScanner(), text))
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with self.subTest(filename=os.path.basename(filename)):
+                with open(filename) as f:
+                    self.assertSameTokens(f.read())
+
+    def test_tricky_input(self):
+        for text in ("123abc 0x1f 1.e5 .5e-3 1e 12.",
+                     "a//b\nc // no newline at the end",
+                     "x /* multi\nline */ y\n\n\nz",
+                     "'a' '\\n' '\\x3f' '\\x3' 'ab' '",
+                     "a$ 123@ b\n'H\n/* Unterminated C-style comment\n\n",
+                     "if_ else1 _ __ returned ++ += -- -= *= /= != !",
+                     "٣٤ été"):
+            with self.subTest(text=text):
+                self.assertSameTokens(text)
+
+    def test_start_position(self):
+        text = "var x int;\nprint x;\n"
+        self.assertEqual(self.tokens(GoneLexer(), text)[0][4:],
+                         [(tok.type, tok.value, tok.lineno, tok.index)
+                          for tok in GoneScanner().tokenize(text, lineno=2, index=11)])
+
+    def test_parse_with_scanner(self):
+        with open(os.path.join(_tests, 'mandel.g')) as f:
+            source = f.read()
+        expected = [(depth, repr(node), getattr(node, 'lineno', None))
+                    for depth, node in flatten(parse(source))]
+        result = [(depth, repr(node), getattr(node, 'lineno', None))
+                  for depth, node in flatten(parse(source, lexer='scanner'))]
+        self.assertEqual(expected, result)
+
+    def test_token_buffer(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with self.subTest(filename=os.path.basename(filename)):
+                with open(filename) as f:
+                    text = f.read()
+                expected = self.tokens(GoneScanner(), text)
+                del self.captured_output[:]
+                buffer = GoneScanner().scan(text)
+                tokens = [(buffer.type(n), buffer.value(n), buffer.lineno(n), buffer.starts[n])
+                          for n in range(len(buffer))]
+                self.assertEqual(expected, (tokens, self.captured_output))
+                self.assertEqual(expected[0], [(tok.type, tok.value, tok.lineno, tok.index)
+                                               for tok in buffer])
+
+    def test_parse_token_buffer(self):
+        with open(os.path.join(_tests, 'mandel.g')) as f:
+            source = f.read()
+        expected = [(depth, repr(node), getattr(node, 'lineno', None))
+                    for depth, node in flatten(parse(source))]
+        result = [(depth, repr(node), getattr(node, 'lineno', None))
+                  for depth, node in flatten(parse(GoneScanner().scan(source)))]
+        self.assertEqual(expected, result)
+
+    def test_stream(self):
+        texts = [("a/* comment\nspanning */b//c\n123abc 0x1f 1.e5 '\\x3f'\n", 'chunk boundaries')]
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            with open(filename) as f:
+                texts.append((f.read(), os.path.basename(filename)))
+        for text, name in texts:
+            expected = self.tokens(GoneLexer(), text)
+            for chunk_size in (1, 2, 3, 7, 64):
+                with self.subTest(name=name, chunk_size=chunk_size):
+                    stream = io.StringIO(text)
+                    self.assertEqual(expected, self.tokens_from(
+                        lambda: GoneScanner().tokenize_stream(stream, chunk_size)))
+
+    def test_mmap_stream(self):
+        filename = os.path.join(_tests, 'mandel.g')
+        with open(filename) as f:
+            expected = self.tokens(GoneLexer(), f.read())
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            stream = codecs.getreader('utf-8')(m)
+            self.assertEqual(expected, self.tokens_from(
+                lambda: GoneScanner().tokenize_stream(stream, 100)))
+
+    def test_parse_file(self):
+        filename = os.path.join(_tests, 'mandel.g')
+        with open(filename) as f:
+            expected = [(depth, repr(node), getattr(node, 'lineno', None))
+                        for depth, node in flatten(parse(f.read()))]
+        with open(filename) as f:
+            result = [(depth, repr(node), getattr(node, 'lineno', None))
+                      for depth, node in flatten(parse(f))]
+        self.assertEqual(expected, result)
+        # Another lexer reads the whole file
+        with open(filename) as f, patch.object(GoneScanner, 'tokenize_stream') as stream:
+            result = [(depth, repr(node), getattr(node, 'lineno', None))
+                      for depth, node in flatten(parse(f, lexer='sly'))]
+        self.assertEqual(expected, result)
+        stream.assert_not_called()
+
+    def tokens_from(self, tokenize):
+        del self.captured_output[:]
+        tokens = [(tok.type, tok.value, tok.lineno, tok.index) for tok in tokenize()]
+        return tokens, list(self.captured_output)
+
+    def mock_print(self, *args, **kwargs):
+        self.captured_output.append(args)
@@ -0,0 +1,102 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.interp import Interpreter
+from gone.ircode import compile_ircode
+from gone.ssa import promote_locals
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=True):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+_sum = ('func sum(n int) int {\n'
+        '    var total int = 0;\n'
+        '    while n > 0 {\n'
+        '        total = total + n;\n'
+        '        n = n - 1;\n'
+        '    }\n'
+        '    return total;\n'
+        '}\n'
+        'print sum(10);\n')
+
+class TestSSA(TestCase):
+    def test_promote(self):
+        functions = compile(_sum)
+        init, sum = functions
+        self.assertGreater(promote_locals(functions), 0)
+        self.assertEqual('55\n', run(functions))
+        # n is loaded once, and the loop keeps n and total in registers
+        self.assertEqual(['LOADI', 'MOVI', 'BRANCH', 'LABEL', 'PHII', 'PHII', 'MOVI', 'CMPI',
+                          'CBRANCH', 'LABEL', 'ADDI', 'MOVI', 'SUBI', 'BRANCH', 'LABEL', 'RET'],
+                         ops(sum))
+        self.assertEqual(1, sum.frame_size)
+        header = sum.body[4:6]
+        self.assertEqual([('PHII', 'entry', 'R1', 'B2', 'R7', 'R12'),
+                          ('PHII', 'entry', 'R14', 'B2', 'R10', 'R13')], header)
+
+    def test_join(self):
+        functions = compile('func f(a int) float {\n'
+                            '    var x float;\n'
+                            '    if a > 2 { x = 3.0; }\n'
+                            '    return x;\n'
+                            '}\n'
+                            'print f(1);\nprint f(5);\n')
+        init, f = functions
+        promote_locals(functions)
+        self.assertEqual('0.0\n3.0\n', run(functions))
+        # x is 0.0 unless the branch was taken
+        self.assertIn(('MOVF', 0.0, 'R8'), f.body)
+        self.assertIn(('PHIF', 'B1', 'R4', 'B2', 'R8', 'R6'), f.body)
+        self.assertNotIn('ALLOCF', ops(f))
+        self.assertNotIn('STOREF', ops(f))
+
+    def test_globals_and_names(self):
+        # Globals stay in memory, and code with variables by name is left
+        # as it is
+        source = 'var g int = 1;\nfunc f() int { var x int = g; g = x + 1; return x; }\nprint f();\n'
+        functions = compile(source)
+        promote_locals(functions)
+        self.assertEqual(['LOADI', 'ADDI', 'STOREI'], [op for op in ops(functions[1])
+                                                       if op in ('LOADI', 'ADDI', 'STOREI')])
+        functions = compile(source, slots=False)
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, promote_locals(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            functions = compile(source)
+            if not functions:
+                continue
+            with self.subTest(filename=os.path.basename(filename)):
+                expected = run(functions)
+                promote_locals(functions)
+                for function in functions:
+                    self.assertFalse({'ALLOCI', 'ALLOCF', 'ALLOCB'} & set(ops(function)))
+                self.assertEqual(expected, run(functions))
+
+    def test_llvm(self):
+        try:
+            from gone.llvmgen import compile_llvm
+        except ImportError:
+            self.skipTest('llvmlite is not installed')
+        with contextlib.redirect_stderr(io.StringIO()):
+            llvm_code = compile_llvm(_sum.replace('print sum(10);', ''), optimize=True)
+        self.assertIn('phi  i32 [0, %"entry"], [%"R7", %"B2"]', llvm_code)
+        self.assertNotIn('%"total" = alloca', llvm_code)
@@ -0,0 +1,106 @@
+import glob
+import io
+import contextlib
+import os.path
+from unittest import TestCase
+from gone.interp import Interpreter
+from gone.ircode import compile_ircode
+from gone.optimize import optimize
+from gone.tailcall import eliminate_tail_calls
+
+_tests = os.path.join(os.path.dirname(__file__), '..', 'Tests')
+
+def compile(source, slots=True):
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compile_ircode(source, slots)
+
+def run(functions):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().execute(functions)
+    return stdout.getvalue()
+
+def ops(function):
+    return [inst[0] for inst in function.body]
+
+_sum = ('func sum(n int, acc int) int {\n'
+        '    if n == 0 { return acc; }\n'
+        '    return sum(n - 1, acc + n);\n'
+        '}\n')
+
+class TestTailCall(TestCase):
+    def test_loop(self):
+        init, sum, main = functions = compile(_sum + 'func main() int { print sum(5000, 0); return 0; }\n')
+        self.assertLess(eliminate_tail_calls(functions), 0)
+        # Far deeper than the interpreter could go with calls
+        self.assertEqual('12502500\n', run(functions))
+        self.assertNotIn('CALL', ops(sum))
+        # The code of the entry starts a block of its own
+        self.assertEqual(('LABEL', 'B4'), sum.body[0])
+        self.assertEqual([('STOREI', 'R7', 'n'), ('STOREI', 'R10', 'acc'), ('BRANCH', 'B4')],
+                         [(op, *map(lambda operand: getattr(operand, 'name', operand), operands))
+                          for op, *operands in sum.body[-3:]])
+
+        optimize(functions, ['mem2reg', 'dce'])
+        self.assertEqual('12502500\n', run(functions))
+        self.assertEqual(2, ops(sum).count('PHII'))
+        self.assertNotIn('STOREI', ops(sum))
+
+    def test_not_tail(self):
+        with open(os.path.join(_tests, 'func.g')) as f:
+            source = f.read()
+        functions = compile(source + 'func twice(n int) int { return add(n, n); }\n')
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, eliminate_tail_calls(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_entry_phis(self):
+        source = ('func down(n int) int {\n'
+                  '    var ok bool = n > 0 && n < 100;\n'
+                  '    if !ok { return n; }\n'
+                  '    return down(n - 1);\n'
+                  '}\n'
+                  'func main() int { print down(50); print down(500); return 0; }\n')
+        init, down, main = functions = compile(source)
+        expected = run(functions)
+        eliminate_tail_calls(functions)
+        self.assertEqual(expected, run(functions))
+        self.assertNotIn('entry', [operand for inst in down.body if inst[0] == 'PHII'
+                                   for operand in inst[1:]])
+        optimize(functions)
+        self.assertEqual(expected, run(functions))
+
+    def test_names(self):
+        functions = compile(_sum, slots=False)
+        before = [function.body[:] for function in functions]
+        self.assertEqual(0, eliminate_tail_calls(functions))
+        self.assertEqual(before, [function.body[:] for function in functions])
+
+    def test_llvm(self):
+        try:
+            from gone.llvmgen import compile_llvm
+        except ImportError:
+            self.skipTest('llvmlite is not installed')
+        source = _sum + 'func twice(n int) int { return sum(n, n); }\n'
+        with contextlib.redirect_stderr(io.StringIO()):
+            llvm_code = compile_llvm(source)
+        self.assertEqual(2, llvm_code.count('tail call i32 @"sum"'))
+        # Each RET returns right away, without a return variable or block
+        self.assertNotIn('%"return"', llvm_code)
+        with contextlib.redirect_stderr(io.StringIO()):
+            llvm_code = compile_llvm(source, optimize=True)
+        # sum() loops, and no longer being recursive, is inlined in twice()
+        self.assertNotIn('call i32 @"sum"', llvm_code)
+
+    def test_test_programs(self):
+        for filename in sorted(glob.glob(os.path.join(_tests, '*.g'))):
+            if filename.endswith('mandel.g'):
+                continue
+            with open(filename) as f:
+                source = f.read()
+            functions = compile(source)
+            if not functions:
+                continue
+            with self.subTest(filename=os.path.basename(filename)):
+                expected = run(functions)
+                eliminate_tail_calls(functions)
+                self.assertEqual(expected, run(functions))
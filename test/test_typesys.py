@@ -0,0 +1,35 @@
+import pickle
+from unittest import TestCase
+from gone import typesys
+from gone.typesys import *
+from gone.typesys import INT, FLOAT, CHAR, BOOL, VOID, ERROR
+
+class TestTypeSystem(TestCase):
+    def test_types(self):
+        self.assertEqual(['int', 'float', 'char', 'bool', 'void'], list(builtin_types))
+        for name, ty in builtin_types.items():
+            self.assertEqual(name, ty)
+            self.assertEqual(repr(name), repr(ty))
+            self.assertIs(ty, lookup_type(name))
+            self.assertIs(ty, pickle.loads(pickle.dumps(ty)))
+        self.assertEqual(list(range(len(all_types))), [ty.code for ty in all_types])
+        self.assertEqual(('I', 'F', 'B', 'I'), (INT.char, FLOAT.char, CHAR.char, BOOL.char))
+
+    def test_dense_tables(self):
+        ops = {op for _, op, _ in typesys._supported_binops} | {'%', '&'}
+        for left in all_types:
+            for right in all_types:
+                for op in ops:
+                    expected = typesys._supported_binops.get((left, op, right), ERROR)
+                    self.assertIs(expected, check_binop(left, op, right))
+        for operand in all_types:
+            for op in ('+', '-', '!', '~'):
+                expected = typesys._supported_unaryops.get((op, operand), ERROR)
+                self.assertIs(expected, check_unaryop(op, operand))
+
+    def test_names(self):
+        self.assertIs(BOOL, check_binop('int', '<', 'int'))
+        self.assertIs(ERROR, check_binop('int', '+', 'float'))
+        self.assertIs(ERROR, check_binop('string', '+', 'string'))
+        self.assertIs(FLOAT, check_unaryop('-', 'float'))
+        self.assertIs(ERROR, check_unaryop('-', VOID))